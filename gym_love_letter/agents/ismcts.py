@@ -0,0 +1,387 @@
+from __future__ import annotations
+
+import math
+import multiprocessing as mp
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from gym_love_letter.agents.abstract import Agent
+from gym_love_letter.engine import Card
+
+
+if TYPE_CHECKING:
+    from gym_love_letter.envs.base import LoveLetterBaseEnv
+    from gym_love_letter.envs.observations import Observation
+
+
+# Chooses an action id for the current player of an env
+RolloutPolicy = Callable[["LoveLetterBaseEnv", np.random.Generator], int]
+
+# Visits and total reward of each of the root player's actions
+RootStats = Dict[int, Tuple[int, float]]
+
+
+def random_rollout(env: LoveLetterBaseEnv, rng: np.random.Generator) -> int:
+    """
+    Plays a uniformly random valid action.
+    """
+
+    legal = np.flatnonzero(env._legal_mask())
+    return int(legal[rng.integers(len(legal))])
+
+
+def heuristic_rollout(env: LoveLetterBaseEnv, rng: np.random.Generator) -> int:
+    """
+    Plays a random valid action, except that it uses what the player knows:
+    Guard and Baron known cards when that wins, avoid Baron with a weak hand,
+    and never Prince itself while holding the Princess.
+    """
+
+    legal = np.flatnonzero(env._legal_mask())
+    table = env.mask_table
+    cards = table.action_card[legal]
+    targets = table.action_target[legal]
+    guesses = table.action_guess[legal]
+
+    player = env.current_player
+    hand = list(player.hand)
+    num_players = env.num_players
+
+    for target, card in player.priest_info().items():
+        relative = (target.position - player.position) % num_players
+
+        if card != Card.GUARD:
+            hits = legal[(cards == Card.GUARD) & (targets == relative) & (guesses == card)]
+            if len(hits):
+                return int(hits[0])
+
+        if Card.BARON in hand:
+            other = hand[1] if hand[0] == Card.BARON else hand[0]
+            if other > card:
+                hits = legal[(cards == Card.BARON) & (targets == relative)]
+                if len(hits):
+                    return int(hits[0])
+
+    weights = np.ones(len(legal))
+    if Card.BARON in hand:
+        other = hand[1] if hand[0] == Card.BARON else hand[0]
+        if other <= Card.HANDMAID:
+            weights[cards == Card.BARON] = 0.2
+    if Card.PRINCESS in hand:
+        weights[(cards == Card.PRINCE) & (targets == 0)] = 0
+
+    if weights.sum() == 0:
+        return random_rollout(env, rng)
+    return int(rng.choice(legal, p=weights / weights.sum()))
+
+
+class PolicyRollout:
+    """
+    Plays the actions chosen by a policy, e.g. a trained (Maskable)PPO model,
+    from the current player's observation. Invalid choices are replaced by a
+    random valid action.
+    """
+
+    def __init__(self, model, deterministic: bool = False):
+        self.model = model
+        self.deterministic = deterministic
+
+    def __call__(self, env: LoveLetterBaseEnv, rng: np.random.Generator) -> int:
+        obs = env._obs_buffer.vector(env.current_player.position)
+        mask = env.valid_action_mask()
+        try:
+            action_id, _ = self.model.predict(obs, action_masks=mask, deterministic=self.deterministic)
+        except TypeError:
+            # Models without masking support
+            action_id, _ = self.model.predict(obs, deterministic=self.deterministic)
+
+        action_id = int(action_id)
+        if not mask[action_id]:
+            return random_rollout(env, rng)
+        return action_id
+
+
+class EndgameRollout:
+    """
+    Plays perfectly once few enough cards are left to solve the rest of the
+    game exactly (see EndgameSolver), and follows another rollout policy
+    before that. Rollouts run on full determinized states, so the solver
+    sees every hand.
+    """
+
+    def __init__(self, policy: RolloutPolicy = random_rollout, max_remaining: Optional[int] = None):
+        # Imported here, since the envs import the agents
+        from gym_love_letter.envs.endgame import ENDGAME_MAX_REMAINING, EndgameSolver
+
+        self.policy = policy
+        self.max_remaining = max_remaining if max_remaining is not None else ENDGAME_MAX_REMAINING
+        self.solver = EndgameSolver()
+
+    def __call__(self, env: LoveLetterBaseEnv, rng: np.random.Generator) -> int:
+        from gym_love_letter.envs.endgame import is_endgame
+
+        if is_endgame(env, self.max_remaining):
+            return self.solver.best_action(env)
+        return self.policy(env, rng)
+
+
+class _Node:
+    __slots__ = ("mover", "action_id", "children", "visits", "availability", "reward")
+
+    def __init__(self, mover: int = -1, action_id: int = -1):
+        self.mover = mover
+        self.action_id = action_id
+        self.children: Dict[Tuple[int, int], _Node] = {}
+        self.visits = 0
+        self.availability = 0
+        self.reward = 0.0
+
+
+def _no_reward(env: LoveLetterBaseEnv) -> float:
+    return 0.0
+
+
+def search(
+    snapshot: np.ndarray,
+    seat: int,
+    rollout_policy: RolloutPolicy = random_rollout,
+    iterations: Optional[int] = 1000,
+    time_limit: Optional[float] = None,
+    exploration: float = 0.7,
+    seed: Optional[int] = None,
+) -> RootStats:
+    """
+    Single-observer information-set MCTS from the given seat's point of view.
+
+    Every iteration deals a new determinization of the hidden cards, then
+    walks the tree along the actions that are legal in it, choosing among
+    them by UCB using how often each was available. A single new node is
+    added per iteration, and the game is played out with the rollout policy.
+    Each node collects the result of the player who made its move: 1 for a
+    win, split between the winners of a tie.
+
+    Runs until either budget is spent.
+
+    Returns:
+        The visits and total reward of each of the seat's actions at the root.
+    """
+
+    # Imported here, since the envs import the agents
+    from gym_love_letter.envs.base import LoveLetterBaseEnv
+    from gym_love_letter.envs.determinization import DeterminizationSampler
+
+    if iterations is None and time_limit is None:
+        raise ValueError("Search needs an iteration or time budget")
+
+    env = LoveLetterBaseEnv.load(snapshot, reward_fn=_no_reward, observation_info=False)
+    sampler = DeterminizationSampler(env, seat)
+    rng = np.random.default_rng(seed)
+
+    root = _Node()
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    batch = np.empty((0, len(snapshot)), dtype=np.int8)
+    iteration = 0
+
+    while iterations is None or iteration < iterations:
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+
+        if iteration % 64 == 0:
+            batch = sampler.sample(64, rng)
+        env.restore(batch[iteration % 64])
+        iteration += 1
+
+        # Selection and expansion
+        node = root
+        path = []
+        while not env.game_over:
+            if not env.current_player.active:
+                env._next_player()
+                continue
+
+            mover = env.current_player.position
+            legal = np.flatnonzero(env._legal_mask()).tolist()
+            children = node.children
+
+            untried = [a for a in legal if (mover, a) not in children]
+            for a in legal:
+                child = children.get((mover, a))
+                if child is not None:
+                    child.availability += 1
+
+            if untried:
+                action_id = untried[rng.integers(len(untried))]
+                node = _Node(mover, action_id)
+                node.availability = 1
+                children[(mover, action_id)] = node
+                path.append(node)
+                env.step(action_id)
+                break
+
+            best = None
+            best_score = -math.inf
+            for a in legal:
+                child = children[(mover, a)]
+                score = child.reward / child.visits + exploration * math.sqrt(
+                    math.log(child.availability) / child.visits
+                )
+                if score > best_score:
+                    best, best_score = child, score
+
+            node = best
+            path.append(node)
+            env.step(node.action_id)
+
+        # Simulation
+        while not env.game_over:
+            if env.current_player.active:
+                env.step(rollout_policy(env, rng))
+            else:
+                env._next_player()
+
+        winners = [p.position for p in env.winners]
+        result = [0.0] * env.num_players
+        for position in winners:
+            result[position] = 1 / len(winners)
+
+        # Backpropagation
+        root.visits += 1
+        for node in path:
+            node.visits += 1
+            node.reward += result[node.mover]
+
+    return {
+        action_id: (child.visits, child.reward)
+        for (mover, action_id), child in root.children.items()
+        if mover == seat
+    }
+
+
+# Each pool worker receives the rollout policy once, rather than with every search
+_worker_policy: Optional[RolloutPolicy] = None
+
+
+def _init_worker(rollout_policy: RolloutPolicy) -> None:
+    global _worker_policy
+    _worker_policy = rollout_policy
+
+
+def _search_worker(*args, **kwargs) -> RootStats:
+    assert _worker_policy is not None
+    return search(*args, rollout_policy=_worker_policy, **kwargs)
+
+
+class ISMCTSAgent(Agent):
+    """
+    Chooses moves by information-set Monte Carlo tree search.
+
+    Searches run from the state of the agent's env, but only use what the
+    current player knows: hidden cards are resampled on every iteration.
+
+    Args:
+        iterations: Iterations per move, split across the workers. None for
+            no limit, in which case time_limit is required.
+        time_limit: Seconds per move. Each worker searches for this long.
+        exploration: UCB exploration constant.
+        rollout_policy: Plays out games from new nodes. random_rollout,
+            heuristic_rollout, a PolicyRollout or EndgameRollout, or any
+            other picklable callable taking the env and a numpy Generator.
+        n_workers: Root parallelism. Each worker process grows its own
+            tree, and the root statistics are summed.
+        seed: Seed for the searches.
+    """
+
+    def __init__(
+        self,
+        env,
+        iterations: Optional[int] = 1000,
+        time_limit: Optional[float] = None,
+        exploration: float = 0.7,
+        rollout_policy: RolloutPolicy = random_rollout,
+        n_workers: int = 1,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(env)
+
+        if iterations is None and time_limit is None:
+            raise ValueError("ISMCTSAgent needs an iteration or time budget")
+
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.rollout_policy = rollout_policy
+        self.n_workers = n_workers
+        self.rng = np.random.default_rng(seed)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Same default as stable-baselines3's SubprocVecEnv
+            method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.n_workers,
+                mp_context=mp.get_context(method),
+                initializer=_init_worker,
+                initargs=(self.rollout_policy,),
+            )
+        return self._pool
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __getstate__(self) -> dict:
+        # The pool can't be copied. Copies start their own when needed.
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        return state
+
+    def search(self) -> RootStats:
+        """
+        Search from the env's current state, for its current player.
+        """
+
+        snapshot = self.env.snapshot()
+        seat = self.env.current_player.position
+        seeds = self.rng.integers(2 ** 63, size=self.n_workers).tolist()
+
+        if self.n_workers == 1:
+            return search(
+                snapshot, seat, self.rollout_policy, self.iterations, self.time_limit, self.exploration, seeds[0]
+            )
+
+        iterations = None
+        if self.iterations is not None:
+            iterations = -(-self.iterations // self.n_workers)
+
+        pool = self._get_pool()
+        futures = [
+            pool.submit(
+                _search_worker, snapshot, seat,
+                iterations=iterations, time_limit=self.time_limit, exploration=self.exploration, seed=seed,
+            )
+            for seed in seeds
+        ]
+
+        stats: RootStats = {}
+        for future in futures:
+            for action_id, (visits, reward) in future.result().items():
+                total_visits, total_reward = stats.get(action_id, (0, 0.0))
+                stats[action_id] = (total_visits + visits, total_reward + reward)
+
+        return stats
+
+    def predict(self, observation: Observation = None, action_masks: Optional[np.array] = None, **kwargs) -> Tuple[int, None]:
+        legal = np.flatnonzero(self.env._legal_mask())
+        if len(legal) == 1:
+            return int(legal[0]), None
+
+        stats = self.search()
+
+        # The most visited action is the most robust choice
+        action_id = max(stats, key=lambda a: stats[a][0])
+        return action_id, None
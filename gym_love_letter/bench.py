@@ -0,0 +1,308 @@
+"""
+Benchmarks for environment throughput and the cost of its components.
+
+Run with:
+
+    python -m gym_love_letter.bench --output results.json
+    python -m gym_love_letter.bench --compare results.json
+
+Throughput is reported in games and steps per second, and the component
+microbenchmarks in nanoseconds per call. Every benchmark is repeated and the
+best run is kept, which filters out most scheduling noise.
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import platform
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+import click
+import numpy as np
+
+from gym_love_letter.envs.base import LoveLetterBaseEnv, LoveLetterMultiAgentEnv
+
+
+PLAYER_COUNTS = (2, 3, 4)
+
+# Relative slowdown beyond which a result counts as a regression
+DEFAULT_THRESHOLD = 0.1
+
+
+@dataclass
+class Result:
+    name: str
+    value: float
+    unit: str
+    higher_is_better: bool
+
+
+@dataclass
+class Regression:
+    name: str
+    baseline: float
+    current: float
+    unit: str
+
+    @property
+    def change(self) -> float:
+        return self.current / self.baseline - 1
+
+
+def random_action(env: LoveLetterBaseEnv, rng: np.random.Generator) -> int:
+    return int(rng.choice(np.flatnonzero(env.valid_action_mask())))
+
+
+def play_base_game(env: LoveLetterBaseEnv, rng: np.random.Generator) -> int:
+    """
+    Play one game of random moves for every player. Returns the number of steps taken.
+    """
+
+    steps = 0
+    env.reset()
+    while not env.game_over:
+        if env.current_player.active:
+            env.step(random_action(env, rng))
+            steps += 1
+        else:
+            env._next_player()
+
+    return steps
+
+
+def play_multi_agent_game(env: LoveLetterMultiAgentEnv, rng: np.random.Generator) -> int:
+    """
+    Play one game as the training agent, letting the env play the opponents.
+    Returns the number of (full cycle) steps taken.
+    """
+
+    steps = 0
+    env.reset()
+    done = False
+    while not done:
+        _, _, done, _, _ = env.step(random_action(env, rng))
+        steps += 1
+
+    return steps
+
+
+def bench_throughput(
+    env_class: type[LoveLetterBaseEnv],
+    play_game: Callable[[LoveLetterBaseEnv, np.random.Generator], int],
+    num_players: int,
+    games: int,
+    seed: int,
+) -> tuple[float, float]:
+    """
+    Returns:
+        Games per second and steps per second.
+    """
+
+    env = env_class(num_players=num_players)
+    env.reset(seed=seed)
+    rng = np.random.default_rng(seed)
+
+    # Warm up caches (mask tables, layouts) outside of the timed loop
+    play_game(env, rng)
+
+    steps = 0
+    start = time.perf_counter()
+    for _ in range(games):
+        steps += play_game(env, rng)
+    elapsed = time.perf_counter() - start
+
+    return games / elapsed, steps / elapsed
+
+
+def bench_components(num_players: int, games: int, seed: int) -> dict[str, float]:
+    """
+    Time individual env operations at the states reached during random games.
+
+    The valid action mask is cached between state changes, so its cache is
+    invalidated before each timed call to measure the cost of a fresh lookup.
+
+    Returns:
+        Mean nanoseconds per call of each operation.
+    """
+
+    timer = time.perf_counter_ns
+    totals = {"valid_action_mask": 0, "observe_vector": 0, "decode_action": 0, "reset": 0, "full_cycle": 0}
+    counts = dict.fromkeys(totals, 0)
+
+    env = LoveLetterBaseEnv(num_players=num_players)
+    env.reset(seed=seed)
+    rng = np.random.default_rng(seed)
+
+    for _ in range(games):
+        start = timer()
+        env.reset()
+        totals["reset"] += timer() - start
+        counts["reset"] += 1
+
+        while not env.game_over:
+            if not env.current_player.active:
+                env._next_player()
+                continue
+
+            env._state_changed()
+            start = timer()
+            mask = env.valid_action_mask()
+            totals["valid_action_mask"] += timer() - start
+
+            start = timer()
+            env.observe().vector
+            totals["observe_vector"] += timer() - start
+
+            action_id = int(rng.choice(np.flatnonzero(mask)))
+            start = timer()
+            env.decode_action(action_id)
+            totals["decode_action"] += timer() - start
+
+            counts["valid_action_mask"] += 1
+            counts["observe_vector"] += 1
+            counts["decode_action"] += 1
+
+            env.step(action_id)
+
+    # The opponent loop: one training agent step, followed by every opponent's move
+    multi_env = LoveLetterMultiAgentEnv(num_players=num_players)
+    multi_env.reset(seed=seed)
+    for _ in range(games):
+        multi_env.reset()
+        done = False
+        while not done:
+            action_id = random_action(multi_env, rng)
+            start = timer()
+            _, _, done, _, _ = multi_env.step(action_id)
+            totals["full_cycle"] += timer() - start
+            counts["full_cycle"] += 1
+
+    return {name: totals[name] / max(counts[name], 1) for name in totals}
+
+
+def run(games: int = 200, repeat: int = 3, seed: int = 0) -> list[Result]:
+    """
+    Run every benchmark, keeping the best of several repeats.
+    """
+
+    results = []
+    envs = [
+        ("base", LoveLetterBaseEnv, play_base_game),
+        ("multi_agent", LoveLetterMultiAgentEnv, play_multi_agent_game),
+    ]
+
+    for label, env_class, play_game in envs:
+        for num_players in PLAYER_COUNTS:
+            runs = [bench_throughput(env_class, play_game, num_players, games, seed) for _ in range(repeat)]
+            games_per_sec = max(r[0] for r in runs)
+            steps_per_sec = max(r[1] for r in runs)
+            results.append(Result(f"{label}/{num_players}p/games_per_sec", games_per_sec, "games/s", True))
+            results.append(Result(f"{label}/{num_players}p/steps_per_sec", steps_per_sec, "steps/s", True))
+
+    for num_players in PLAYER_COUNTS:
+        runs = [bench_components(num_players, games, seed) for _ in range(repeat)]
+        for name in runs[0]:
+            best = min(r[name] for r in runs)
+            results.append(Result(f"component/{num_players}p/{name}", best, "ns/call", False))
+
+    return results
+
+
+def to_json(results: list[Result], games: int, repeat: int) -> dict:
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "games": games,
+            "repeat": repeat,
+        },
+        "results": [asdict(r) for r in results],
+    }
+
+
+def load_results(data: dict) -> list[Result]:
+    return [Result(**r) for r in data["results"]]
+
+
+def compare(current: list[Result], baseline: list[Result], threshold: float = DEFAULT_THRESHOLD) -> list[Regression]:
+    """
+    Returns the results that are worse than the baseline by more than the
+    threshold, as a fraction of the baseline value. Results missing from
+    either side are ignored.
+    """
+
+    baseline_by_name = {r.name: r for r in baseline}
+    regressions = []
+
+    for result in current:
+        base = baseline_by_name.get(result.name)
+        if base is None or base.value <= 0:
+            continue
+
+        ratio = result.value / base.value
+        if result.higher_is_better:
+            regressed = ratio < 1 - threshold
+        else:
+            regressed = ratio > 1 + threshold
+
+        if regressed:
+            regressions.append(Regression(result.name, base.value, result.value, result.unit))
+
+    return regressions
+
+
+def format_results(results: list[Result], baseline: list[Result] | None = None) -> str:
+    baseline_by_name = {r.name: r for r in baseline or []}
+    width = max(len(r.name) for r in results)
+
+    lines = []
+    for result in results:
+        line = f"{result.name:<{width}}  {result.value:>14,.1f} {result.unit}"
+        base = baseline_by_name.get(result.name)
+        if base is not None and base.value > 0:
+            line += f"  ({result.value / base.value - 1:+.1%} vs baseline)"
+        lines.append(line)
+
+    return "\n".join(lines)
+
+
+@click.command()
+@click.option("--output", "-o", type=click.Path(), help="Write the results to this JSON file")
+@click.option("--compare", "-c", "baseline_path", type=click.Path(exists=True), help="Baseline JSON file to check for regressions")
+@click.option("--threshold", default=DEFAULT_THRESHOLD, show_default=True, help="Relative slowdown that counts as a regression")
+@click.option("--games", default=200, show_default=True, help="Games played per benchmark")
+@click.option("--repeat", default=3, show_default=True, help="Runs per benchmark. The best is kept.")
+@click.option("--seed", default=0, show_default=True)
+def main(output, baseline_path, threshold, games, repeat, seed):
+    results = run(games=games, repeat=repeat, seed=seed)
+
+    baseline = None
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = load_results(json.load(f))
+
+    click.echo(format_results(results, baseline))
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(to_json(results, games, repeat), f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, threshold)
+        if regressions:
+            click.echo(f"\n{len(regressions)} regression(s) beyond {threshold:.0%}:")
+            for r in regressions:
+                click.echo(f"  {r.name}: {r.baseline:,.1f} -> {r.current:,.1f} {r.unit} ({r.change:+.1%})")
+            sys.exit(1)
+
+        click.echo("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from collections import defaultdict
+
+from stable_baselines3.common.callbacks import BaseCallback
+
+from gym_love_letter.envs.profiling import EnvProfiler
+
+
+class ProfilingCallback(BaseCallback):
+    """
+    Logs the profiling stats of the training envs alongside the training metrics.
+
+    Envs must be created with profile=True. Stats are summed across every env
+    of the vectorized env, and logged under the "profile/" prefix at the end
+    of each rollout. The time of each phase is also logged as a share of the
+    total time spent in the envs.
+
+    Args:
+        reset: Clear the envs' stats after logging them, so that each entry
+            covers a single rollout rather than the whole run.
+    """
+
+    def __init__(self, reset: bool = True, verbose: int = 0):
+        super().__init__(verbose)
+        self.reset = reset
+
+    def _on_step(self) -> bool:
+        return True
+
+    def _on_rollout_end(self) -> None:
+        totals: dict[str, float] = defaultdict(float)
+        for stats in self.training_env.env_method("stats"):
+            for key, value in stats.items():
+                totals[key] += value
+
+        for key, value in totals.items():
+            self.logger.record(f"profile/{key}", value)
+
+        total_time = sum(totals[f"{phase}_time"] for phase in EnvProfiler.TOP_LEVEL_PHASES)
+        if total_time > 0:
+            for phase in EnvProfiler.PHASES:
+                self.logger.record(f"profile/{phase}_share", totals[f"{phase}_time"] / total_time)
+
+        if self.reset:
+            self.training_env.env_method("clear_stats")
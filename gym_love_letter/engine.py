@@ -1,6 +1,6 @@
 from __future__ import annotations
 from enum import IntEnum
-from typing import Dict, Optional, Sequence, Set, Tuple, Type
+from typing import Dict, Optional, Sequence, Tuple, Type
 
 import gym
 import numpy as np
@@ -25,6 +25,284 @@ class Card(IntEnum):
         return self in [self.GUARD, self.PRIEST, self.BARON, self.PRINCE, self.KING]
 
 
+class GameState:
+    """
+    The complete state of a game, stored in a single small int8 buffer.
+
+    Deck, Hand and Player are thin views over a GameState, so the rules can
+    read and update the game without allocating objects, and copying `data`
+    captures the entire game.
+
+    Layout of the buffer:
+        counters: deck pointer, discard count, play count, current seat,
+            starting seat and game over flag
+        deck: card order of the deck
+        hands: cards held by each seat, EMPTY for unused slots
+        status: active and safe flags of each seat
+        knowledge: knowledge[i, j] is the card seat i knows seat j holds (from
+            playing a Priest or King), or EMPTY
+        learned: learned[i, j] orders what seat i knows by when it learned it.
+            Stale once the card is forgotten.
+        discard: every discarded card, in order
+        history: one row per card played, see the HISTORY_* columns
+    """
+
+    HAND_SIZE = 2
+
+    ACTIVE = 0
+    SAFE = 1
+
+    HISTORY_ACTION = 0
+    HISTORY_SEAT = 1
+    HISTORY_CARD = 2
+    HISTORY_DISCARDER = 3  # Seat that discarded a card due to the play, or -1
+    HISTORY_DISCARD = 4
+    HISTORY_SIZE = 5
+
+    _POINTER = 0
+    _NUM_DISCARDS = 1
+    _NUM_PLAYS = 2
+    _CURRENT = 3
+    _STARTING = 4
+    _GAME_OVER = 5
+    _NUM_COUNTERS = 6
+
+    def __init__(self, num_players: int, deck_size: int | None = None):
+        if deck_size is None:
+            deck_size = Deck.size()
+
+        self.num_players = num_players
+        self.deck_size = deck_size
+
+        shapes = self._shapes(num_players, deck_size)
+        self.data = np.zeros(self.size(num_players, deck_size), dtype=np.int8)
+
+        self.offsets = {}
+        i = 0
+        for name, shape in shapes.items():
+            size = int(np.prod(shape))
+            setattr(self, name, self.data[i:i + size].reshape(shape))
+            self.offsets[name] = i
+            i += size
+
+        # Single cells are read and written through a memoryview of the same buffer,
+        # which is much cheaper than indexing numpy arrays with scalars.
+        self.cells = memoryview(self.data)
+
+        self.deck[:] = ORDERED_DECK
+
+    @classmethod
+    def _shapes(cls, num_players: int, deck_size: int) -> dict[str, tuple[int, ...]]:
+        return {
+            "counters": (cls._NUM_COUNTERS,),
+            "deck": (deck_size,),
+            "hands": (num_players, cls.HAND_SIZE),
+            "status": (num_players, 2),
+            "knowledge": (num_players, num_players),
+            "learned": (num_players, num_players),
+            "discard": (deck_size - 1,),
+            "history": (deck_size - 1, cls.HISTORY_SIZE),
+        }
+
+    @classmethod
+    def size(cls, num_players: int, deck_size: int | None = None) -> int:
+        """
+        Length of the data buffer for a game with the given number of players.
+        """
+
+        if deck_size is None:
+            deck_size = Deck.size()
+        return sum(int(np.prod(shape)) for shape in cls._shapes(num_players, deck_size).values())
+
+    def __getstate__(self) -> dict:
+        # The views and memoryview can't be pickled, so rebuild them from the buffer
+        return {"num_players": self.num_players, "deck_size": self.deck_size, "data": self.data}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["num_players"], state["deck_size"])
+        self.data[:] = state["data"]
+
+    def reset(self) -> None:
+        """
+        Clear everything and put the deck back in order, for the deck to
+        shuffle. A seeded shuffle then deals the same game whatever was
+        played before.
+        """
+
+        self.data[:] = 0
+        self.deck[:] = ORDERED_DECK
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    @property
+    def pointer(self) -> int:
+        return self.cells[self._POINTER]
+
+    @pointer.setter
+    def pointer(self, value: int) -> None:
+        self.cells[self._POINTER] = int(value)
+
+    @property
+    def num_discards(self) -> int:
+        return self.cells[self._NUM_DISCARDS]
+
+    @num_discards.setter
+    def num_discards(self, value: int) -> None:
+        self.cells[self._NUM_DISCARDS] = int(value)
+
+    @property
+    def num_plays(self) -> int:
+        return self.cells[self._NUM_PLAYS]
+
+    @num_plays.setter
+    def num_plays(self, value: int) -> None:
+        self.cells[self._NUM_PLAYS] = int(value)
+
+    @property
+    def current(self) -> int:
+        return self.cells[self._CURRENT]
+
+    @current.setter
+    def current(self, value: int) -> None:
+        self.cells[self._CURRENT] = int(value)
+
+    @property
+    def starting(self) -> int:
+        return self.cells[self._STARTING]
+
+    @starting.setter
+    def starting(self, value: int) -> None:
+        self.cells[self._STARTING] = int(value)
+
+    @property
+    def game_over(self) -> bool:
+        return bool(self.cells[self._GAME_OVER])
+
+    @game_over.setter
+    def game_over(self, value: bool) -> None:
+        self.cells[self._GAME_OVER] = int(value)
+
+    def status_offset(self, seat: int, flag: int) -> int:
+        """
+        Position of a status flag in `cells`.
+        """
+
+        return self.offsets["status"] + seat * 2 + flag
+
+    def record_discard(self, card: int) -> None:
+        num_discards = self.cells[self._NUM_DISCARDS]
+        self.cells[self.offsets["discard"] + num_discards] = card
+        self.cells[self._NUM_DISCARDS] = num_discards + 1
+
+    def record_play(self, seat: int, card: int) -> int:
+        """
+        Append a card play to the history. Returns the index of the history row,
+        so the remaining columns can be filled in once the play is resolved.
+        """
+
+        index = self.cells[self._NUM_PLAYS]
+        self.history[index] = (-1, seat, card, -1, Card.EMPTY)
+        self.cells[self._NUM_PLAYS] = index + 1
+        return index
+
+    def swap_hands(self, seat1: int, seat2: int) -> None:
+        self.hands[[seat1, seat2]] = self.hands[[seat2, seat1]]
+
+    # The knowledge updates below touch a column or two of a matrix of at
+    # most 4x4 cells, which is far cheaper through `cells` than as numpy
+    # operations. BatchGameState makes the same updates across games.
+
+    def forget(self, seat: int, card: int) -> list[int]:
+        """
+        Other active players stop remembering that the seat holds the card,
+        after it's been discarded.
+
+        Returns:
+            The seats that forgot it.
+        """
+
+        cells = self.cells
+        n = self.num_players
+        cell = self.offsets["knowledge"] + seat
+        active = self.offsets["status"] + self.ACTIVE
+
+        forgot = []
+        for observer in range(n):
+            if cells[cell] == card and observer != seat and cells[active]:
+                cells[cell] = Card.EMPTY
+                forgot.append(observer)
+            cell += n
+            active += 2
+        return forgot
+
+    def forget_player(self, seat: int) -> list[int]:
+        """
+        Active players forget what an eliminated seat held. Inactive players
+        keep it, but it no longer shows up in their observations.
+
+        Returns:
+            The seats that knew what it held.
+        """
+
+        cells = self.cells
+        n = self.num_players
+        cell = self.offsets["knowledge"] + seat
+        active = self.offsets["status"] + self.ACTIVE
+
+        knew = []
+        for observer in range(n):
+            if cells[cell] != Card.EMPTY and observer != seat:
+                if cells[active]:
+                    cells[cell] = Card.EMPTY
+                knew.append(observer)
+            cell += n
+            active += 2
+        return knew
+
+    def learn(self, observer: int, seat: int, card: int) -> None:
+        """
+        The observer learns that the seat holds the card. If it already knew
+        what the seat held, the card keeps its place in the learned order.
+        """
+
+        cells = self.cells
+        n = self.num_players
+        cell = self.offsets["knowledge"] + observer * n + seat
+        if cells[cell] == Card.EMPTY:
+            row = self.offsets["learned"] + observer * n
+            cells[row + seat] = max(cells[row:row + n]) + 1
+        cells[cell] = card
+
+    def swap_knowledge(self, seat1: int, seat2: int) -> None:
+        """
+        Other active players swap what they know about two seats that swapped
+        hands. A card known about only one of them is learned anew.
+        """
+
+        cells = self.cells
+        n = self.num_players
+        row = self.offsets["knowledge"]
+        learned = self.offsets["learned"]
+        active = self.offsets["status"] + self.ACTIVE
+
+        for observer in range(n):
+            if cells[active] and observer != seat1 and observer != seat2:
+                card1, card2 = cells[row + seat1], cells[row + seat2]
+                cells[row + seat1], cells[row + seat2] = card2, card1
+                if (card1 == Card.EMPTY) != (card2 == Card.EMPTY):
+                    moved = seat1 if card1 == Card.EMPTY else seat2
+                    cells[learned + moved] = max(cells[learned:learned + n]) + 1
+            row += n
+            learned += n
+            active += 2
+
+
+# Lookup table for converting stored card values back to Cards
+CARDS = tuple(Card)
+
+
 class Deck:
     card_frequency = {
         Card.GUARD: 5,
@@ -37,11 +315,21 @@ class Deck:
         Card.PRINCESS: 1,
     }
 
-    def __init__(self):
-        self.cards = [
-            card for card, freq in self.card_frequency.items() for i in range(freq)
-        ]
-        self.pointer = 0
+    def __init__(self, state: GameState | None = None):
+        # A standalone deck keeps its own state with no players
+        self.state = state if state is not None else GameState(0)
+
+    @property
+    def cards(self) -> list[Card]:
+        return [CARDS[card] for card in self.state.deck.tolist()]
+
+    @property
+    def pointer(self) -> int:
+        return self.state.pointer
+
+    @pointer.setter
+    def pointer(self, value: int) -> None:
+        self.state.pointer = value
 
     @property
     def np_random(self):
@@ -64,46 +352,57 @@ class Deck:
 
     def shuffle(self) -> None:
         self.pointer = 1  # Effectively discards one card so it's never observed
-        self.np_random.shuffle(self.cards)
+        self.np_random.shuffle(self.state.deck)
 
     def draw(self) -> Card:
-        try:
-            card = self.cards[self.pointer]
-            self.pointer += 1
-        except IndexError as e:
-            raise IndexError("Deck has no more cards") from e
-        return card
+        state = self.state
+        pointer = state.pointer
+        if pointer >= state.deck_size:
+            raise IndexError("Deck has no more cards")
+
+        state.pointer = pointer + 1
+        return CARDS[state.cells[state.offsets["deck"] + pointer]]
 
     def remaining(self) -> int:
-        return len(self.cards) - self.pointer
+        return self.state.deck_size - self.state.pointer
+
+
+# Order of the deck before it's shuffled
+ORDERED_DECK = np.array(
+    [card for card, freq in Deck.card_frequency.items() for _ in range(freq)], dtype=np.int8
+)
 
 
 class Hand:
     MAX_SIZE = 2
 
-    def __init__(self, cards: Sequence[Card] | None = None, max_size: int = MAX_SIZE):
-        self._hand = [Card.EMPTY for i in range(max_size)]
+    def __init__(
+        self,
+        cards: Sequence[Card] | None = None,
+        max_size: int = MAX_SIZE,
+        storage: np.ndarray | None = None,
+    ):
+        """
+        Args:
+            storage: Array to use as the hand's card slots, e.g. a row of
+                GameState.hands. A standalone hand allocates its own.
+        """
+
+        if storage is None:
+            storage = np.zeros(max_size, dtype=np.int8)
+        self._hand = storage
 
         if cards:
-            if len(cards) > max_size:
+            if len(cards) > len(self._hand):
                 raise ValueError("Initialized hand with too many cards")
 
-            for i in range(len(cards)):
-                self._hand[i] = cards[i]
-
-        self._index = 0
+            self._hand[:len(cards)] = cards
 
     def __iter__(self):
-        self._index = 0
-        return self
+        return iter([CARDS[card] for card in self._hand.tolist()])
 
-    def __next__(self):
-        if self._index == len(self._hand):
-            raise StopIteration
-
-        card = self._hand[self._index]
-        self._index += 1
-        return card
+    def __contains__(self, card) -> bool:
+        return card in self._hand.tolist()
 
     @classmethod
     def parse(cls, vector: Sequence) -> Hand:
@@ -116,58 +415,54 @@ class Hand:
         Shortcut to return the only card in the player's hand.
         """
 
-        if all([c != Card.EMPTY for c in self]):
+        hand = self._hand.tolist()
+        if Card.EMPTY not in hand:
             raise ValueError("Expected player to have only one card, but found two")
 
-        for c in self:
+        for c in hand:
             if c != Card.EMPTY:
-                return c
+                return CARDS[c]
 
         return None
         # raise ValueError("Expected player to have one card, but found empty hand")
 
     @property
     def cards(self) -> list[Card]:
-        return [card for card in self if card != Card.EMPTY]
+        return [CARDS[card] for card in self._hand.tolist() if card != Card.EMPTY]
 
     @property
     def full(self) -> bool:
-        return Card.EMPTY not in self
+        return Card.EMPTY not in self._hand.tolist()
 
     @property
     def vector(self) -> list[int]:
-        return [card.value for card in self]
+        return self._hand.tolist()
 
     def add(self, card: Card) -> None:
         """
         Add a card to the player's hand.
         """
 
-        success = False
-        for i in range(len(self._hand)):
-            if self._hand[i] == Card.EMPTY:
-                self._hand[i] = card
-                success = True
-                break
-
-        if not success:
+        hand = self._hand.tolist()
+        if Card.EMPTY not in hand:
             raise ValueError("Player has a full hand and cannot accept more cards")
 
+        self._hand[hand.index(Card.EMPTY)] = card
+
+    def clear(self) -> None:
+        self._hand[:] = Card.EMPTY
+
     def discard(self, card: Card) -> None:
         """
         Remove selected card from player's hand.
         """
 
-        success = False
-        for i in range(len(self._hand)):
-            if self._hand[i] == card:
-                self._hand[i] = Card.EMPTY
-                success = True
-                break
-
-        if not success:
+        hand = self._hand.tolist()
+        if card not in hand:
             raise ValueError(f"Player hand does not contain {card.name}")
 
+        self._hand[hand.index(card)] = Card.EMPTY
+
     def draw(self, deck: Deck) -> None:
         if self.full:
             raise ValueError("Player has a full hand and cannot accept more cards")
@@ -176,18 +471,75 @@ class Hand:
 
 
 class Player:
-    def __init__(self, position: int, name: str | None = None, hand: Hand | None = None):
+    def __init__(
+        self,
+        position: int,
+        name: str | None = None,
+        hand: Hand | None = None,
+        state: GameState | None = None,
+        table: list[Player] | None = None,
+    ):
+        """
+        Args:
+            state: The game state the player is a view over. A standalone player
+                allocates its own.
+            table: Every player sharing the state, indexed by position. Used to
+                resolve the players that priest knowledge refers to.
+        """
+
         self.position = position
         self.name = name if name is not None else f"Player {position + 1}"
         self.agent: Optional[Agent] = None
 
+        self.state = state if state is not None else GameState(position + 1)
+        self.table = table if table is not None else [self]
+        self._hand = Hand(storage=self.state.hands[position])
+        self._active_offset = self.state.status_offset(position, GameState.ACTIVE)
+        self._safe_offset = self.state.status_offset(position, GameState.SAFE)
+
         # State that resets each game via reset()
         self.active = True
         self.safe = False
-        self.hand = hand if hand else Hand()
-        self.play_history: list[Card] = []
-        self.players_eliminated: Set[Player] = set()
-        self._priest_targets: Dict[Player, Card] = {}
+        if hand:
+            self.hand = hand
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_hand"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        # The hand must stay a view over the (copied) game state
+        self.__dict__.update(state)
+        self._hand = Hand(storage=self.state.hands[self.position])
+
+    @property
+    def active(self) -> bool:
+        return bool(self.state.cells[self._active_offset])
+
+    @active.setter
+    def active(self, value: bool) -> None:
+        self.state.cells[self._active_offset] = value
+
+    @property
+    def safe(self) -> bool:
+        return bool(self.state.cells[self._safe_offset])
+
+    @safe.setter
+    def safe(self, value: bool) -> None:
+        self.state.cells[self._safe_offset] = value
+
+    @property
+    def hand(self) -> Hand:
+        return self._hand
+
+    @hand.setter
+    def hand(self, hand: Hand) -> None:
+        """
+        Copies the cards of the given hand into the player's hand.
+        """
+
+        self.state.hands[self.position] = hand.vector
 
     @property
     def card(self) -> Optional[Card]:
@@ -200,30 +552,39 @@ class Player:
 
         return isinstance(self.agent, HumanAgent)
 
+    @property
+    def play_history(self) -> list[Card]:
+        state = self.state
+        plays = state.history[:state.num_plays]
+        mine = plays[:, GameState.HISTORY_SEAT] == self.position
+        return [CARDS[card] for card in plays[mine, GameState.HISTORY_CARD].tolist()]
+
     @property
     def last_played(self) -> Card:
-        if not self.play_history:
+        play_history = self.play_history
+        if not play_history:
             return Card.EMPTY
 
-        return self.play_history[-1]
+        return play_history[-1]
 
     @property
     def status_vector(self) -> Tuple[int, int]:
-        return (self.active, self.safe)
+        cells = self.state.cells
+        return (cells[self._active_offset], cells[self._safe_offset])
 
     def reset(self):
         """
         Initialize player state for the beginning of a game.
 
         Note that the player's agent is not changed. It can be swapped with set_agent().
+        The play history is part of the game history, which is cleared by GameState.reset().
         """
 
         self.active = True
         self.safe = False
-        self.hand = Hand()
-        self.play_history: list[Card] = []
-        self.players_eliminated: Set[Player] = set()
-        self._priest_targets: Dict[Player, Card] = {}
+        self.hand.clear()
+        self.state.knowledge[self.position] = Card.EMPTY
+        self.state.learned[self.position] = 0
 
     def set_agent(self, agent: Agent):
         self.agent = agent
@@ -238,10 +599,10 @@ class Player:
         """
 
         self.active = False
-        hand = self.hand
-        self.hand = Hand()
+        card = self.hand.card
+        self.hand.clear()
 
-        return hand.card
+        return card
 
     def discard(self, card: Card) -> None:
         self.hand.discard(card)
@@ -251,12 +612,15 @@ class Player:
 
     def play(self, card: Card) -> None:
         self.discard(card)
-        self.play_history.append(card)
+        self.state.record_play(self.position, card)
 
     def add_priest_target(self, target: Player) -> None:
         if target == self:
             raise ValueError("Cannot play priest on oneself")
 
+        if target.state is not self.state:
+            raise ValueError("Priest target is not at the same table")
+
         if not target.active or target.safe:
             breakpoint()
             raise ValueError("Invalid priest target")
@@ -264,56 +628,20 @@ class Player:
         if target.card is None:
             raise ValueError("Priest target does not have a card")
 
-        if len(self._priest_targets) == 3 and target not in self._priest_targets:
-            raise ValueError("Cannot add excess priest info")
-
-        self._priest_targets[target] = target.card
+        self.state.learn(self.position, target.position, target.card)
 
     def priest_info(self) -> Dict[Player, Card]:
         """
-        Use this method instead of directly accessing _priest_targets in order
-        to benefit from basic sanity checking.
-        """
-
-        if len(self._priest_targets) > 3:
-            raise ValueError("Excess priest info")
-
-        to_remove = set()
-        for player in self._priest_targets:
-            if not player.active:
-                to_remove.add(player)
-
-        for player in to_remove:
-            del self._priest_targets[player]
-
-        return self._priest_targets
-
-    def remove_priest_target(self, target: Player) -> None:
-        del self._priest_targets[target]
-
-    def swap_priest_knowledge(self, player1: Player, player2: Player) -> None:
-        if player1 == self or player2 == self:
-            raise ValueError("Card knowledge must be for other players")
-
-        if (
-            player1 in self._priest_targets
-            and player2 in self._priest_targets
-        ):
-            cached = self._priest_targets[player1]
-            self._priest_targets[
-                player1
-            ] = self._priest_targets[player2]
-            self._priest_targets[player2] = cached
-        elif player1 in self._priest_targets:
-            self._priest_targets[
-                player2
-            ] = self._priest_targets[player1]
-            self.remove_priest_target(player1)
-        elif player2 in self._priest_targets:
-            self._priest_targets[
-                player1
-            ] = self._priest_targets[player2]
-            self.remove_priest_target(player2)
+        The cards this player knows other active players hold, in the order it
+        learned them.
+        """
+
+        knowledge = self.state.knowledge[self.position].tolist()
+        learned = self.state.learned[self.position].tolist()
+
+        known = [target for target in self.table if knowledge[target.position] != Card.EMPTY and target.active]
+        known.sort(key=lambda target: learned[target.position])
+        return {target: CARDS[knowledge[target.position]] for target in known}
 
     def __repr__(self):
         return f"Player: {self.name}"
@@ -1,10 +1,12 @@
+import dataclasses
+import functools
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from gym_love_letter.engine import Card, Player
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Action:
     card: Card
     target: Optional[int] = None
@@ -12,7 +14,7 @@ class Action:
     _id: int = -1
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ActionWrapper:
     """
     Includes information not needed (or provided) for training.
@@ -93,7 +95,29 @@ def generate_actions(num_players: int) -> List[Action]:
     actions += [Action(Card.COUNTESS)]
 
     # Use the action's position in the list as its id
-    for i in range(len(actions)):
-        actions[i]._id = i
+    return [dataclasses.replace(action, _id=i) for i, action in enumerate(actions)]
 
-    return actions
+
+@functools.lru_cache(maxsize=None)
+def decoded_actions(num_players: int, max_num_players: int) -> Tuple[Tuple[Action, ...], ...]:
+    """
+    Precomputes the "global" equivalent of every action for every seat, indexed
+    by [action_id][seat].
+
+    Actions are chosen relative to the current player's position, so an action
+    that targets relative position 1 targets a different global position for
+    each seat. Since actions are immutable, the decoded actions are interned and
+    shared by every environment with the same number of players.
+    """
+
+    table = []
+    for action in generate_actions(max_num_players):
+        if action.target is None:
+            table.append((action,) * num_players)
+        else:
+            table.append(tuple(
+                dataclasses.replace(action, target=(action.target + seat) % num_players)
+                for seat in range(num_players)
+            ))
+
+    return tuple(table)
@@ -1,73 +1,49 @@
 from __future__ import annotations
 
-import copy
 import itertools
-from typing import TYPE_CHECKING, Any, Callable, Sequence
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Generator, Sequence
 
 import gymnasium as gym
 import numpy as np
 from gymnasium import spaces
 
 from gym_love_letter.agents import RandomAgent
-from gym_love_letter.engine import Card, Deck, Player
+from gym_love_letter.engine import CARDS, Card, Deck, GameState, Player
 from gym_love_letter.envs.actions import (Action, ActionWrapper,
-                                          generate_actions)
-from gym_love_letter.envs.observations import Observation
+                                          decoded_actions, generate_actions)
+from gym_love_letter.envs.masks import mask_table
+from gym_love_letter.envs.observations import Observation, ObservationBuffer
+from gym_love_letter.envs.profiling import EnvProfiler
+from gym_love_letter.envs.rewards import NUM_EVENTS, Event, Rewards
 
 
 if TYPE_CHECKING:
     from gym_love_letter.agents import Agent
+    from gym_love_letter.envs.openings import OpeningPool
 
 
 class InvalidPlayError(ValueError):
     pass
 
 
-class Rewards:
-    @staticmethod
-    def simple_turn_reward(env) -> float:
-        if not env.current_player.active:
-            return 0
-        return 1
+@dataclass
+class ResetStats:
+    """
+    Cumulative counts of the work done by LoveLetterMultiAgentEnv's resets.
+    """
 
-    @staticmethod
-    def game_completion_reward(env) -> float:
-        if not env.current_player.active:
-            return 0
+    resets: int = 0
+    # Games dealt by training resets, and those in which the training agent
+    # was eliminated before its first move
+    deals: int = 0
+    rejected: int = 0
+    opponent_moves: int = 0
+    pool_resets: int = 0
 
-        reward = 1 / len(env.active_players)
-
-        if env.game_over:
-            reward += 5
-
-        return reward
-
-    @staticmethod
-    def game_won_reward(env) -> float:
-        if env.game_over and env.current_player.active:
-            return 1
-
-        return 0
-
-    @staticmethod
-    def fast_elimination_reward(env) -> float:
-        player = env.current_player
-
-        # Reward for surviving a round (after having made a move)
-        reward = 1 if player.active and len(player.play_history) > 0 else 0
-
-        # Extra reward for eliminating other players
-        reward += len(player.players_eliminated) * 3
-        player.players_eliminated = set()  # Reset cache. TODO use a counter for this instead
-
-        # Extra reward for each future action that was prevented
-        if env.game_over and player.active:
-            reward += 10  # Always reward winning
-            reward += env.deck.remaining()
-
-        NORMALIZE_BY = 10
-
-        return reward / NORMALIZE_BY
+    @property
+    def rejection_rate(self) -> float:
+        return self.rejected / self.deals if self.deals else 0.0
 
 
 class LoveLetterBaseEnv(gym.Env):
@@ -80,7 +56,20 @@ class LoveLetterBaseEnv(gym.Env):
         agent_classes: Sequence[type[Agent]] | None = None,
         reward_fn: Callable[[LoveLetterBaseEnv], float] = Rewards.fast_elimination_reward,
         player_names: list[str] | None = None,
+        lazy_observations: bool = False,
+        observation_info: bool = True,
+        profile: bool = False,
     ):
+        """
+        Args:
+            lazy_observations: Defer computing Observation fields like valid_actions
+                until they are accessed.
+            observation_info: Include the Observation in the info dict returned
+                by step(). Disable this during training to skip building it.
+            profile: Time the phases of each step and count games, steps, resets
+                and invalid actions. See stats().
+        """
+
         # If we want to use stable_baselines, our action space cannot be a tuple or Dict
         self.actions = generate_actions(Observation.MAX_NUM_PLAYERS)
         self.action_space: spaces.Discrete = spaces.Discrete(len(self.actions))
@@ -89,27 +78,47 @@ class LoveLetterBaseEnv(gym.Env):
 
         self.num_players = num_players
         self.randomize_player_count = randomize_player_count
+        self.mask_table = mask_table(self.num_players)
+        self.decoded_actions = decoded_actions(self.num_players, Observation.MAX_NUM_PLAYERS)
         self.reward = reward_fn
+        self.lazy_observations = lazy_observations
+        self.observation_info = observation_info
+        self.profiler = EnvProfiler() if profile else None
 
         # Player names are auto-generated if not specified
         if player_names is None:
             player_names = []
 
-        self.players = [
-            Player(i, name=name) for i, name in itertools.zip_longest(range(self.num_players), player_names)
-        ]
+        # The entire game is stored in the state's arrays. Players and the deck are views over it.
+        self.state = GameState(self.num_players)
+
+        # Counts of each Event per player since the start of the game, and the
+        # counts when each player was last rewarded
+        self.events = np.zeros((self.num_players, NUM_EVENTS), dtype=np.int8)
+        self.events_rewarded = np.zeros_like(self.events)
+
+        self.players: list[Player] = []
+        self.players.extend(
+            Player(i, name=name, state=self.state, table=self.players)
+            for i, name in itertools.zip_longest(range(self.num_players), player_names)
+        )
         self.current_player = self.players[0]
         self.starting_player = self.current_player
-        self.winners: list[Player] = []
 
         # Make a new deck
-        self.deck = Deck()
+        self.deck = Deck(self.state)
+
+        # Clear action history
+        self._action_history: list[ActionWrapper] | None = []
 
-        # Clear action history & discard pile
-        self.action_history: list[ActionWrapper] = []
-        self.discard_pile: list[Card] = []
+        # Player observations are updated in place as the game progresses
+        self._obs_buffer = ObservationBuffer(self.num_players, Observation.layout())
 
-        self.game_over = False
+        # Every mutation of the game state bumps the version, which invalidates
+        # state-derived caches such as the valid action mask.
+        self._state_version = 0
+        self._mask_version = -1
+        self._mask = self.mask_table.table[Card.EMPTY, Card.EMPTY, 0]
 
         # Now that the environment has been initialized, provide a reference
         # to each player agent. This allows agents to access the env's
@@ -128,14 +137,137 @@ class LoveLetterBaseEnv(gym.Env):
         for agent, player in zip(self._agents, self.players):
             player.set_agent(agent)
 
+    def stats(self) -> dict[str, float]:
+        """
+        Profiling timers and counters, or an empty dict if profiling is disabled.
+        """
+
+        if self.profiler is None:
+            return {}
+        return self.profiler.stats()
+
+    def clear_stats(self) -> None:
+        if self.profiler is not None:
+            self.profiler.clear()
+
+    @property
+    def current_player(self) -> Player:
+        return self.players[self.state.current]
+
+    @current_player.setter
+    def current_player(self, player: Player) -> None:
+        self.state.current = player.position
+
+    @property
+    def starting_player(self) -> Player:
+        return self.players[self.state.starting]
+
+    @starting_player.setter
+    def starting_player(self, player: Player) -> None:
+        self.state.starting = player.position
+
+    @property
+    def game_over(self) -> bool:
+        return self.state.game_over
+
+    @game_over.setter
+    def game_over(self, game_over: bool) -> None:
+        self.state.game_over = game_over
+
+    @property
+    def winners(self) -> list[Player]:
+        if not self.game_over:
+            return []
+
+        return self.active_players
+
+    @property
+    def action_history(self) -> list[ActionWrapper]:
+        if self._action_history is None:
+            self._action_history = self._decode_history()
+        return self._action_history
+
+    @action_history.setter
+    def action_history(self, history: list[ActionWrapper]) -> None:
+        self._action_history = history
+
+    def _decode_history(self) -> list[ActionWrapper]:
+        state = self.state
+        players = self.players
+        decoded = self.decoded_actions
+
+        return [
+            ActionWrapper(
+                decoded[action_id][seat],
+                players[seat],
+                players[discarder] if discarder >= 0 else None,
+                CARDS[discard] if discarder >= 0 else None,
+            )
+            for action_id, seat, _, discarder, discard in state.history[:state.num_plays].tolist()
+        ]
+
+    @property
+    def discard_pile(self) -> list[Card]:
+        return [CARDS[card] for card in self.state.discard[:self.state.num_discards].tolist()]
+
+    @property
+    def action_id_history(self) -> list[int]:
+        return self.state.history[:self.state.num_plays, GameState.HISTORY_ACTION].tolist()
+
     @property
     def active_players(self) -> list[Player]:
         return [player for player in self.players if player.active]
 
+    def _state_changed(self) -> None:
+        """
+        Must be called after any mutation of the game state. Code that modifies
+        players or the deck directly is responsible for calling it as well.
+        """
+
+        self._state_version += 1
+
+    def _sync_hand(self, player: Player) -> None:
+        self._obs_buffer.set_hand(player.position, player.hand.vector)
+
+    def _sync_status(self, player: Player) -> None:
+        self._obs_buffer.set_status(player.position, player.active, player.safe)
+
+    def _sync_knowledge(self, positions: Sequence[int]) -> None:
+        self._obs_buffer.set_knowledge(self.state, positions)
+
+    def _target_bits(self) -> int:
+        """
+        Bitmask of the seats that can currently be targeted, relative to the
+        current player's position. Bit 0 is the current player.
+        """
+
+        bits = 0
+        position = self.current_player.position
+        for i in range(self.num_players):
+            player = self.players[(position + i) % self.num_players]
+
+            # Never valid to target an inactive or safe player
+            if player.active and not player.safe:
+                bits |= 1 << i
+
+        return bits
+
+    def _legal_mask(self) -> np.ndarray:
+        """
+        The valid action mask for the current decision point. The result is a
+        read-only array shared with the mask table, and is only recomputed
+        after the game state has changed.
+        """
+
+        if self._mask_version != self._state_version:
+            hand = self.current_player.hand.vector
+            self._mask = self.mask_table.lookup(hand, self._target_bits())
+            self._mask_version = self._state_version
+
+        return self._mask
 
     def valid_action_mask(self) -> np.ndarray:
-        mask = [self._valid_action(action) for action in self.actions]
-        return np.array(mask, dtype=np.int8)
+        return self._legal_mask().copy()
 
     @property
     def valid_actions(self) -> list[Action]:
@@ -146,7 +278,7 @@ class LoveLetterBaseEnv(gym.Env):
         current player's position, not the global indexes managed by the env.
         """
 
-        return [a for a in self.actions if self._valid_action(a)]
+        return [self.actions[i] for i in np.flatnonzero(self._legal_mask())]
 
     def _valid_targets(self, card: Card) -> list[int | None]:
         """
@@ -179,24 +311,7 @@ class LoveLetterBaseEnv(gym.Env):
 
 
     def _valid_action(self, action: Action) -> bool:
-        # The empty card is a sentinel value for vectors. It cannot be played.
-        if action.card == Card.EMPTY:
-            return False
-
-        # Cannot play a card you don't have in your hand
-        if action.card not in self.current_player.hand:
-            return False
-
-        if Card.COUNTESS in self.current_player.hand and action.card in [
-            Card.PRINCE,
-            Card.KING,
-        ]:
-            return False
-
-        if action.card.takes_target:
-            return action.target in self._valid_targets(action.card)
-
-        return True
+        return bool(self._legal_mask()[action._id])
 
     def decode_action(self, action_id: int) -> Action:
         """
@@ -206,54 +321,48 @@ class LoveLetterBaseEnv(gym.Env):
         the agent's chosen action into the "global" equivalent.
         """
 
-        action = self.actions[action_id]
-
         # Checks that action targets are active and unprotected, and that there
         # is a target when there ought to be.
-        if action not in self.valid_actions:
+        if not self._legal_mask()[action_id]:
+            if self.profiler is not None:
+                self.profiler.count("invalid_actions")
+
             # I think this is just a hack for now: immediately end the game if play was invalid
             # import ipdb; ipdb.set_trace()
-            raise InvalidPlayError(f"Invalid action {action} played")
-
-        if action.target is not None:
-            action_copy = copy.deepcopy(action)
+            raise InvalidPlayError(f"Invalid action {self.actions[action_id]} played")
 
-            # Decode the action's target into the global index.
-            action_copy.target = (action.target + self.current_player.position) % self.num_players
-            return action_copy
-        else:
-            return action
+        # Decode the action's target into the global index.
+        return self.decoded_actions[action_id][self.current_player.position]
 
     def discard(self, player: Player, card: Card) -> None:
         player.discard(card)
-        self.discard_pile.append(card)
-
-        # Update priest info for all other players
-        for p in self.active_players:
-            if p != player:
-                if p.priest_info().get(player, None) == card:
-                    p.remove_priest_target(player)
+        self.state.record_discard(card)
+        self._state_changed()
+        self._sync_hand(player)
+        self._obs_buffer.record_discard(card)
+        self._sync_knowledge(self.state.forget(player.position, card))
 
     def eliminate(self, player: Player) -> None:
         card = player.eliminate()
         if card is not None:
-            self.discard_pile.append(card)
+            self.state.record_discard(card)
+            self._obs_buffer.record_discard(card)
+        self._state_changed()
+        self._sync_hand(player)
+        self._sync_status(player)
 
-        # Add eliminated player to current player's elimination cache
+        self.events[player.position, Event.OUT] += 1
         if player != self.current_player:
-            self.current_player.players_eliminated.add(player)
+            self.events[self.current_player.position, Event.ELIMINATED] += 1
 
-        # Update priest info for all other players
-        for p in self.active_players:
-            if p != player:
-                # TODO: Address private attribute access
-                if player in p._priest_targets:
-                    p.remove_priest_target(player)
+        self._sync_knowledge(self.state.forget_player(player.position))
 
     def _reset(self) -> Observation:
-        # Clear winners from last game
-        self.winners = []
-        self.game_over = False
+        # Clear the last game, including winners and history
+        self.state.reset()
+        self.events[:] = 0
+        self.events_rewarded[:] = 0
+        self.action_history = []
 
         # Reset player state
         for p in self.players:
@@ -270,24 +379,36 @@ class LoveLetterBaseEnv(gym.Env):
         self.current_player = self.np_random.choice(self.active_players)
         self.starting_player = self.current_player
 
-        # Clear action history & discard pile
-        self.action_history = []
-        self.discard_pile = []
-
         # Shuffle and deal
         self.deck.shuffle()
         for player in self.players:
             player.draw(self.deck)
             if player == self.current_player:
                 player.draw(self.deck)
+        self._state_changed()
+
+        self._obs_buffer.reset()
+        self._obs_buffer.set_deck_remaining(self.deck.remaining())
+        for player in self.players:
+            self._sync_hand(player)
+            self._sync_status(player)
 
         return self.observe()
 
     def reset(self, seed: int | None = None, options: dict[str, Any] | None = None) -> tuple[np.ndarray, dict]:
+        profiler = self.profiler
+        if profiler is not None:
+            start = profiler.now()
+
         super().reset(seed=seed)  # Farama requires this to initialize np_random
         deck_seed = int(self.np_random.integers(2 ** 63))
         self.deck.seed(deck_seed)
-        return self._reset().vector, {}
+        vector = self._reset().vector
+
+        if profiler is not None:
+            profiler.lap("reset", start)
+            profiler.count("resets")
+        return vector, {}
 
     def observe(self) -> Observation:
         return Observation(
@@ -300,17 +421,25 @@ class LoveLetterBaseEnv(gym.Env):
             self.game_over,
             self.winners,
             self,
+            vector=self._obs_buffer.vector(self.current_player.position),
+            lazy=self.lazy_observations,
         )
 
+    def draw(self, player: Player) -> None:
+        player.draw(self.deck)
+        self._state_changed()
+        self._sync_hand(player)
+        self._obs_buffer.set_deck_remaining(self.deck.remaining())
+
     def play(self, card: Card) -> None:
         # Player discards the card they play
         self.current_player.play(card)
-        self.discard_pile.append(card)
-
-        for p in self.active_players:
-            if p != self.current_player:
-                if p.priest_info().get(self.current_player, None) == card:
-                    p.remove_priest_target(self.current_player)
+        self.events[self.current_player.position, Event.PLAYED] += 1
+        self.state.record_discard(card)
+        self._state_changed()
+        self._sync_hand(self.current_player)
+        self._obs_buffer.record_discard(card)
+        self._sync_knowledge(self.state.forget(self.current_player.position, card))
 
     def _check_game_over(self) -> None:
         # If no cards remain, compare hands
@@ -327,7 +456,10 @@ class LoveLetterBaseEnv(gym.Env):
         # If the game has ended, determine winners
         if len(self.active_players) == 1 or self.deck.remaining() == 0:
             self.game_over = True
-            self.winners = self.active_players
+            for player in self.active_players:
+                self.events[player.position, Event.WON] += 1
+            if self.profiler is not None:
+                self.profiler.count("games")
 
     def _next_player(self) -> tuple[np.ndarray, float, bool, bool, dict]:
         # NOTE: The current player may not actually be active, but we still need
@@ -338,24 +470,50 @@ class LoveLetterBaseEnv(gym.Env):
 
         # Unmark new current player as safe
         self.current_player.safe = False
+        self._state_changed()
+        self._sync_status(self.current_player)
+
+        profiler = self.profiler
+        if profiler is not None:
+            start = profiler.now()
 
         # Determine the reward of the current agent
         reward = self.reward(self)
 
-        # Reset new current player's elimination cache after reward has been determined
-        self.current_player.players_eliminated = set()
+        if profiler is not None:
+            start = profiler.lap("reward", start)
+
+        # The new current player's events so far have been rewarded
+        position = self.current_player.position
+        self.events_rewarded[position] = self.events[position]
 
         # Determine whether the new current player's game has ended
         done = not self.current_player.active or self.game_over
         if not done:
-            self.current_player.draw(self.deck)
+            self.draw(self.current_player)
+
+        if not self.observation_info:
+            vector = self._obs_buffer.vector(self.current_player.position)
+            if profiler is not None:
+                profiler.lap("observe", start)
+            return vector, reward, done, False, {}
 
         obs = self.observe()
+        if profiler is not None:
+            profiler.lap("observe", start)
         return obs.vector, reward, done, False, {"observation": obs}
 
     def step(self, action_id: int) -> tuple[np.ndarray, float, bool, bool, dict]:
+        profiler = self.profiler
+        if profiler is not None:
+            step_start = start = profiler.now()
+
         # Validates and reindexes action
         action = self.decode_action(action_id)
+
+        if profiler is not None:
+            start = profiler.lap("decode_action", start)
+
         card = action.card
         discarding_player: Player | None = None
         discard: Card | None = None
@@ -383,6 +541,7 @@ class LoveLetterBaseEnv(gym.Env):
 
                 elif card == Card.PRIEST:
                     self.current_player.add_priest_target(target)
+                    self._sync_knowledge([self.current_player.position])
 
                 elif card == Card.BARON:
                     current_player_card = self.current_player.card
@@ -410,25 +569,30 @@ class LoveLetterBaseEnv(gym.Env):
                         self.eliminate(target)
                     else:
                         try:
-                            target.draw(self.deck)
+                            self.draw(target)
                         except IndexError:
                             self.eliminate(target)
 
                 elif card == Card.KING:
                     # Swap card
-                    current_player_hand = self.current_player.hand
-                    self.current_player.hand = target.hand
-                    target.hand = current_player_hand
-
+                    self.state.swap_hands(self.current_player.position, target.position)
+                    self.events[self.current_player.position, Event.SWAPPED] += 1
+                    self._state_changed()
+                    self._sync_hand(self.current_player)
+                    self._sync_hand(target)
+
+                    # Both players learn each other's new card, and everyone else
+                    # swaps what they know about the two
                     self.current_player.add_priest_target(target)
                     target.add_priest_target(self.current_player)
-
-                    for p in self.active_players:
-                        if p != self.current_player and p != target:
-                            p.swap_priest_knowledge(self.current_player, target)
+                    self.state.swap_knowledge(self.current_player.position, target.position)
+                    self._sync_knowledge(range(self.num_players))
 
         elif card == Card.HANDMAID:
             self.current_player.safe = True
+            self.events[self.current_player.position, Event.PROTECTED] += 1
+            self._state_changed()
+            self._sync_status(self.current_player)
 
         elif card == Card.COUNTESS:
             # Nothing special to do in this case
@@ -443,52 +607,241 @@ class LoveLetterBaseEnv(gym.Env):
         self.action_history.append(
             ActionWrapper(action, self.current_player, discarding_player, discard)
         )
+        history = self.state.history[self.state.num_plays - 1]
+        history[GameState.HISTORY_ACTION] = action._id
+        if discarding_player is not None:
+            history[GameState.HISTORY_DISCARDER] = discarding_player.position
+            history[GameState.HISTORY_DISCARD] = discard
+        self._obs_buffer.record_action(action._id)
+
+        if profiler is not None:
+            start = profiler.lap("effects", start)
 
         self._check_game_over()
 
+        if profiler is not None:
+            profiler.lap("check_game_over", start)
+
         # IMPORTANT: After a card has been played, we change the current player
         # and compute the observation, reward, etc, from that new perspective.
-        return self._next_player()
+        result = self._next_player()
+
+        if profiler is not None:
+            profiler.lap("step", step_start)
+            profiler.count("steps")
+        return result
+
+    def snapshot(self) -> np.ndarray:
+        """
+        Returns a copy of the complete game state as a small int8 vector, which
+        restore() and load() accept.
+
+        The vector is the GameState buffer, followed by the event counters
+        (events, then events_rewarded). It doesn't include the deck's random
+        number generator.
+        """
+
+        return np.concatenate([self.state.data, self.events.ravel(), self.events_rewarded.ravel()])
+
+    def restore(self, snapshot: np.ndarray) -> None:
+        """
+        Returns the game to the state captured by snapshot().
+        """
+
+        state = self.state
+        if len(snapshot) != state.nbytes + 2 * self.events.size:
+            raise ValueError(f"Snapshot doesn't match a game with {self.num_players} players")
+
+        state.data[:] = snapshot[:state.nbytes]
+        self._state_changed()
+
+        events = snapshot[state.nbytes:].reshape(2, *self.events.shape)
+        self.events[:] = events[0]
+        self.events_rewarded[:] = events[1]
+
+        # Rebuild everything derived from the state. The action history is
+        # only decoded if it's used.
+        self._action_history = None
+        self._obs_buffer.load(state)
 
     @classmethod
-    def load(vector: np.array) -> LoveLetterBaseEnv:
-        pass
+    def load(cls, vector: np.ndarray, **kwargs) -> LoveLetterBaseEnv:
+        """
+        Creates an env in the state captured by snapshot(). The number of players
+        is inferred from the length of the vector. Other keyword arguments are
+        passed on to the constructor.
+        """
+
+        for num_players in range(1, Observation.MAX_NUM_PLAYERS + 1):
+            if len(vector) == GameState.size(num_players) + 2 * num_players * NUM_EVENTS:
+                break
+        else:
+            raise ValueError(f"No game state has length {len(vector)}")
+
+        env = cls(num_players=num_players, **kwargs)
+        env.restore(vector)
+        return env
+
+
+# Yields the observation of each opponent that has to move, receives its action
+# id, and returns the result of the step or reset
+Cycle = Generator[np.ndarray, int, tuple]
 
 
 class LoveLetterMultiAgentEnv(LoveLetterBaseEnv):
+    """
+    Plays the moves of every opponent of the training agent, which sits in
+    position 0 unless learner_seat says otherwise.
+
+    step() and reset() ask each opponent's agent for its move as soon as it's
+    needed. Alternatively, begin_step() and begin_reset() pause at every
+    opponent decision and hand the opponent's observation back to the caller,
+    who continues with resume() once it has the action. This lets a vector of
+    envs gather the opponent decisions of all its envs and evaluate them in
+    batches (see play_opponents()).
+    """
+
+    LEARNER_SEATS = ("rotate", "random")
+
+    def __init__(
+        self,
+        *args,
+        learner_seat: int | str = 0,
+        max_reset_deals: int | None = 1000,
+        opening_pool: OpeningPool | None = None,
+        **kwargs,
+    ):
+        """
+        Args:
+            learner_seat: Position of the training agent: a fixed position,
+                "rotate" to move it one seat on with every reset, or "random"
+                to pick one for every reset.
+            max_reset_deals: Deals a training reset may go through before it
+                gives up and raises a RuntimeError, or None for no limit. A
+                deal is rejected when the training agent is eliminated before
+                its first move. See reset_stats.
+            opening_pool: Reset from these pre-simulated openings instead of
+                dealing new games. Overrides learner_seat.
+
+        See LoveLetterBaseEnv for the other arguments.
+        """
+
+        super().__init__(*args, **kwargs)
+
+        if learner_seat not in self.LEARNER_SEATS and learner_seat not in range(self.num_players):
+            raise ValueError(f"Invalid learner seat {learner_seat!r}")
+
+        self.learner_seat = learner_seat
+        # Rotation starts from position 0
+        self.learner_position = learner_seat if isinstance(learner_seat, int) else self.num_players - 1
+        self.max_reset_deals = max_reset_deals
+        self.opening_pool = opening_pool
+        self.reset_stats = ResetStats()
+
+        # The paused step or reset, if any, and the result of the last one
+        self._cycle: Cycle | None = None
+        self.cycle_result: tuple | None = None
+
     def reset(self, seed: int | None = None, options: dict[str, Any] | None = None) -> tuple[np.ndarray, dict]:
+        return self._run(self._reset_cycle(seed, options))
+
+    def _reset_cycle(self, seed: int | None, options: dict[str, Any] | None) -> Cycle:
         options = options or {}
         training = options.get("training", True)
 
+        stats = self.reset_stats
+        stats.resets += 1
+
+        if training and self.opening_pool is not None:
+            # Only seed np_random, there's no need to deal
+            gym.Env.reset(self, seed=seed)
+            stats.pool_resets += 1
+            return self._load_opening(), {}
+
         obs, info = super().reset(seed=seed)
+        if not training:
+            return obs, info
+
+        previous = self.learner_position
+        deals = 0
+        while True:
+            if deals:
+                obs, info = super().reset()
+            deals += 1
+            stats.deals += 1
+
+            seat = self._choose_learner_seat(previous)
+            self.learner_position = seat
+
+            # Play the opponents' moves until the training agent is up
+            terminated = False
+            while self.current_player.position != seat:
+                if not terminated:
+                    action_id = yield obs
+                    obs, _, terminated, _, _ = super().step(action_id)
+                    stats.opponent_moves += 1
+                else:
+                    obs, _, terminated, _, _ = super()._next_player()
 
-        if training:
             # The setup is only valid for training if the training agent hasn't
             # already been eliminated before its first move!
-            valid = not self.game_over and self.current_player.active
+            if not self.game_over and self.current_player.active:
+                return obs, info
 
-            while not valid:
-                obs, info = super().reset()
+            stats.rejected += 1
+            if self.max_reset_deals is not None and deals >= self.max_reset_deals:
+                raise RuntimeError(
+                    f"The training agent was eliminated before its first move in {deals} deals in a row"
+                )
 
-                # Assumes that the training agent is in the 0th position
-                # TODO: Assure that we don't loop forever
-                terminated = False
-                while self.current_player.position != 0:
-                    if not terminated:
-                        player_agent = self.current_player.agent
-                        mask = self.valid_action_mask()
-                        action_id, _ = player_agent.predict(obs, action_masks=mask)
-                        obs, _, terminated, _, _ = super().step(action_id)
-                    else:
-                        obs, _, terminated, _, _ = super()._next_player()
+    def _choose_learner_seat(self, previous: int) -> int:
+        if self.learner_seat == "random":
+            return int(self.np_random.choice([p.position for p in self.active_players]))
+
+        if self.learner_seat == "rotate":
+            for offset in range(1, self.num_players + 1):
+                position = (previous + offset) % self.num_players
+                if self.players[position].active:
+                    return position
+
+        return self.learner_seat
 
-                valid = not self.game_over and self.current_player.active
+    def _load_opening(self) -> np.ndarray:
+        snapshot, seat = self.opening_pool.sample(self.np_random)
+        self.restore(snapshot)
+        self.learner_position = seat
 
-        return obs, info
+        # Nobody has seen the burned card or the rest of the deck yet
+        state = self.state
+        unseen = np.r_[0, state.pointer:state.deck_size]
+        state.deck[unseen] = self.np_random.permutation(state.deck[unseen])
+        self._state_changed()
+
+        return self._obs_buffer.vector(seat)
+
+    def _opponent_action(self, obs: np.ndarray) -> int:
+        """
+        Ask the current player's agent for its move.
+        """
+
+        profiler = self.profiler
+        if profiler is not None:
+            start = profiler.now()
+
+        player_agent = self.current_player.agent
+        mask = self.valid_action_mask()
+        action_id, _ = player_agent.predict(obs, action_masks=mask)
+
+        if profiler is not None:
+            profiler.lap("opponent_predict", start)
+        return action_id
 
     def step(
         self, action_id: int, full_cycle: bool = True
     ) -> tuple[np.ndarray, float, bool, bool, dict]:
+        return self._run(self._step_cycle(action_id, full_cycle))
+
+    def _step_cycle(self, action_id: int, full_cycle: bool) -> Cycle:
         # sanity check
         if self.game_over:
             raise Exception("game over already?")
@@ -503,21 +856,80 @@ class LoveLetterMultiAgentEnv(LoveLetterBaseEnv):
             print(f"Action: {self.actions[action_id]}")
             print(f"Valid Actions: {self.valid_actions}")
             # TODO: Deal with this magic number
-            return obs.vector, -10, True, False, {"observation": obs}
+            info = {"observation": obs} if self.observation_info else {}
+            return obs.vector, -10, True, False, info
 
         if full_cycle:
             # Make a move for every other agent in the game to come back around to the current player
             for i in range(self.num_players - 1):
                 if not terminated:
-                    player_agent = self.current_player.agent
-                    mask = self.valid_action_mask()
-                    action_id, _ = player_agent.predict(obs, action_masks=mask)
+                    action_id = yield obs
                     obs, reward, terminated, truncated, info = super().step(action_id)
                 else:
                     obs, reward, terminated, truncated, info = super()._next_player()
 
         return obs, reward, terminated, truncated, info
 
+    def _run(self, cycle: Cycle) -> tuple:
+        """
+        Runs a step or reset to the end, asking the opponents' agents for their moves.
+        """
+
+        obs = self._begin(cycle)
+        while obs is not None:
+            obs = self.resume(self._opponent_action(obs))
+        return self.cycle_result
+
+    def _begin(self, cycle: Cycle) -> np.ndarray | None:
+        if self._cycle is not None:
+            raise RuntimeError("The env is paused in the middle of a step or reset")
+
+        self._cycle = cycle
+        return self._advance(None)
+
+    def _advance(self, action_id: int | None) -> np.ndarray | None:
+        assert self._cycle is not None, "begin_step() or begin_reset() must be called first"
+        try:
+            return self._cycle.send(action_id)
+        except StopIteration as stop:
+            self._cycle = None
+            self.cycle_result = stop.value
+            return None
+        except BaseException:
+            self._cycle = None
+            raise
+
+    def begin_step(self, action_id: int) -> np.ndarray | None:
+        """
+        Like step(), but pauses whenever an opponent has to move.
+
+        Returns:
+            The observation of the opponent to move, whose valid action mask
+            is valid_action_mask(). Pass its action to resume(). None once the
+            step is complete, and its result is in cycle_result.
+        """
+
+        return self._begin(self._step_cycle(action_id, full_cycle=True))
+
+    def begin_reset(self, seed: int | None = None, options: dict[str, Any] | None = None) -> np.ndarray | None:
+        """
+        Like reset(), but pauses whenever an opponent has to move. See begin_step().
+        """
+
+        return self._begin(self._reset_cycle(seed, options))
+
+    def resume(self, action_id: int) -> np.ndarray | None:
+        """
+        Continue a paused step or reset with the waiting opponent's action.
+        Returns the same as begin_step().
+        """
+
+        return self._advance(action_id)
+
+    @property
+    def paused(self) -> bool:
+        return self._cycle is not None
+
     def protected_step(
         self, action_id: int, *args, **kwargs
     ) -> tuple[np.ndarray, float, bool, bool, dict]:
@@ -527,6 +939,6 @@ class LoveLetterMultiAgentEnv(LoveLetterBaseEnv):
         step() can't raise any. Here, we can.
         """
 
-        if not self.valid_action_mask()[action_id]:
+        if not self._legal_mask()[action_id]:
             raise InvalidPlayError("Invalid action played")
         return self.step(action_id, *args, **kwargs)
@@ -0,0 +1,616 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Optional, Sequence
+
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env.base_vec_env import (VecEnv, VecEnvIndices,
+                                                           VecEnvStepReturn)
+
+from gym_love_letter.engine import ORDERED_DECK, Card, Deck, GameState
+from gym_love_letter.envs.actions import generate_actions
+from gym_love_letter.envs.masks import NO_TARGET, mask_table
+from gym_love_letter.envs.observations import Observation
+from gym_love_letter.envs.rewards import NUM_EVENTS, Event, Rewards
+
+
+ACTIVE = GameState.ACTIVE
+SAFE = GameState.SAFE
+
+# Reward given to the training agent for an invalid action, matching LoveLetterMultiAgentEnv
+INVALID_ACTION_REWARD = -10
+
+
+class BatchGameState:
+    """
+    The state of many independent games, stored in arrays with a leading game
+    dimension. Fields mirror GameState, so a single game can be copied out of the
+    batch with game() and stepped by the regular environment.
+
+    The rule methods take an array of game indexes and apply the same transition
+    to all of them at once. Each game index must appear at most once per call.
+    """
+
+    def __init__(self, num_games: int, num_players: int, deck_size: int | None = None):
+        if deck_size is None:
+            deck_size = Deck.size()
+
+        self.num_games = num_games
+        self.num_players = num_players
+        self.deck_size = deck_size
+        self.mask_table = mask_table(num_players)
+
+        self.pointer = np.zeros(num_games, dtype=np.int8)
+        self.num_discards = np.zeros(num_games, dtype=np.int8)
+        self.num_plays = np.zeros(num_games, dtype=np.int8)
+        self.current = np.zeros(num_games, dtype=np.int8)
+        self.starting = np.zeros(num_games, dtype=np.int8)
+        self.game_over = np.zeros(num_games, dtype=bool)
+
+        self.deck = np.tile(GameState(0, deck_size).deck, (num_games, 1))
+        self.hands = np.zeros((num_games, num_players, GameState.HAND_SIZE), dtype=np.int8)
+        self.status = np.zeros((num_games, num_players, 2), dtype=np.int8)
+        self.knowledge = np.zeros((num_games, num_players, num_players), dtype=np.int8)
+        self.learned = np.zeros((num_games, num_players, num_players), dtype=np.int8)
+        self.discard = np.zeros((num_games, deck_size - 1), dtype=np.int8)
+        self.history = np.zeros((num_games, deck_size - 1, GameState.HISTORY_SIZE), dtype=np.int8)
+
+        # Event counters, as in LoveLetterBaseEnv.events and events_rewarded
+        self.events = np.zeros((num_games, num_players, NUM_EVENTS), dtype=np.int8)
+        self.events_rewarded = np.zeros_like(self.events)
+
+        self._seats = np.arange(num_players)
+
+    def game(self, i: int) -> GameState:
+        """
+        Copy a single game out of the batch.
+        """
+
+        state = GameState(self.num_players, self.deck_size)
+        state.pointer = self.pointer[i]
+        state.num_discards = self.num_discards[i]
+        state.num_plays = self.num_plays[i]
+        state.current = self.current[i]
+        state.starting = self.starting[i]
+        state.game_over = self.game_over[i]
+        state.deck[:] = self.deck[i]
+        state.hands[:] = self.hands[i]
+        state.status[:] = self.status[i]
+        state.knowledge[:] = self.knowledge[i]
+        state.learned[:] = self.learned[i]
+        state.discard[:] = self.discard[i]
+        state.history[:] = self.history[i]
+        return state
+
+    def load(self, i: int, state: GameState) -> None:
+        """
+        Overwrite a single game in the batch.
+        """
+
+        self.pointer[i] = state.pointer
+        self.num_discards[i] = state.num_discards
+        self.num_plays[i] = state.num_plays
+        self.current[i] = state.current
+        self.starting[i] = state.starting
+        self.game_over[i] = state.game_over
+        self.deck[i] = state.deck
+        self.hands[i] = state.hands
+        self.status[i] = state.status
+        self.knowledge[i] = state.knowledge
+        self.learned[i] = state.learned
+        self.discard[i] = state.discard
+        self.history[i] = state.history
+        self.events[i] = 0
+        self.events_rewarded[i] = 0
+
+    def reset(self, games: np.ndarray, rng: np.random.Generator) -> None:
+        """
+        Shuffle, pick a starting player and deal, like LoveLetterBaseEnv.reset().
+        """
+
+        self.num_discards[games] = 0
+        self.num_plays[games] = 0
+        self.game_over[games] = False
+        self.hands[games] = Card.EMPTY
+        self.status[games] = (1, 0)
+        self.knowledge[games] = Card.EMPTY
+        self.learned[games] = 0
+        self.discard[games] = Card.EMPTY
+        self.history[games] = 0
+        self.events[games] = 0
+        self.events_rewarded[games] = 0
+
+        starting = rng.integers(self.num_players, size=len(games))
+        self.starting[games] = starting
+        self.current[games] = starting
+
+        # Effectively discards one card so it's never observed
+        self.deck[games] = rng.permuted(np.tile(ORDERED_DECK, (len(games), 1)), axis=1)
+        self.pointer[games] = 1
+
+        for seat in range(self.num_players):
+            seats = np.full(len(games), seat)
+            self.draw(games, seats)
+
+            # The starting player draws their second card right away
+            starts = starting == seat
+            self.draw(games[starts], seats[starts])
+
+    def active(self, games: np.ndarray) -> np.ndarray:
+        return self.status[games, :, ACTIVE].astype(bool)
+
+    def remaining(self, games: np.ndarray) -> np.ndarray:
+        return self.deck_size - self.pointer[games]
+
+    def done(self, games: np.ndarray) -> np.ndarray:
+        """
+        Whether the current player of each game has nothing left to do.
+        """
+
+        current_active = self.status[games, self.current[games], ACTIVE].astype(bool)
+        return ~current_active | self.game_over[games]
+
+    def single_card(self, games: np.ndarray, seats: np.ndarray) -> np.ndarray:
+        """
+        The card held by players who have one card (or EMPTY if they have none).
+        """
+
+        return self.hands[games, seats].max(axis=1)
+
+    def target_bits(self, games: np.ndarray, seats: np.ndarray) -> np.ndarray:
+        """
+        Bitmask of targetable seats relative to each given seat. See LoveLetterBaseEnv._target_bits().
+        """
+
+        targetable = (self.status[games, :, ACTIVE] & ~self.status[games, :, SAFE]).astype(np.intp)
+        bits = np.zeros(len(games), dtype=np.intp)
+        for i in range(self.num_players):
+            bits |= targetable[np.arange(len(games)), (seats + i) % self.num_players] << i
+
+        return bits
+
+    def legal_masks(self, games: np.ndarray) -> np.ndarray:
+        """
+        Valid action masks of the current player of each game, shape (len(games), num_actions).
+        """
+
+        seats = self.current[games]
+        hands = self.hands[games, seats]
+        return self.mask_table.table[hands[:, 0], hands[:, 1], self.target_bits(games, seats)]
+
+    def observe(self, games: np.ndarray, seats: np.ndarray) -> np.ndarray:
+        """
+        Player observation vectors, laid out like Observation.vector.
+        """
+
+        layout = Observation.layout()
+        n = len(games)
+        rows = np.arange(n)
+        obs = np.zeros((n, layout.player_vec_length), dtype=np.int64)
+
+        obs[:, layout.player_hand] = self.hands[games, seats]
+
+        # Known cards of active players, in the order the player learned them. A
+        # card's slot is the number of known cards that were learned before it.
+        known = self.knowledge[games, seats] * self.status[games, :, ACTIVE]
+        learned = self.learned[games, seats]
+        for i in range(1, self.num_players):
+            targets = (seats + i) % self.num_players
+            cards = known[rows, targets]
+            has = np.flatnonzero(cards)
+            earlier = (known[has] != Card.EMPTY) & (learned[has] < learned[has, targets[has], None])
+            index = layout.player_target_hand_index[earlier.sum(axis=1)]
+            obs[rows[has, None], index] = np.stack([np.full(len(has), i), cards[has]], axis=1)
+
+        for i in range(self.num_players):
+            obs[:, layout.player_status[i]] = self.status[games, (seats + i) % self.num_players]
+
+        obs[:, layout.player_deck_size] = self.remaining(games)
+        obs[:, layout.player_discard] = self.discard[games]
+        obs[:, layout.player_action_history] = self.history[games, :, GameState.HISTORY_ACTION]
+
+        return obs
+
+    def draw(self, games: np.ndarray, seats: np.ndarray) -> None:
+        cards = self.deck[games, self.pointer[games]]
+        self.pointer[games] += 1
+        slot = (self.hands[games, seats, 0] != Card.EMPTY).astype(np.intp)
+        self.hands[games, seats, slot] = cards
+
+    def record_discard(self, games: np.ndarray, cards: np.ndarray) -> None:
+        self.discard[games, self.num_discards[games]] = cards
+        self.num_discards[games] += 1
+
+    def forget(self, games: np.ndarray, seats: np.ndarray, cards: np.ndarray) -> None:
+        """
+        Active players stop remembering that the given seats hold the given cards.
+        """
+
+        knowledge = self.knowledge[games, :, seats]
+        stale = (
+            (knowledge == cards[:, None])
+            & self.active(games)
+            & (self._seats != seats[:, None])
+        )
+        self.knowledge[games, :, seats] = np.where(stale, Card.EMPTY, knowledge)
+
+    def learn(self, games: np.ndarray, observers: np.ndarray, seats: np.ndarray) -> None:
+        """
+        Observers learn the cards held by the given seats, as in GameState.learn().
+        """
+
+        new = self.knowledge[games, observers, seats] == Card.EMPTY
+        g, o = games[new], observers[new]
+        self.learned[g, o, seats[new]] = self.learned[g, o].max(axis=1) + 1
+        self.knowledge[games, observers, seats] = self.single_card(games, seats)
+
+    def discard_card(self, games: np.ndarray, seats: np.ndarray, cards: np.ndarray) -> None:
+        """
+        Remove a card from each player's hand, as in LoveLetterBaseEnv.discard().
+        """
+
+        slot = (self.hands[games, seats, 0] != cards).astype(np.intp)
+        self.hands[games, seats, slot] = Card.EMPTY
+        self.record_discard(games, cards)
+        self.forget(games, seats, cards)
+
+    def eliminate(self, games: np.ndarray, seats: np.ndarray) -> None:
+        """
+        Mark players as out of the game, as in LoveLetterBaseEnv.eliminate().
+        """
+
+        if not len(games):
+            return
+
+        cards = self.single_card(games, seats)
+        held = cards != Card.EMPTY
+        self.record_discard(games[held], cards[held])
+        self.hands[games, seats] = Card.EMPTY
+        self.status[games, seats, ACTIVE] = 0
+
+        current = self.current[games]
+        others = seats != current
+        self.events[games, seats, Event.OUT] += 1
+        self.events[games[others], current[others], Event.ELIMINATED] += 1
+
+        # Active players forget what the eliminated players held
+        knowledge = self.knowledge[games, :, seats]
+        self.knowledge[games, :, seats] = np.where(self.active(games), Card.EMPTY, knowledge)
+
+    def play(self, games: np.ndarray, action_ids: np.ndarray) -> None:
+        """
+        The current player of each game plays the given (valid) action, after which
+        the game over condition is checked. Equivalent to the first half of
+        LoveLetterBaseEnv.step(); call next_player() to complete the turn.
+        """
+
+        table = self.mask_table
+        num_players = self.num_players
+        current = self.current[games]
+        cards = table.action_card[action_ids]
+        relative_targets = table.action_target[action_ids]
+        has_target = relative_targets != NO_TARGET
+        targets = (current + relative_targets) % num_players
+
+        # Player discards the card they play
+        history = self.num_plays[games]
+        self.history[games, history] = np.stack([
+            action_ids,
+            current,
+            cards,
+            np.full(len(games), -1),
+            np.zeros(len(games)),
+        ], axis=1)
+        self.num_plays[games] += 1
+        self.events[games, current, Event.PLAYED] += 1
+        self.discard_card(games, current, cards)
+
+        def select(card):
+            selected = (cards == card) & has_target
+            return games[selected], current[selected], targets[selected], history[selected], selected
+
+        # If the card is guessed correctly, the target is out
+        g, c, t, h, selected = select(Card.GUARD)
+        target_cards = self.single_card(g, t)
+        correct = target_cards == table.action_guess[action_ids[selected]]
+        self._record_discarder(g[correct], h[correct], t[correct], target_cards[correct])
+        self.eliminate(g[correct], t[correct])
+
+        g, c, t, h, _ = select(Card.PRIEST)
+        self.learn(g, c, t)
+
+        # The player with the lower card value is out. If tie, nothing happens.
+        g, c, t, h, _ = select(Card.BARON)
+        current_cards = self.single_card(g, c)
+        target_cards = self.single_card(g, t)
+        loses = np.where(current_cards > target_cards, t, c)
+        tie = current_cards == target_cards
+        lost_cards = np.where(current_cards > target_cards, target_cards, current_cards)
+        g, h, loses, lost_cards = g[~tie], h[~tie], loses[~tie], lost_cards[~tie]
+        self._record_discarder(g, h, loses, lost_cards)
+        self.eliminate(g, loses)
+
+        handmaid = games[cards == Card.HANDMAID]
+        self.status[handmaid, self.current[handmaid], SAFE] = 1
+        self.events[handmaid, self.current[handmaid], Event.PROTECTED] += 1
+
+        # The target discards their card and draws a new one, unless it's the Princess
+        g, c, t, h, _ = select(Card.PRINCE)
+        target_cards = self.single_card(g, t)
+        self.discard_card(g, t, target_cards)
+        self._record_discarder(g, h, t, target_cards)
+        out = (target_cards == Card.PRINCESS) | (self.remaining(g) == 0)
+        self.eliminate(g[out], t[out])
+        self.draw(g[~out], t[~out])
+
+        # Swap hands. Both players learn each other's new card, and everyone else
+        # swaps what they know about the two players.
+        g, c, t, h, _ = select(Card.KING)
+        self.hands[g, c], self.hands[g, t] = self.hands[g, t].copy(), self.hands[g, c].copy()
+        self.events[g, c, Event.SWAPPED] += 1
+        self.learn(g, c, t)
+        self.learn(g, t, c)
+        others = self.active(g) & (self._seats != c[:, None]) & (self._seats != t[:, None])
+        knows_current = self.knowledge[g, :, c]
+        knows_target = self.knowledge[g, :, t]
+        self.knowledge[g, :, c] = np.where(others, knows_target, knows_current)
+        self.knowledge[g, :, t] = np.where(others, knows_current, knows_target)
+
+        # A card known about only one of the two is learned anew
+        stamps = self.learned[g].max(axis=2) + 1
+        unknown_current = knows_current == Card.EMPTY
+        unknown_target = knows_target == Card.EMPTY
+        to_current = others & unknown_current & ~unknown_target
+        to_target = others & unknown_target & ~unknown_current
+        self.learned[g, :, c] = np.where(to_current, stamps, self.learned[g, :, c])
+        self.learned[g, :, t] = np.where(to_target, stamps, self.learned[g, :, t])
+
+        self._check_game_over(games)
+
+    def _record_discarder(
+        self, games: np.ndarray, history: np.ndarray, seats: np.ndarray, cards: np.ndarray
+    ) -> None:
+        self.history[games, history, GameState.HISTORY_DISCARDER] = seats
+        self.history[games, history, GameState.HISTORY_DISCARD] = cards
+
+    def _check_game_over(self, games: np.ndarray) -> None:
+        # If no cards remain, only player(s) with the max value card remain
+        exhausted = self.remaining(games) == 0
+        if exhausted.any():
+            g = games[exhausted]
+            cards = self.hands[g].max(axis=2) * self.status[g, :, ACTIVE]
+            max_cards = cards.max(axis=1)
+            for seat in range(self.num_players):
+                loses = self.status[g, seat, ACTIVE].astype(bool) & (cards[:, seat] != max_cards)
+                self.eliminate(g[loses], np.full(loses.sum(), seat))
+
+        num_active = self.status[games, :, ACTIVE].sum(axis=1)
+        if (num_active <= 0).any():
+            raise RuntimeError("No players remaining")
+
+        ended = games[((num_active == 1) | exhausted) & ~self.game_over[games]]
+        self.game_over[ended] = True
+        self.events[ended, :, Event.WON] += self.status[ended, :, ACTIVE]
+
+    def next_player(
+        self,
+        games: np.ndarray,
+        reward_fn: Optional[Callable[[BatchGameState, np.ndarray], np.ndarray]] = None,
+    ) -> tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Advance each game to the next player, as in LoveLetterBaseEnv._next_player().
+
+        Returns:
+            Whether each new current player is done, and their reward if a reward
+            function was given.
+        """
+
+        current = (self.current[games] + 1) % self.num_players
+        self.current[games] = current
+
+        # Unmark new current player as safe
+        self.status[games, current, SAFE] = 0
+
+        rewards = reward_fn(self, games) if reward_fn is not None else None
+
+        # The new current player's events so far have been rewarded
+        self.events_rewarded[games, current] = self.events[games, current]
+
+        done = self.done(games)
+        self.draw(games[~done], current[~done])
+
+        return done, rewards
+
+    def plays_by_current(self, games: np.ndarray) -> np.ndarray:
+        """
+        Number of cards the current player of each game has played.
+        """
+
+        played = np.arange(self.deck_size - 1) < self.num_plays[games, None]
+        by_current = self.history[games, :, GameState.HISTORY_SEAT] == self.current[games, None]
+        return (played & by_current).sum(axis=1)
+
+
+class BatchRewards:
+    """
+    The reward functions in Rewards, evaluated on the current player of the
+    given games.
+    """
+
+    simple_turn_reward = staticmethod(Rewards.simple_turn_reward.batch)
+    game_completion_reward = staticmethod(Rewards.game_completion_reward.batch)
+    game_won_reward = staticmethod(Rewards.game_won_reward.batch)
+    fast_elimination_reward = staticmethod(Rewards.fast_elimination_reward.batch)
+
+
+OpponentPolicy = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+class BatchLoveLetterEnv(VecEnv):
+    """
+    Plays many games of Love Letter in lockstep, using numpy operations over
+    all of the games at once.
+
+    Like LoveLetterMultiAgentEnv in training mode, the training agent sits in
+    position 0 and each step plays a full cycle: the agent's move, followed by
+    the moves of every opponent. Finished games are reset automatically, and
+    games in which the training agent is eliminated before its first move are
+    dealt again.
+
+    Opponents play uniformly random valid actions by default. Any other
+    opponent_policy is called with the observations and valid action masks of
+    all games waiting on a given seat, and must return an action id for each.
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        num_players: int = 2,
+        reward_fn: Callable[[BatchGameState, np.ndarray], np.ndarray] = BatchRewards.fast_elimination_reward,
+        opponent_policy: OpponentPolicy | None = None,
+        seed: int | None = None,
+    ):
+        self.num_players = num_players
+        self.reward_fn = reward_fn
+        self.opponent_policy = opponent_policy
+        self.render_mode = None
+
+        self.actions = generate_actions(Observation.MAX_NUM_PLAYERS)
+        action_space = spaces.Discrete(len(self.actions))
+        observation_space = Observation.space(int(action_space.n))
+
+        self.state = BatchGameState(num_envs, num_players)
+        self.rng = np.random.default_rng(seed)
+        self._games = np.arange(num_envs)
+        self._actions: np.ndarray | None = None
+
+        super().__init__(num_envs, observation_space, action_space)
+
+    def _opponent_actions(self, games: np.ndarray) -> np.ndarray:
+        masks = self.state.legal_masks(games)
+        if self.opponent_policy is None:
+            # Uniformly random among the valid actions
+            return (self.rng.random(masks.shape) * masks).argmax(axis=1)
+
+        obs = self.state.observe(games, self.state.current[games])
+        return np.asarray(self.opponent_policy(obs, masks))
+
+    def _play_opponents(self, games: np.ndarray) -> np.ndarray:
+        """
+        Finish the current turn of each game and play out opponent turns until the
+        training agent is up again.
+
+        Returns:
+            The training agent's reward when it becomes the current player.
+        """
+
+        state = self.state
+        rewards = np.zeros(len(games), dtype=np.float32)
+        waiting = np.arange(len(games))
+
+        while len(waiting):
+            g = games[waiting]
+            _, reward = state.next_player(g, self.reward_fn)
+
+            returned = state.current[g] == 0
+            rewards[waiting[returned]] = reward[returned]
+            waiting = waiting[~returned]
+
+            g = games[waiting]
+            acting = g[~state.done(g)]
+            state.play(acting, self._opponent_actions(acting))
+
+        return rewards
+
+    def _reset_games(self, games: np.ndarray) -> None:
+        """
+        Deal new games until the training agent gets to make its first move in each.
+        """
+
+        state = self.state
+        pending = games
+        while len(pending):
+            state.reset(pending, self.rng)
+
+            # Opponents who start the game have already drawn their second card
+            starting = pending[state.current[pending] != 0]
+            state.play(starting, self._opponent_actions(starting))
+            self._play_opponents(starting)
+
+            pending = pending[state.done(pending)]
+
+    def reset(self) -> np.ndarray:
+        if self._seeds[0] is not None:
+            self.rng = np.random.default_rng(self._seeds[0])
+        self._reset_seeds()
+
+        self._reset_games(self._games)
+        return self.state.observe(self._games, np.zeros(self.num_envs, dtype=np.intp))
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._actions = np.asarray(actions).reshape(self.num_envs)
+
+    def step_wait(self) -> VecEnvStepReturn:
+        assert self._actions is not None, "step_async() must be called first"
+        state = self.state
+        games = self._games
+        actions = self._actions
+        self._actions = None
+
+        valid = state.legal_masks(games)[np.arange(self.num_envs), actions].astype(bool)
+        rewards = np.full(self.num_envs, INVALID_ACTION_REWARD, dtype=np.float32)
+        dones = ~valid
+
+        g = games[valid]
+        state.play(g, actions[valid])
+        rewards[valid] = self._play_opponents(g)
+        dones[valid] = state.done(g)
+
+        seats = np.zeros(self.num_envs, dtype=np.intp)
+        obs = state.observe(games, seats)
+        infos: list[dict[str, Any]] = [{} for _ in range(self.num_envs)]
+
+        finished = np.flatnonzero(dones)
+        if len(finished):
+            for i in finished:
+                infos[i]["terminal_observation"] = obs[i].copy()
+                infos[i]["TimeLimit.truncated"] = False
+
+            self._reset_games(finished)
+            obs[finished] = state.observe(finished, seats[finished])
+
+        return obs, rewards, dones, infos
+
+    def action_masks(self) -> np.ndarray:
+        """
+        Valid action masks of the training agent in every game, for MaskablePPO.
+        """
+
+        return self.state.legal_masks(self._games)
+
+    def close(self) -> None:
+        pass
+
+    def _indices(self, indices: VecEnvIndices) -> Sequence[int]:
+        if indices is None:
+            return range(self.num_envs)
+        if isinstance(indices, int):
+            return [indices]
+        return indices
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> list[Any]:
+        return [getattr(self, attr_name) for _ in self._indices(indices)]
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices: VecEnvIndices = None, **method_kwargs) -> list[Any]:
+        if method_name == "action_masks":
+            masks = self.action_masks()
+            return [masks[i] for i in self._indices(indices)]
+
+        method = getattr(self, method_name)
+        return [method(*method_args, **method_kwargs) for _ in self._indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class: type, indices: VecEnvIndices = None) -> list[bool]:
+        return [False for _ in self._indices(indices)]
@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, NamedTuple, Sequence
+
+import numpy as np
+
+from gym_love_letter.envs.recording import load_shards, read_index, unpack_masks
+
+
+# Transitions read per batch when filling buffers
+FILL_BATCH_SIZE = 1 << 16
+
+
+class TransitionBatch(NamedTuple):
+    obs: np.ndarray
+    mask: np.ndarray
+    action: np.ndarray
+    reward: np.ndarray
+    done: np.ndarray
+    next_obs: np.ndarray
+
+
+class TrajectoryDataset:
+    """
+    The transitions recorded by TrajectoryRecorder, read straight from the
+    memory-mapped shards.
+
+    A transition is one recorded decision. Its next observation is the
+    observation at the same seat's next decision in the episode. A seat's
+    last decision in an episode is terminal: its done flag is set, and its
+    next observation is all zeros. With a LoveLetterMultiAgentEnv recording
+    this is exactly what step() returned, since only one seat is recorded.
+
+    Batches are gathered with one fancy index per shard, so the cost per
+    transition is a few array copies rather than any Python objects.
+    Shuffling permutes transition indices, and each batch is read in index
+    order for locality. Background threads gather the next batches while
+    the current one is in use.
+
+    Args:
+        directories: One or more recording directories. Episodes from
+            different directories are never linked.
+        mmap: Memory-map the shards. Otherwise they are loaded into memory.
+    """
+
+    def __init__(self, directories: str | Sequence[str], mmap: bool = True):
+        if isinstance(directories, str):
+            directories = [directories]
+
+        self.shards: list[np.ndarray] = []
+        sources = []
+        num_actions = set()
+        for source, directory in enumerate(directories):
+            num_actions.add(read_index(directory)["num_actions"])
+            shards = load_shards(directory, mmap=mmap)
+            self.shards.extend(shards)
+            sources.extend([source] * len(shards))
+
+        if not self.shards:
+            raise ValueError("There are no recorded transitions")
+        if len(num_actions) != 1 or len({shard.dtype for shard in self.shards}) != 1:
+            raise ValueError("All recordings must have the same format")
+
+        self.num_actions = num_actions.pop()
+        self.dtype = self.shards[0].dtype
+        self.obs_size = self.dtype["obs"].shape[0]
+
+        # Each shard's records as rows of bytes, and the bytes of "obs"
+        self._raw = [shard.view(np.uint8).reshape(len(shard), -1) for shard in self.shards]
+        offset = self.dtype.fields["obs"][1]
+        self._obs_columns = slice(offset, offset + self.obs_size)
+        self.starts = np.concatenate([[0], np.cumsum([len(shard) for shard in self.shards])])
+
+        self.trajectory_order, self.next_index = self._link(sources)
+
+    def __len__(self) -> int:
+        return int(self.starts[-1])
+
+    def _link(self, sources: list[int]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns:
+            Every transition's index, ordered by episode, seat and time, and
+            the index of each transition's next transition, or -1.
+        """
+
+        episode = np.concatenate([shard["episode"] for shard in self.shards])
+        seat = np.concatenate([shard["seat"] for shard in self.shards])
+        source = np.repeat(sources, [len(shard) for shard in self.shards])
+
+        # lexsort is stable, so each seat's decisions stay in time order
+        order = np.lexsort((seat, episode, source))
+        a, b = order[:-1], order[1:]
+        linked = (episode[a] == episode[b]) & (seat[a] == seat[b]) & (source[a] == source[b])
+
+        next_index = np.full(len(order), -1, dtype=np.int64)
+        next_index[a[linked]] = b[linked]
+        return order, next_index
+
+    def _rows(self, indices: np.ndarray, columns: slice = slice(None)) -> Iterator[tuple[slice, np.ndarray]]:
+        """
+        Yields the raw bytes of the records, or of a range of their columns,
+        for each shard's run of the sorted indices.
+        """
+
+        bounds = np.searchsorted(indices, self.starts)
+        for s in np.flatnonzero(bounds[1:] > bounds[:-1]).tolist():
+            lo, hi = int(bounds[s]), int(bounds[s + 1])
+            yield slice(lo, hi), self._raw[s][indices[lo:hi] - self.starts[s], columns]
+
+    def gather(self, indices: np.ndarray) -> TransitionBatch:
+        """
+        Returns:
+            The transitions at the given indices, which must be sorted.
+        """
+
+        # Copying whole records as bytes is several times faster than
+        # indexing the structured arrays
+        rows = np.empty((len(indices), self.dtype.itemsize), dtype=np.uint8)
+        for part, chunk in self._rows(indices):
+            rows[part] = chunk
+        records = rows.view(self.dtype)[:, 0]
+
+        next_index = self.next_index[indices]
+        has_next = next_index >= 0
+        done = records["done"] | ~has_next
+
+        next_obs = np.zeros((len(indices), self.obs_size), dtype=np.int8)
+        targets = np.flatnonzero(has_next)
+        targets = targets[np.argsort(next_index[targets], kind="stable")]
+        for part, chunk in self._rows(next_index[targets], self._obs_columns):
+            next_obs[targets[part]] = chunk.view(np.int8)
+
+        return TransitionBatch(
+            records["obs"].copy(),
+            unpack_masks(records["mask"], self.num_actions),
+            records["action"].astype(np.int64),
+            records["reward"].copy(),
+            done,
+            next_obs,
+        )
+
+    def _iterate(self, indices: np.ndarray, batch_size: int, prefetch: int, n_threads: int) -> Iterator[TransitionBatch]:
+        chunks = (np.sort(indices[i:i + batch_size]) for i in range(0, len(indices), batch_size))
+        if prefetch == 0:
+            for chunk in chunks:
+                yield self.gather(chunk)
+            return
+
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(self.gather, chunk))
+                if len(pending) > prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def batches(
+        self,
+        batch_size: int,
+        shuffle: bool = True,
+        seed: int | None = None,
+        drop_last: bool = False,
+        prefetch: int = 2,
+        n_threads: int = 2,
+    ) -> Iterator[TransitionBatch]:
+        """
+        One pass over the dataset.
+
+        Args:
+            drop_last: Skip the last batch if it's smaller than batch_size.
+            prefetch: Batches gathered ahead in the background. 0 gathers
+                each batch when it's needed.
+            n_threads: Threads gathering batches.
+        """
+
+        n = len(self)
+        indices = np.random.default_rng(seed).permutation(n) if shuffle else np.arange(n)
+        if drop_last:
+            indices = indices[:n - n % batch_size]
+        return self._iterate(indices, batch_size, prefetch, n_threads)
+
+    def fill_replay_buffer(self, buffer, shuffle: bool = True, seed: int | None = None) -> int:
+        """
+        Bulk-write transitions into a stable-baselines3 ReplayBuffer, from its
+        current position, as many as fit or the whole dataset if it's
+        smaller. Transitions are spread across the buffer's envs.
+
+        Returns:
+            The number of transitions written.
+        """
+
+        if buffer.optimize_memory_usage:
+            raise ValueError("Buffers that share observations between transitions can't be bulk-filled")
+
+        n_envs = buffer.n_envs
+        count = min(len(self), buffer.buffer_size * n_envs) // n_envs * n_envs
+        indices = np.random.default_rng(seed).permutation(len(self)) if shuffle else np.arange(len(self))
+
+        row = buffer.pos
+        batch_size = max(FILL_BATCH_SIZE // n_envs, 1) * n_envs
+        for batch in self._iterate(indices[:count], batch_size, prefetch=2, n_threads=2):
+            k = len(batch.action) // n_envs
+            rows = np.arange(row, row + k) % buffer.buffer_size
+            buffer.observations[rows] = batch.obs.reshape(k, n_envs, -1)
+            buffer.next_observations[rows] = batch.next_obs.reshape(k, n_envs, -1)
+            buffer.actions[rows] = batch.action.reshape(k, n_envs, -1)
+            buffer.rewards[rows] = batch.reward.reshape(k, n_envs)
+            buffer.dones[rows] = batch.done.reshape(k, n_envs)
+            buffer.timeouts[rows] = 0
+            row += k
+
+        buffer.full = buffer.full or row >= buffer.buffer_size
+        buffer.pos = row % buffer.buffer_size
+        return count
+
+    def fill_rollout_buffer(self, buffer, start: int = 0, policy=None) -> int:
+        """
+        Fill a stable-baselines3 RolloutBuffer (or sb3-contrib's
+        MaskableRolloutBuffer) with whole trajectories, in order. Each env's
+        column of the buffer takes the next buffer_size transitions, starting
+        from the start-th transition in episode, seat and time order and
+        wrapping around at the end.
+
+        With a policy, values and log probabilities are computed by it and
+        returns and advantages are computed, so the buffer is ready for a PPO
+        update. Without one, they are left at zero.
+
+        Returns:
+            The position to start from next time.
+        """
+
+        import torch as th
+
+        size, n_envs = buffer.buffer_size, buffer.n_envs
+        count = size * n_envs
+        positions = (start + np.arange(count)) % len(self)
+        indices = self.trajectory_order[positions]
+
+        # Gather in index order, then put the transitions back in trajectory order
+        order = np.argsort(indices, kind="stable")
+        batch = self.gather(indices[order])
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(count)
+        batch = TransitionBatch(*(field[inverse] for field in batch))
+
+        # Column-major: env e gets transitions e * size to (e + 1) * size - 1
+        def columns(values: np.ndarray) -> np.ndarray:
+            return values.reshape(n_envs, size, *values.shape[1:]).swapaxes(0, 1)
+
+        buffer.reset()
+        buffer.observations[:] = columns(batch.obs).reshape(buffer.observations.shape)
+        buffer.actions[:] = columns(batch.action).reshape(buffer.actions.shape)
+        buffer.rewards[:] = columns(batch.reward)
+
+        starts = np.ones(count, dtype=np.float32)
+        starts[1:] = batch.done[:-1]
+        episode_starts = columns(starts)
+        episode_starts[0] = 1
+        buffer.episode_starts[:] = episode_starts
+
+        masks = columns(batch.mask)
+        if hasattr(buffer, "action_masks"):
+            buffer.action_masks[:] = masks
+
+        if policy is not None:
+            with th.no_grad():
+                for step in range(size):
+                    obs = th.as_tensor(buffer.observations[step], device=policy.device)
+                    actions = th.as_tensor(buffer.actions[step], device=policy.device).flatten()
+                    if hasattr(buffer, "action_masks"):
+                        values, log_prob, _ = policy.evaluate_actions(obs, actions, action_masks=masks[step])
+                    else:
+                        values, log_prob, _ = policy.evaluate_actions(obs, actions)
+                    buffer.values[step] = values.cpu().numpy().flatten()
+                    buffer.log_probs[step] = log_prob.cpu().numpy()
+
+                last_obs = th.as_tensor(columns(batch.next_obs)[-1], device=policy.device)
+                last_values = policy.predict_values(last_obs)
+            buffer.compute_returns_and_advantage(last_values, columns(batch.done)[-1])
+
+        buffer.pos = size
+        buffer.full = True
+        return int((start + count) % len(self))
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import numpy as np
+
+from gym_love_letter.engine import Card, Deck, GameState
+from gym_love_letter.envs.base import LoveLetterBaseEnv
+from gym_love_letter.envs.observations import Observation
+
+
+class DeterminizationSampler:
+    """
+    Samples full game states that are consistent with what one seat knows.
+
+    From the seat's point of view, the hidden cards are the burned card at the
+    bottom of the deck, the undrawn cards, and the hands of its opponents that
+    it hasn't seen with a Priest or King. Together these are exactly the cards
+    that aren't in its own hand, in the discard pile, or known to be held by
+    an opponent. Each sample deals that pool of unseen cards to the hidden
+    slots in a uniformly random order, so there is no rejection step, and K
+    samples are drawn with a single vectorized permutation.
+
+    Information that can only be inferred from the play history, such as a
+    Guard guess that missed, is not taken into account.
+
+    Samples are snapshots (see LoveLetterBaseEnv.snapshot()), so any of them
+    can be loaded into an env with restore(). Other players' knowledge of the
+    hidden hands is rewritten to match each sample. When an opponent is
+    holding two cards, knowledge of its hand refers to its first card.
+
+    Args:
+        env: The game to sample from, or an Observation of it. An observation
+            must be of the env's current state.
+        seat: The position of the player whose information set is sampled.
+            Defaults to the current player, or the observation's player.
+    """
+
+    def __init__(self, env: LoveLetterBaseEnv | Observation, seat: int | None = None):
+        if isinstance(env, Observation):
+            if seat is None:
+                seat = env.curr_player.position
+            env = env._env
+
+        if seat is None:
+            seat = env.current_player.position
+
+        self.env = env
+        self.seat = seat
+        self.snapshot = env.snapshot()
+
+        state = env.state
+        offsets = state.offsets
+        num_players = state.num_players
+        hands = state.hands.tolist()
+        knowledge = state.knowledge.tolist()
+        active = state.status[:, GameState.ACTIVE].tolist()
+
+        # Every card the seat can see
+        seen = [card for card in hands[seat] if card != Card.EMPTY]
+        seen += state.discard[:state.num_discards].tolist()
+
+        # Offsets into the snapshot of each hidden card, and of the knowledge
+        # entries that must be rewritten to match a hidden card
+        hidden: list[int] = []
+        knowledge_fixes: list[tuple[int, int]] = []
+
+        for position in range(num_players):
+            if position == seat:
+                continue
+
+            hand = hands[position]
+            known = knowledge[seat][position] if active[position] else Card.EMPTY
+            for slot, card in enumerate(hand):
+                if card == Card.EMPTY:
+                    continue
+
+                if card == known:
+                    seen.append(card)
+                    known = Card.EMPTY
+                else:
+                    hidden.append(offsets["hands"] + position * GameState.HAND_SIZE + slot)
+
+            first_slot = next((s for s, card in enumerate(hand) if card != Card.EMPTY), None)
+            first_offset = offsets["hands"] + position * GameState.HAND_SIZE + (first_slot or 0)
+            if first_slot is not None and first_offset in hidden:
+                for observer in range(num_players):
+                    if observer != seat and knowledge[observer][position] != Card.EMPTY:
+                        knowledge_fixes.append((offsets["knowledge"] + observer * num_players + position, first_offset))
+
+        # The burned card and the rest of the deck
+        hidden.append(offsets["deck"])
+        hidden.extend(range(offsets["deck"] + state.pointer, offsets["deck"] + state.deck_size))
+
+        counts = np.zeros(len(Card), dtype=np.int64)
+        for card, frequency in Deck.card_frequency.items():
+            counts[card] = frequency
+        counts -= np.bincount(seen, minlength=len(Card))
+        if (counts < 0).any() or counts.sum() != len(hidden):
+            raise RuntimeError("The seat's information is inconsistent with the deck")
+
+        self.pool = np.repeat(np.arange(len(Card), dtype=np.int8), counts)
+        self.hidden = np.array(hidden, dtype=np.intp)
+        self.knowledge_targets = np.array([target for target, _ in knowledge_fixes], dtype=np.intp)
+        self.knowledge_sources = np.array([source for _, source in knowledge_fixes], dtype=np.intp)
+
+    def sample(self, k: int, rng: np.random.Generator | int | None = None) -> np.ndarray:
+        """
+        Returns:
+            An array of k snapshots, one per row.
+        """
+
+        rng = np.random.default_rng(rng)
+
+        samples = np.tile(self.snapshot, (k, 1))
+        if len(self.pool):
+            # Random keys sorted per row give k independent uniform permutations
+            order = rng.random((k, len(self.pool))).argsort(axis=1)
+            samples[:, self.hidden] = self.pool[order]
+            samples[:, self.knowledge_targets] = samples[:, self.knowledge_sources]
+
+        return samples
+
+
+def sample_determinizations(
+    env: LoveLetterBaseEnv | Observation,
+    k: int,
+    seat: int | None = None,
+    rng: np.random.Generator | int | None = None,
+) -> np.ndarray:
+    """
+    Samples k full game states consistent with what the given seat knows.
+    See DeterminizationSampler.
+    """
+
+    return DeterminizationSampler(env, seat).sample(k, rng)
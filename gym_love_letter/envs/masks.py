@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import functools
+from typing import List, Sequence
+
+import numpy as np
+
+from gym_love_letter.engine import Card
+from gym_love_letter.envs.actions import Action, generate_actions
+from gym_love_letter.envs.observations import Observation
+
+
+# Sentinel used in the action_target array for actions played without a target
+NO_TARGET = -1
+
+
+class ActionMaskTable:
+    """
+    Precomputed valid action masks for a fixed number of players.
+
+    A player's legal moves only depend on the cards in their hand (which
+    includes whether they hold the Countess) and on which seats, relative to
+    their own, can currently be targeted. There are few enough combinations
+    of these that every mask can be computed ahead of time and looked up
+    instead of re-deriving it from the game state on every step.
+
+    Use mask_table() rather than constructing tables directly, so that
+    tables are shared across environments.
+    """
+
+    def __init__(self, num_players: int, actions: List[Action]):
+        self.num_players = num_players
+        self.num_actions = len(actions)
+
+        # Flat views of the action encoding, indexed by action id
+        self.action_card = np.array([a.card for a in actions], dtype=np.int8)
+        self.action_target = np.array(
+            [NO_TARGET if a.target is None else a.target for a in actions], dtype=np.int8
+        )
+        self.action_guess = np.array(
+            [Card.EMPTY if a.guess is None else a.guess for a in actions], dtype=np.int8
+        )
+
+        self.card_masks = self._build_card_masks()
+        self.table = self._build_table()
+
+        # Rows of the table are handed out directly, so they must never be mutated
+        self.action_card.flags.writeable = False
+        self.action_target.flags.writeable = False
+        self.action_guess.flags.writeable = False
+        self.card_masks.flags.writeable = False
+        self.table.flags.writeable = False
+
+    @property
+    def num_target_sets(self) -> int:
+        return 1 << self.num_players
+
+    def _build_card_masks(self) -> np.ndarray:
+        """
+        Valid actions for playing a single card, indexed by [card, targets],
+        where targets is a bitmask of targetable seats relative to the player.
+        """
+
+        masks = np.zeros((len(Card), self.num_target_sets, self.num_actions), dtype=np.int8)
+        targeted = self.action_target != NO_TARGET
+
+        for card in Card:
+            if card == Card.EMPTY:
+                # The empty card is a sentinel value for vectors. It cannot be played.
+                continue
+
+            same_card = self.action_card == card
+
+            if not card.takes_target:
+                masks[card, :] = same_card
+                continue
+
+            for targets in range(self.num_target_sets):
+                # Only Prince can be used to target oneself
+                if card != Card.PRINCE:
+                    targets_without_self = targets & ~1
+                else:
+                    targets_without_self = targets
+
+                if targets_without_self == 0:
+                    # Many cards require a target _unless_ there's no legal target,
+                    # in which case they can be played with no target.
+                    masks[card, targets] = same_card & ~targeted
+                else:
+                    seats = [s for s in range(self.num_players) if targets_without_self & (1 << s)]
+                    masks[card, targets] = same_card & np.isin(self.action_target, seats)
+
+        return masks
+
+    def _build_table(self) -> np.ndarray:
+        """
+        Valid actions for a full hand, indexed by [card, card, targets].
+
+        The table is symmetric in the two cards, so hands can be looked up
+        without sorting them first.
+        """
+
+        table = np.zeros(
+            (len(Card), len(Card), self.num_target_sets, self.num_actions), dtype=np.int8
+        )
+        countess_blocked = np.isin(self.action_card, [Card.PRINCE, Card.KING])
+
+        for first in Card:
+            for second in Card:
+                if second < first:
+                    continue
+
+                mask = self.card_masks[first] | self.card_masks[second]
+                if Card.COUNTESS in (first, second):
+                    mask = mask & ~countess_blocked
+
+                table[first, second] = mask
+                table[second, first] = mask
+
+        return table
+
+    def lookup(self, hand: Sequence[int], targets: int) -> np.ndarray:
+        """
+        Returns the (read-only) valid action mask for a hand of one or two
+        cards, given the bitmask of targetable seats relative to the player.
+        """
+
+        if len(hand) == 1:
+            return self.table[hand[0], Card.EMPTY, targets]
+
+        return self.table[hand[0], hand[1], targets]
+
+
+@functools.lru_cache(maxsize=None)
+def mask_table(num_players: int) -> ActionMaskTable:
+    """
+    Returns the shared mask table for a game with the given number of players.
+    """
+
+    return ActionMaskTable(num_players, generate_actions(Observation.MAX_NUM_PLAYERS))
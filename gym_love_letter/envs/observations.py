@@ -1,11 +1,341 @@
-from typing import List
+import functools
+from typing import List, Optional, Sequence, Tuple
 
 import numpy as np
 import gymnasium as gym
 from gymnasium import spaces
 
-from gym_love_letter.engine import Card, Deck, Player
-from gym_love_letter.envs.actions import ActionWrapper
+from gym_love_letter.engine import Card, Deck, GameState, Player
+from gym_love_letter.envs.actions import Action, ActionWrapper
+
+
+class ObservationLayout:
+    """
+    Positions of each piece of information in the "player" and "full"
+    observation vectors.
+
+    The layout only depends on the table size and the deck, so it is computed
+    once per configuration and shared by every Observation. Use
+    Observation.layout() to get the layout used by the environments, e.g. to
+    decode observation vectors in a policy.
+    """
+
+    def __init__(
+        self,
+        max_num_players: int,
+        deck_size: int,
+        current_hand_size: int,
+        priest_slots: int,
+        priest_slot_size: int,
+        status_size: int,
+    ):
+        self.max_num_players = max_num_players
+        self.deck_size = deck_size
+
+        # One card is held out from the deck each game
+        self.discard_size = deck_size - 1
+
+        # Cannot be more actions than there are played cards
+        self.action_history_size = self.discard_size
+
+        self._init_player_vector(current_hand_size, priest_slots, priest_slot_size, status_size)
+        self._init_full_vector(current_hand_size, priest_slots, priest_slot_size, status_size)
+
+    def _init_player_vector(
+        self, current_hand_size: int, priest_slots: int, priest_slot_size: int, status_size: int
+    ):
+        # Position of information in the "player" observation vector
+        i = 0
+        self.player_hand = slice(i, i + current_hand_size)
+        i += current_hand_size
+
+        # Remembered information about other player hands (from playing a Priest or King).
+        # NB: Non-current players have fewer cards.
+        self.player_target_hand = []
+        for slot in range(priest_slots):
+            self.player_target_hand.append(slice(i, i + priest_slot_size))
+            i += priest_slot_size
+
+        self.player_status = []
+        for pos in range(self.max_num_players):
+            self.player_status.append(slice(i, i + status_size))
+            i += status_size
+
+        self.player_deck_size = i
+        i += 1
+
+        self.player_discard = slice(i, i + self.discard_size)
+        i += self.discard_size
+
+        self.player_action_history = slice(i, i + self.action_history_size)
+        i += self.action_history_size
+
+        self.player_vec_length = i
+
+        # Index arrays for filling several sections with one assignment
+        self.player_target_hand_index = _slices_to_index(self.player_target_hand)
+        self.player_status_index = _slices_to_index(self.player_status)
+
+    def _init_full_vector(
+        self, current_hand_size: int, priest_slots: int, priest_slot_size: int, status_size: int
+    ):
+        # Position of information in the "full" observation vector
+        i = 0
+
+        self.num_players_pos = i
+        i += 1
+
+        self.full_hand = []
+        for pos in range(self.max_num_players):
+            self.full_hand.append(slice(i, i + current_hand_size))
+            i += current_hand_size
+
+        # Remembered information about other player hands (from playing a Priest or King).
+        # NB: Non-current players have fewer cards.
+        self.full_target_hand = []
+        for pos in range(self.max_num_players):
+            slots = []
+            for slot in range(priest_slots):
+                slots.append(slice(i, i + priest_slot_size))
+                i += priest_slot_size
+
+            self.full_target_hand.append(slots)
+
+        self.full_status = []
+        for pos in range(self.max_num_players):
+            self.full_status.append(slice(i, i + status_size))
+            i += status_size
+
+        self.full_deck_size = i
+        i += 1
+
+        self.full_discard = slice(i, i + self.discard_size)
+        i += self.discard_size
+
+        self.full_action_history = slice(i, i + self.action_history_size)
+        i += self.action_history_size
+
+        self.full_vec_length = i
+
+        # Index arrays for filling several sections with one assignment
+        self.full_hand_index = _slices_to_index(self.full_hand)
+        self.full_target_hand_index = np.stack(
+            [_slices_to_index(slots) for slots in self.full_target_hand]
+        )
+        self.full_status_index = _slices_to_index(self.full_status)
+
+
+def _slices_to_index(slices: List[slice]) -> np.ndarray:
+    index = np.array([np.arange(s.start, s.stop) for s in slices], dtype=np.intp)
+    index.flags.writeable = False
+    return index
+
+
+@functools.lru_cache(maxsize=None)
+def observation_layout(
+    max_num_players: int,
+    deck_size: int,
+    current_hand_size: int,
+    priest_slots: int,
+    priest_slot_size: int,
+    status_size: int,
+) -> ObservationLayout:
+    """
+    Returns the shared layout for the given configuration.
+    """
+
+    return ObservationLayout(
+        max_num_players, deck_size, current_hand_size, priest_slots, priest_slot_size, status_size
+    )
+
+
+def known_cards(
+    knowledge: List[List[int]], learned: List[List[int]], active: List[int], observer: int
+) -> List[Tuple[int, int]]:
+    """
+    The cards a seat knows active players hold, as (relative target, card)
+    pairs in the order it learned them. knowledge, learned and active are the
+    GameState's knowledge and learned matrices and active flags, as lists.
+    """
+
+    num_players = len(active)
+    row = knowledge[observer]
+    order = learned[observer]
+    empty = int(Card.EMPTY)
+    known = []
+    for i in range(1, num_players):
+        target = (observer + i) % num_players
+        card = row[target]
+        if card != empty and active[target]:
+            known.append((order[target], i, card))
+    known.sort()
+    return [(i, card) for _, i, card in known]
+
+
+class ObservationBuffer:
+    """
+    Preallocated "player" observation vectors, one per seat.
+
+    Most of an observation is game history (discards and actions) that only
+    grows by one entry per step, so rather than re-encoding it on every
+    observe(), the env writes each change into every seat's vector as it
+    happens. Reading an observation is then a single row copy.
+    """
+
+    def __init__(self, num_players: int, layout: ObservationLayout):
+        self.num_players = num_players
+        self.layout = layout
+        self.vectors = np.zeros((num_players, layout.player_vec_length), dtype=np.int64)
+
+        self._num_discards = 0
+        self._num_actions = 0
+
+        # Statuses are listed relative to the observing seat: the status of
+        # seat `position` is found at slot (position - observer) % num_players.
+        self._observers = np.arange(num_players)
+        self._status_index = np.array([
+            [layout.player_status_index[(position - observer) % num_players]
+             for position in range(num_players)]
+            for observer in range(num_players)
+        ])
+        self._slot_columns = [tuple(slot) for slot in layout.player_target_hand_index.tolist()]
+
+        self._cells = memoryview(self.vectors.reshape(-1))
+
+        # Built on the first load(), since it depends on the layout of the state
+        self._gather: Optional[np.ndarray] = None
+        self._gather_size = 0
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_cells"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._cells = memoryview(self.vectors.reshape(-1))
+
+    def reset(self) -> None:
+        self.vectors.fill(0)
+        self._num_discards = 0
+        self._num_actions = 0
+
+    def vector(self, position: int) -> np.ndarray:
+        return self.vectors[position].copy()
+
+    def set_hand(self, position: int, hand: Sequence[int]) -> None:
+        self.vectors[position, self.layout.player_hand] = hand
+
+    def set_knowledge(self, state: GameState, observers: Sequence[int]) -> None:
+        """
+        Rewrites the remembered cards of the given seats from the state's
+        knowledge matrix.
+        """
+
+        if not len(observers):
+            return
+
+        # There are few remembered cards, so they're written one cell at a time
+        knowledge = state.knowledge.tolist()
+        learned = state.learned.tolist()
+        active = state.status[:, GameState.ACTIVE].tolist()
+        slot_columns = self._slot_columns
+        cells = self._cells
+        length = self.layout.player_vec_length
+        num_players = self.num_players
+        empty = int(Card.EMPTY)
+        for observer in observers:
+            # Inlined known_cards(), since this runs on every restore
+            row = observer * length
+            known = knowledge[observer]
+            order = learned[observer]
+            found = []
+            for i in range(1, num_players):
+                target = (observer + i) % num_players
+                card = known[target]
+                if card != empty and active[target]:
+                    found.append((order[target], i, card))
+            if len(found) > 1:
+                found.sort()
+
+            for (_, i, card), (target_column, card_column) in zip(found, slot_columns):
+                cells[row + target_column] = i
+                cells[row + card_column] = card
+
+            # Clear the slots after them, up to the first one that's already clear
+            for target_column, card_column in slot_columns[len(found):]:
+                if not cells[row + target_column]:
+                    break
+                cells[row + target_column] = 0
+                cells[row + card_column] = 0
+
+    def set_status(self, position: int, active: bool, safe: bool) -> None:
+        self.vectors[self._observers[:, None], self._status_index[:, position]] = (active, safe)
+
+    def set_deck_remaining(self, remaining: int) -> None:
+        self.vectors[:, self.layout.player_deck_size] = remaining
+
+    def record_discard(self, card: Card) -> None:
+        self.vectors[:, self.layout.player_discard.start + self._num_discards] = card
+        self._num_discards += 1
+
+    def record_action(self, action_id: int) -> None:
+        self.vectors[:, self.layout.player_action_history.start + self._num_actions] = action_id
+        self._num_actions += 1
+
+    def _build_gather(self, state: GameState) -> np.ndarray:
+        """
+        Index of the cell of [state.data, 0, deck size] that each vector entry is read from.
+        """
+
+        layout = self.layout
+        zero = state.nbytes
+        gather = np.full(self.vectors.shape, zero, dtype=np.intp)
+        offsets = state.offsets
+
+        for observer in range(self.num_players):
+            row = gather[observer]
+            row[layout.player_hand] = offsets["hands"] + observer * GameState.HAND_SIZE + np.arange(GameState.HAND_SIZE)
+            for position in range(self.num_players):
+                row[self._status_index[observer, position]] = offsets["status"] + position * 2 + np.arange(2)
+            row[layout.player_deck_size] = zero + 1
+
+            discard = layout.player_discard
+            row[discard] = offsets["discard"] + np.arange(layout.discard_size)
+
+            history = layout.player_action_history
+            row[history] = (
+                offsets["history"]
+                + np.arange(layout.action_history_size) * GameState.HISTORY_SIZE
+                + GameState.HISTORY_ACTION
+            )
+
+        self._gather_source = np.zeros(zero + 2, dtype=self.vectors.dtype)
+        return gather
+
+    def load(self, state: GameState) -> None:
+        """
+        Rebuilds every seat's vector from a game state, e.g. after restoring a snapshot.
+        """
+
+        vectors = self.vectors
+        if self._gather is None or self._gather_size != state.nbytes:
+            self._gather = self._build_gather(state)
+            self._gather_size = state.nbytes
+
+        # Everything but the priest slots is a copy of some cell of the state,
+        # except for the deck size, which is stored at the end of the source
+        # after a cell that is always zero.
+        source = self._gather_source
+        source[:state.nbytes] = state.data
+        source[state.nbytes] = 0
+        source[state.nbytes + 1] = state.deck_size - state.pointer
+        np.take(source, self._gather, out=vectors)
+
+        self._num_discards = state.num_discards
+        self._num_actions = state.num_plays
+
+        self.set_knowledge(state, range(self.num_players))
 
 
 class Observation:
@@ -30,7 +360,17 @@ class Observation:
         game_over: bool,
         winners: List[Player],
         env: gym.Env,
+        vector: Optional[np.ndarray] = None,
+        lazy: bool = False,
     ):
+        """
+        Args:
+            vector: The encoded player observation, if already known.
+            lazy: Defer evaluating valid_actions until it is accessed. Lazy fields
+                reflect the env's state at access time, so they must be read before
+                the env is stepped again.
+        """
+
         self.num_players = num_players
         self.players = players
         self.curr_player = curr_player
@@ -39,84 +379,42 @@ class Observation:
         self.plays = plays
         self.game_over = game_over
         self.winners = winners
-        self.valid_actions = env.valid_actions
 
-        self._init_player_vector_internals()
-        self._init_full_vector_internals()
+        self._env = env
+        self._valid_actions: Optional[List[Action]] = None
+        if not lazy:
+            self._valid_actions = env.valid_actions
 
-    def _init_player_vector_internals(self):
-        # Position of information in the "player" observation vector
-        i = 0
-        self._player_hand_pos = slice(i, i + self.CURRENT_HAND_SIZE)
-        i += self.CURRENT_HAND_SIZE
+        self._layout = self.layout()
 
-        # Remembered information about other player hands (from playing a Priest or King).
-        # NB: Non-current players have fewer cards.
-        self._player_target_hand_pos = []
-        for slot in range(self.PRIEST_SLOTS):
-            self._player_target_hand_pos.append(slice(i, i + self.PRIEST_SLOT_SIZE))
-            i += self.PRIEST_SLOT_SIZE
-
-        self._player_status_pos = []
-        for pos in range(self.MAX_NUM_PLAYERS):
-            self._player_status_pos.append(slice(i, i + self.STATUS_SIZE))
-            i += self.STATUS_SIZE
-
-        self._player_deck_size_pos = i
-        i += 1
+        # The env may provide the vector from its ObservationBuffer
+        self._vector = vector
 
-        self._discard_size = self.deck.size() - 1
-        self._player_discard_pos = slice(i, i + self._discard_size)
-        i += self._discard_size
-
-        # Cannot be more actions than there are played cards
-        self._action_history_size = self._discard_size
-        self._player_action_history_pos = slice(i, i + self._action_history_size)
-        i += self._action_history_size
-
-        self.player_vec_length = i
-
-    def _init_full_vector_internals(self):
-        # Position of information in the "full" observation vector
-        i = 0
-
-        self._num_players_pos = i
-        i += 1
-
-        self._full_hand_pos = []
-        for pos in range(self.MAX_NUM_PLAYERS):
-            self._full_hand_pos.append(slice(i, i + self.CURRENT_HAND_SIZE))
-            i += self.CURRENT_HAND_SIZE
-
-        # Remembered information about other player hands (from playing a Priest or King).
-        # NB: Non-current players have fewer cards.
-        self._full_target_hand_pos = []
-        for pos in range(self.MAX_NUM_PLAYERS):
-            slots = []
-            for slot in range(self.PRIEST_SLOTS):
-                slots.append(slice(i, i + self.PRIEST_SLOT_SIZE))
-                i += self.PRIEST_SLOT_SIZE
-
-            self._full_target_hand_pos.append(slots)
-
-        self._full_status_pos = []
-        for pos in range(self.MAX_NUM_PLAYERS):
-            self._full_status_pos.append(slice(i, i + self.STATUS_SIZE))
-            i += self.STATUS_SIZE
+    @classmethod
+    def layout(cls) -> ObservationLayout:
+        return observation_layout(
+            cls.MAX_NUM_PLAYERS,
+            Deck.size(),
+            cls.CURRENT_HAND_SIZE,
+            cls.PRIEST_SLOTS,
+            cls.PRIEST_SLOT_SIZE,
+            cls.STATUS_SIZE,
+        )
 
-        self._full_deck_size_pos = i
-        i += 1
+    @property
+    def valid_actions(self) -> List[Action]:
+        if self._valid_actions is None:
+            self._valid_actions = self._env.valid_actions
 
-        self._discard_size = self.deck.size() - 1
-        self._full_discard_pos = slice(i, i + self._discard_size)
-        i += self._discard_size
+        return self._valid_actions
 
-        # Cannot be more actions than there are played cards
-        self._action_history_size = self._discard_size
-        self._full_action_history_pos = slice(i, i + self._action_history_size)
-        i += self._action_history_size
+    @property
+    def player_vec_length(self) -> int:
+        return self._layout.player_vec_length
 
-        self.full_vec_length = i
+    @property
+    def full_vec_length(self) -> int:
+        return self._layout.full_vec_length
 
     @property
     def vector(self) -> np.ndarray:
@@ -124,33 +422,37 @@ class Observation:
         Encodes the game state visible to the current player.
         """
 
-        vec = np.zeros(self.player_vec_length, dtype=np.int64)
+        if self._vector is not None:
+            return self._vector
+
+        layout = self._layout
+        vec = np.zeros(layout.player_vec_length, dtype=np.int64)
 
         # Start the vector with the current player's hand
-        vec[self._player_hand_pos] = self.curr_player.hand.vector
+        vec[layout.player_hand] = self.curr_player.hand.vector
 
-        for i, target in enumerate(self.curr_player.priest_info()):
-            vec[self._player_target_hand_pos[i]] = [
-                (target.position - self.curr_player.position) % self.num_players,
-                self.curr_player.priest_info()[target],
-            ]
+        state = self.curr_player.state
+        knowledge = state.knowledge.tolist()
+        learned = state.learned.tolist()
+        active = state.status[:, GameState.ACTIVE].tolist()
+        for i, slot in enumerate(known_cards(knowledge, learned, active, self.curr_player.position)):
+            vec[layout.player_target_hand_index[i]] = slot
 
         # Iterate over all players starting from the position of the current player
-        for i in range(self.num_players):
-            pos = (self.curr_player.position + i) % self.num_players
-            player = self.players[pos]
-            vec[self._player_status_pos[i]] = player.status_vector
+        statuses = [
+            self.players[(self.curr_player.position + i) % self.num_players].status_vector
+            for i in range(self.num_players)
+        ]
+        vec[layout.player_status_index[:self.num_players]] = statuses
 
-        vec[self._player_deck_size_pos] = self.deck.remaining()
+        vec[layout.player_deck_size] = self.deck.remaining()
 
-        # The following sections should be padded with zeros if the data is smaller than the available space
-        pad_length = self._discard_size - len(self.discard)
-        discard = [d.value for d in self.discard] + [0] * pad_length
-        vec[self._player_discard_pos] = discard
+        # The following sections are padded with zeros if the data is smaller than the available space
+        discard_end = layout.player_discard.start + len(self.discard)
+        vec[layout.player_discard.start:discard_end] = self.discard
 
-        pad_length = self._action_history_size - len(self.plays)
-        actions = [a.action._id for a in self.plays] + [0] * pad_length
-        vec[self._player_action_history_pos] = actions
+        history_end = layout.player_action_history.start + len(self.plays)
+        vec[layout.player_action_history.start:history_end] = [a.action._id for a in self.plays]
 
         return vec
 
@@ -160,35 +462,29 @@ class Observation:
         Encodes the entire game state, not just the state visible to the current player.
         """
 
-        vec = np.zeros(self.full_vec_length, dtype=np.int64)
+        layout = self._layout
+        vec = np.zeros(layout.full_vec_length, dtype=np.int64)
 
-        for pos in range(self.num_players):
-            player = self.players[pos]
-            vec[self._full_hand_pos[pos]] = player.hand.vector
+        vec[layout.full_hand_index[:self.num_players]] = [p.hand.vector for p in self.players]
 
+        state = self.players[0].state
+        knowledge = state.knowledge.tolist()
+        learned = state.learned.tolist()
+        active = state.status[:, GameState.ACTIVE].tolist()
         for pos in range(self.num_players):
-            player = self.players[pos]
-
-            for i, target in enumerate(player.priest_info()):
-                vec[self._full_target_hand_pos[pos][i]] = [
-                    (target.position - player.position) % self.num_players,
-                    player.priest_info()[target],
-                ]
+            for i, slot in enumerate(known_cards(knowledge, learned, active, pos)):
+                vec[layout.full_target_hand_index[pos, i]] = slot
 
-        for pos in range(self.num_players):
-            player = self.players[pos]
-            vec[self._full_status_pos[pos]] = player.status_vector
+        vec[layout.full_status_index[:self.num_players]] = [p.status_vector for p in self.players]
 
-        vec[self._full_deck_size_pos] = self.deck.remaining()
+        vec[layout.full_deck_size] = self.deck.remaining()
 
-        # The following sections should be padded with zeros if the data is smaller than the available space
-        pad_length = self._discard_size - len(self.discard)
-        discard = [d.value for d in self.discard] + [0] * pad_length
-        vec[self._full_discard_pos] = discard
+        # The following sections are padded with zeros if the data is smaller than the available space
+        discard_end = layout.full_discard.start + len(self.discard)
+        vec[layout.full_discard.start:discard_end] = self.discard
 
-        pad_length = self._action_history_size - len(self.plays)
-        actions = [a.action._id for a in self.plays] + [0] * pad_length
-        vec[self._full_action_history_pos] = actions
+        history_end = layout.full_action_history.start + len(self.plays)
+        vec[layout.full_action_history.start:history_end] = [a.action._id for a in self.plays]
 
         return vec
 
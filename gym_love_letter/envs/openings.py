@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+
+if TYPE_CHECKING:
+    from gym_love_letter.envs.base import LoveLetterMultiAgentEnv
+
+
+class OpeningPool:
+    """
+    Valid training start states, simulated ahead of time.
+
+    Each opening is a snapshot (see LoveLetterBaseEnv.snapshot()) taken when
+    the training agent is about to make its first move, together with the
+    training agent's position. Resetting from the pool costs a restore rather
+    than playing the opponents' opening moves, including every deal that
+    eliminated the training agent before it got to move.
+
+    Openings are reused, so each time the env loads one it shuffles the cards
+    nobody has seen yet (the burned card and the rest of the deck) again.
+    Games that start from the same opening still diverge from the first draw.
+
+    Args:
+        snapshots: One snapshot per row.
+        seats: The training agent's position in each snapshot.
+    """
+
+    def __init__(self, snapshots: np.ndarray, seats: np.ndarray):
+        if len(snapshots) != len(seats):
+            raise ValueError("Must have one seat per snapshot")
+        if not len(snapshots):
+            raise ValueError("An opening pool can't be empty")
+
+        self.snapshots = np.asarray(snapshots, dtype=np.int8)
+        self.seats = np.asarray(seats, dtype=np.intp)
+
+    def __len__(self) -> int:
+        return len(self.snapshots)
+
+    @classmethod
+    def simulate(cls, env: LoveLetterMultiAgentEnv, size: int, seed: int | None = None) -> OpeningPool:
+        """
+        Reset the env size times, playing the opening moves of its current
+        opponents, and keep the resulting states. The env's own pool, if any,
+        isn't used.
+        """
+
+        pool, env.opening_pool = env.opening_pool, None
+        try:
+            snapshots = np.empty((size, len(env.snapshot())), dtype=np.int8)
+            seats = np.empty(size, dtype=np.intp)
+            for i in range(size):
+                env.reset(seed=seed if i == 0 else None)
+                snapshots[i] = env.snapshot()
+                seats[i] = env.learner_position
+        finally:
+            env.opening_pool = pool
+
+        return cls(snapshots, seats)
+
+    def sample(self, rng: np.random.Generator) -> tuple[np.ndarray, int]:
+        """
+        Returns:
+            A random opening and the training agent's position in it.
+        """
+
+        i = int(rng.integers(len(self)))
+        return self.snapshots[i], int(self.seats[i])
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import time
+
+
+class EnvProfiler:
+    """
+    Cumulative timers and counters for the phases of an environment step.
+
+    Environments only hold a profiler when profiling is enabled. Every
+    instrumented call site checks for it first, so the cost of a disabled
+    profiler is a single attribute check per phase.
+
+    Phases are timed with lap(), which adds the time elapsed since a start
+    timestamp and returns the current one, so that consecutive phases can
+    share a single clock read.
+    """
+
+    PHASES = (
+        "step",
+        "decode_action",
+        "effects",
+        "check_game_over",
+        "reward",
+        "observe",
+        "opponent_predict",
+        "reset",
+    )
+    COUNTERS = ("games", "steps", "resets", "invalid_actions")
+
+    # Phases that never overlap with each other
+    TOP_LEVEL_PHASES = ("step", "opponent_predict", "reset")
+
+    now = staticmethod(time.perf_counter_ns)
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self.times = dict.fromkeys(self.PHASES, 0)
+        self.calls = dict.fromkeys(self.PHASES, 0)
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+
+    def lap(self, phase: str, start: int) -> int:
+        end = time.perf_counter_ns()
+        self.times[phase] += end - start
+        self.calls[phase] += 1
+        return end
+
+    def count(self, counter: str, n: int = 1) -> None:
+        self.counters[counter] += n
+
+    def stats(self) -> dict[str, float]:
+        """
+        Returns a flat dict of the cumulative seconds and call count of each
+        phase, and the value of each counter.
+
+        The step phase includes decode_action, effects, check_game_over,
+        reward and observe. The reward and observe phases are also timed
+        when the env skips an eliminated player. The opponent predict() calls
+        that LoveLetterMultiAgentEnv makes between steps are not part of step.
+        """
+
+        stats: dict[str, float] = {}
+        for phase in self.PHASES:
+            stats[f"{phase}_time"] = self.times[phase] / 1e9
+            stats[f"{phase}_calls"] = self.calls[phase]
+        stats.update(self.counters)
+
+        return stats
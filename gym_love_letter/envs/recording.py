@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import json
+import os
+from typing import Any
+
+import gymnasium as gym
+import numpy as np
+
+from gym_love_letter.envs.base import LoveLetterBaseEnv
+from gym_love_letter.envs.rewards import NUM_EVENTS
+
+
+RECORDING_VERSION = 1
+
+INDEX_FILE = "index.json"
+
+# Records per shard
+DEFAULT_SHARD_SIZE = 1 << 16
+
+# Record fields of a RewardContext ("events" holds its totals)
+CONTEXT_FIELDS = [
+    ("events", np.int8, (NUM_EVENTS,)),
+    ("recent", np.int8, (NUM_EVENTS,)),
+    ("active", np.bool_),
+    ("num_active", np.int8),
+    ("remaining", np.int8),
+]
+
+
+def record_dtype(obs_size: int, num_actions: int, full_size: int = 0, events: bool = False) -> np.dtype:
+    """
+    The structured dtype of one decision record. Masks are packed bitsets,
+    see unpack_masks(). The "full" field is only present when full_size is
+    nonzero, and the fields of a RewardContext when events is set.
+    """
+
+    fields = [
+        ("episode", np.int64),
+        ("seat", np.int8),
+        ("obs", np.int8, (obs_size,)),
+        ("mask", np.uint8, ((num_actions + 7) // 8,)),
+        ("action", np.int16),
+        ("reward", np.float32),
+        ("done", np.bool_),
+    ]
+    if full_size:
+        fields.append(("full", np.int8, (full_size,)))
+    if events:
+        fields += CONTEXT_FIELDS
+    return np.dtype(fields)
+
+
+def unpack_masks(masks: np.ndarray, num_actions: int) -> np.ndarray:
+    """
+    Returns:
+        Boolean action masks from the packed "mask" field of records.
+    """
+
+    return np.unpackbits(masks, axis=-1, count=num_actions).astype(bool)
+
+
+def read_index(directory: str) -> dict[str, Any]:
+    with open(os.path.join(directory, INDEX_FILE)) as f:
+        index = json.load(f)
+
+    if index["version"] != RECORDING_VERSION:
+        raise ValueError(f"Unsupported recording version {index['version']}")
+    return index
+
+
+def load_shards(directory: str, mmap: bool = True) -> list[np.ndarray]:
+    """
+    Returns:
+        Every shard of a recording, in order, as structured arrays. Shards
+        are memory-mapped unless mmap is False.
+    """
+
+    index = read_index(directory)
+    return [
+        np.load(os.path.join(directory, shard["file"]), mmap_mode="r" if mmap else None, allow_pickle=False)
+        for shard in index["shards"]
+    ]
+
+
+class TrajectoryRecorder(gym.Wrapper):
+    """
+    Records every decision made through step() to .npy shards in a
+    directory.
+
+    A record holds the episode number, the deciding seat, that seat's
+    observation vector and valid action mask before the step, the action,
+    and the reward and done flag the step returned. With full_state, it
+    also holds Observation.full_vector, which costs an extra observe() per
+    step. With events, it holds what the step's reward was computed from
+    (the fields of a RewardContext), so other reward functions can be
+    evaluated on the recording later, see reward_analysis. Wrapping a
+    LoveLetterMultiAgentEnv records the training agent's decisions only,
+    since the opponents play inside its step().
+
+    Records are buffered in memory, one column per field, and written out
+    as a shard of shard_size records at a time. Shards are plain structured
+    arrays without Python objects, so they load with allow_pickle=False and
+    can be memory-mapped. index.json lists the shards, their record and
+    episode counts and the record dtype, and is rewritten after every shard.
+    Recording into a directory that already has an index appends to it.
+    Every process needs its own directory.
+
+    Call close() (or flush()) to write the last, partial shard.
+
+    Args:
+        directory: Created if it doesn't exist.
+        shard_size: Records per shard.
+        full_state: Also record the full game state vector.
+        events: Also record the event counters and context of each reward.
+    """
+
+    def __init__(
+        self,
+        env: LoveLetterBaseEnv,
+        directory: str,
+        shard_size: int = DEFAULT_SHARD_SIZE,
+        full_state: bool = False,
+        events: bool = False,
+    ):
+        super().__init__(env)
+
+        base = env.unwrapped
+        self.base = base
+        self.directory = directory
+        self.shard_size = shard_size
+        self.full_state = full_state
+        self.events = events
+
+        self.num_actions = int(base.action_space.n)
+        self.obs_size = len(base._obs_buffer.vector(0))
+        self.full_size = len(base.observe().full_vector) if full_state else 0
+        self.dtype = record_dtype(self.obs_size, self.num_actions, self.full_size, events)
+
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(os.path.join(directory, INDEX_FILE)):
+            self.index = read_index(directory)
+            if np.dtype([tuple(field) for field in self.index["dtype"]]) != self.dtype:
+                raise ValueError(f"{directory} holds records of a different format")
+        else:
+            self.index = {
+                "version": RECORDING_VERSION,
+                "num_players": base.num_players,
+                "num_actions": self.num_actions,
+                "dtype": self.dtype.descr,
+                "records": 0,
+                "episodes": 0,
+                "shards": [],
+            }
+
+        # The episode of the next reset
+        self.episode = self.index["episodes"]
+        self._episode = -1
+
+        # Column buffers, filled one row per step
+        self._size = 0
+        self._episodes = np.empty(shard_size, dtype=np.int64)
+        self._seats = np.empty(shard_size, dtype=np.int8)
+        self._obs = np.empty((shard_size, self.obs_size), dtype=np.int8)
+        self._masks = np.empty((shard_size, self.dtype["mask"].shape[0]), dtype=np.uint8)
+        self._actions = np.empty(shard_size, dtype=np.int16)
+        self._rewards = np.empty(shard_size, dtype=np.float32)
+        self._dones = np.empty(shard_size, dtype=np.bool_)
+        self._full = np.empty((shard_size, self.full_size), dtype=np.int8)
+        self._contexts = np.empty(shard_size if events else 0, dtype=CONTEXT_FIELDS)
+
+        # Packed bitsets by mask. There are few distinct masks, and packing
+        # costs several times more than the lookup.
+        self._packed: dict[bytes, np.ndarray] = {}
+
+    def reset(self, **kwargs) -> tuple[np.ndarray, dict]:
+        result = self.env.reset(**kwargs)
+        self._episode = self.episode
+        self.episode += 1
+        return result
+
+    def step(self, action_id: int) -> tuple[np.ndarray, float, bool, bool, dict]:
+        base = self.base
+        i = self._size
+        seat = base.current_player.position
+
+        self._seats[i] = seat
+        self._obs[i] = base._obs_buffer.vector(seat)
+
+        mask = base._legal_mask()
+        key = mask.tobytes()
+        packed = self._packed.get(key)
+        if packed is None:
+            packed = self._packed[key] = np.packbits(mask)
+        self._masks[i] = packed
+
+        if self.full_state:
+            self._full[i] = base.observe().full_vector
+
+        if self.events:
+            rewarded = base.events_rewarded.copy()
+
+        obs, reward, terminated, truncated, info = self.env.step(action_id)
+
+        if self.events:
+            self._record_context(i, rewarded)
+
+        self._episodes[i] = self._episode
+        self._actions[i] = action_id
+        self._rewards[i] = reward
+        self._dones[i] = terminated or truncated
+        self._size = i + 1
+        if self._size == self.shard_size:
+            self.flush()
+
+        return obs, reward, terminated, truncated, info
+
+    def _record_context(self, i: int, rewarded: np.ndarray) -> None:
+        """
+        Record the context of the reward the step returned, which was
+        computed when its player (now the current player) came up.
+        """
+
+        base = self.base
+        player = base.current_player
+        totals = base.events[player.position]
+        context = self._contexts[i]
+        context["events"] = totals
+        context["recent"] = totals - rewarded[player.position]
+        context["active"] = player.active
+        context["num_active"] = len(base.active_players)
+
+        # The player drew a card after being rewarded, unless they were done
+        context["remaining"] = base.deck.remaining() + (player.active and not base.game_over)
+
+    def valid_action_mask(self) -> np.ndarray:
+        return self.env.valid_action_mask()
+
+    def flush(self) -> None:
+        """
+        Write out the buffered records as a new shard.
+        """
+
+        size = self._size
+        if size == 0:
+            return
+
+        records = np.empty(size, dtype=self.dtype)
+        records["episode"] = self._episodes[:size]
+        records["seat"] = self._seats[:size]
+        records["obs"] = self._obs[:size]
+        records["mask"] = self._masks[:size]
+        records["action"] = self._actions[:size]
+        records["reward"] = self._rewards[:size]
+        records["done"] = self._dones[:size]
+        if self.full_state:
+            records["full"] = self._full[:size]
+        if self.events:
+            for name in self._contexts.dtype.names:
+                records[name] = self._contexts[name][:size]
+
+        index = self.index
+        filename = f"shard-{len(index['shards']):05d}.npy"
+        np.save(os.path.join(self.directory, filename), records, allow_pickle=False)
+
+        index["shards"].append({
+            "file": filename,
+            "records": size,
+            "first_episode": int(records["episode"][0]),
+            "last_episode": int(records["episode"][-1]),
+        })
+        index["records"] += size
+        index["episodes"] = self.episode
+
+        # Replace the index in one step, so readers never see half of it
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+        self._size = 0
+
+    def close(self) -> None:
+        self.flush()
+        super().close()
@@ -0,0 +1,291 @@
+"""
+Record games as (seed, action ids) and replay them exactly, reporting the
+first step where the engine no longer does what was recorded.
+
+Run with:
+
+    python -m gym_love_letter.envs.replay record games.npz --games 100000
+    python -m gym_love_letter.envs.replay verify games.npz
+
+Record a log before changing the engine, and verify it afterwards. A log
+holds each game's seed and action ids, with the reward and a digest of the
+game state after every action. Replays run on a LoveLetterBaseEnv without
+agents or Observations, and the turns of eliminated players are skipped
+as in every driver loop.
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence
+
+import click
+import numpy as np
+
+from gym_love_letter.envs.base import LoveLetterBaseEnv
+
+
+@dataclass
+class GameLog:
+    num_players: int
+    seed: int
+    actions: np.ndarray
+    rewards: np.ndarray
+    digests: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+
+@dataclass
+class Divergence:
+    """
+    Where a replay first differed from its log. step is the index of the
+    action, or the number of actions if the game didn't end when the log did.
+    """
+
+    game: int
+    step: int
+    reason: str
+    expected: Optional[float] = None
+    actual: Optional[float] = None
+
+
+def state_digest(env: LoveLetterBaseEnv) -> int:
+    """
+    CRC32 of the game as plain ints in a fixed order: current seat, game over
+    flag, the lengths of the two variable sections, hands, the undrawn deck,
+    status, knowledge, the order it was learned in and discards. It doesn't
+    depend on how GameState lays out its buffer, so rearranging the layout
+    doesn't break recorded logs.
+    """
+
+    state = env.state
+    undrawn = state.deck[state.pointer:]
+    discards = state.discard[:state.num_discards]
+    fields = [
+        [state.current, state.game_over, len(undrawn), len(discards)],
+        state.hands.ravel(),
+        undrawn,
+        state.status.ravel(),
+        state.knowledge.ravel(),
+        state.learned.ravel(),
+        discards,
+    ]
+    return zlib.crc32(np.concatenate(fields).astype(np.int8))
+
+
+def _skip_eliminated(env: LoveLetterBaseEnv) -> None:
+    while not env.game_over and not env.current_player.active:
+        env._next_player()
+
+
+def play_game(env: LoveLetterBaseEnv, seed: int, choose: Callable[[LoveLetterBaseEnv], int]) -> GameLog:
+    """
+    Play and log a game, choosing every action with choose(env).
+    """
+
+    env.reset(seed=seed)
+    actions, rewards, digests = [], [], []
+
+    _skip_eliminated(env)
+    while not env.game_over:
+        action_id = choose(env)
+        _, reward, _, _, _ = env.step(action_id)
+        actions.append(action_id)
+        rewards.append(reward)
+        digests.append(state_digest(env))
+        _skip_eliminated(env)
+
+    return GameLog(
+        env.num_players,
+        seed,
+        np.array(actions, dtype=np.int16),
+        np.array(rewards, dtype=np.float32),
+        np.array(digests, dtype=np.uint32),
+    )
+
+
+def record_random_games(num_players: int, games: int, seed: int = 0) -> list[GameLog]:
+    """
+    Log games of uniformly random valid actions, game i with seed + i.
+    """
+
+    env = LoveLetterBaseEnv(num_players=num_players, observation_info=False)
+    rng = np.random.default_rng(seed)
+
+    def choose(env: LoveLetterBaseEnv) -> int:
+        legal = np.flatnonzero(env._legal_mask())
+        return int(legal[rng.integers(len(legal))])
+
+    return [play_game(env, seed + i, choose) for i in range(games)]
+
+
+def replay(env: LoveLetterBaseEnv, log: GameLog, game: int = 0, check_state: bool = True) -> Optional[Divergence]:
+    """
+    Re-simulate a logged game on env, which must seat log.num_players.
+
+    Returns:
+        The first divergence, or None if the replay matches the log.
+    """
+
+    env.reset(seed=log.seed)
+    actions = log.actions.tolist()
+    rewards = log.rewards.tolist()
+    digests = log.digests.tolist()
+
+    step = 0
+    try:
+        _skip_eliminated(env)
+        for step, action_id in enumerate(actions):
+            if env.game_over:
+                return Divergence(game, step, "game over early")
+
+            _, reward, _, _, _ = env.step(action_id)
+
+            # Rewards were stored as float32
+            if np.float32(reward) != rewards[step]:
+                return Divergence(game, step, "reward", rewards[step], float(reward))
+            if check_state:
+                digest = state_digest(env)
+                if digest != digests[step]:
+                    return Divergence(game, step, "state", digests[step], digest)
+
+            _skip_eliminated(env)
+    except Exception as e:
+        return Divergence(game, step, f"{type(e).__name__}: {e}")
+
+    if not env.game_over:
+        return Divergence(game, len(actions), "game not over")
+    return None
+
+
+def _replay_shard(logs: Sequence[GameLog], first: int, check_state: bool) -> list[Divergence]:
+    envs: dict[int, LoveLetterBaseEnv] = {}
+    divergences = []
+    for i, log in enumerate(logs):
+        env = envs.get(log.num_players)
+        if env is None:
+            env = envs[log.num_players] = LoveLetterBaseEnv(num_players=log.num_players, observation_info=False)
+
+        divergence = replay(env, log, first + i, check_state)
+        if divergence is not None:
+            divergences.append(divergence)
+
+    return divergences
+
+
+def replay_all(
+    logs: Sequence[GameLog],
+    check_state: bool = True,
+    n_workers: Optional[int] = 1,
+    shard_size: int = 1000,
+) -> list[Divergence]:
+    """
+    Replay every log, across a process pool unless n_workers is 1.
+
+    Returns:
+        The first divergence of each game that had one, in game order.
+    """
+
+    if n_workers == 1:
+        return _replay_shard(logs, 0, check_state)
+
+    # Same default as stable-baselines3's SubprocVecEnv
+    method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp.get_context(method)) as pool:
+        futures = [
+            pool.submit(_replay_shard, logs[start:start + shard_size], start, check_state)
+            for start in range(0, len(logs), shard_size)
+        ]
+        return [divergence for future in futures for divergence in future.result()]
+
+
+def save_logs(path: str, logs: Sequence[GameLog]) -> None:
+    """
+    Save logs as flat arrays in an .npz file, readable without unpickling.
+    """
+
+    lengths = np.array([len(log) for log in logs], dtype=np.int64)
+    np.savez_compressed(
+        path,
+        num_players=np.array([log.num_players for log in logs], dtype=np.int8),
+        seeds=np.array([log.seed for log in logs], dtype=np.int64),
+        offsets=np.concatenate([[0], np.cumsum(lengths)]),
+        actions=np.concatenate([log.actions for log in logs]) if logs else np.empty(0, np.int16),
+        rewards=np.concatenate([log.rewards for log in logs]) if logs else np.empty(0, np.float32),
+        digests=np.concatenate([log.digests for log in logs]) if logs else np.empty(0, np.uint32),
+    )
+
+
+def load_logs(path: str) -> list[GameLog]:
+    with np.load(path, allow_pickle=False) as data:
+        offsets = data["offsets"].tolist()
+        actions, rewards, digests = data["actions"], data["rewards"], data["digests"]
+        return [
+            GameLog(num_players, seed, actions[start:stop], rewards[start:stop], digests[start:stop])
+            for num_players, seed, start, stop in zip(
+                data["num_players"].tolist(), data["seeds"].tolist(), offsets[:-1], offsets[1:]
+            )
+        ]
+
+
+@click.group()
+def main():
+    pass
+
+
+@main.command()
+@click.argument("path", type=click.Path(dir_okay=False))
+@click.option("--games", "-n", default=10000, show_default=True, help="Games per player count")
+@click.option("--players", "-p", multiple=True, type=click.IntRange(2, 4), help="Player counts. Defaults to 2, 3 and 4.")
+@click.option("--seed", default=0, show_default=True)
+def record(path, games, players, seed):
+    """
+    Log random games.
+    """
+
+    logs = []
+    for num_players in players or (2, 3, 4):
+        logs += record_random_games(num_players, games, seed)
+    save_logs(path, logs)
+    click.echo(f"Recorded {len(logs)} games, {sum(map(len, logs))} actions")
+
+
+@main.command()
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--check-state/--rewards-only", default=True, show_default=True, help="Compare state digests")
+@click.option("--n-workers", type=int, default=1, show_default=True, help="Processes to replay in")
+@click.option("--show", default=10, show_default=True, help="Divergences to print")
+def verify(path, check_state, n_workers, show):
+    """
+    Replay logged games and report where they diverge.
+    """
+
+    logs = load_logs(path)
+    start = time.perf_counter()
+    divergences = replay_all(logs, check_state=check_state, n_workers=n_workers)
+    elapsed = time.perf_counter() - start
+
+    click.echo(f"Replayed {len(logs)} games in {elapsed:.2f}s ({len(logs) / elapsed:,.0f} games/s)")
+    for divergence in divergences[:show]:
+        log = logs[divergence.game]
+        click.echo(
+            f"  game {divergence.game} ({log.num_players} players, seed {log.seed}) step {divergence.step}: "
+            f"{divergence.reason}"
+            + (f" (expected {divergence.expected}, got {divergence.actual})" if divergence.expected is not None else "")
+        )
+
+    if divergences:
+        click.echo(f"{len(divergences)} of {len(logs)} games diverged")
+        sys.exit(1)
+    click.echo("All games match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Re-evaluate reward functions over recorded games, instead of training or
+playing with each of them.
+
+Run with:
+
+    python -m gym_love_letter.envs.reward_analysis recordings/ -r fast_elimination_reward -r game_won_reward
+
+Record with TrajectoryRecorder(env, directory, events=True). Each record then
+holds the event counters and context its reward was computed from, so any
+Reward can be evaluated on every record of a recording at once. Returns and
+advantages are computed per trajectory (a seat's decisions in an episode,
+linked as in TrajectoryDataset).
+
+Recordings of a LoveLetterMultiAgentEnv are what this is for: only the
+training agent is recorded, and each step's reward is its own. Wrapping a
+LoveLetterBaseEnv records the reward of whoever is up after each move.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass
+from typing import Mapping, Optional, Sequence
+
+import click
+import numpy as np
+
+from gym_love_letter.envs.dataset import TrajectoryDataset
+from gym_love_letter.envs.rewards import Event, Reward, RewardContext, Rewards
+
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Transitions per batch when predicting values
+VALUE_BATCH_SIZE = 1 << 14
+
+
+def reward_functions() -> dict[str, Reward]:
+    """
+    Returns:
+        The reward functions in Rewards, by name.
+    """
+
+    return {name: reward for name, reward in vars(Rewards).items() if isinstance(reward, Reward)}
+
+
+def reward_contexts(dataset: TrajectoryDataset) -> RewardContext:
+    """
+    Returns:
+        The context of every record's reward, with event counts of shape
+        (NUM_EVENTS, len(dataset)).
+    """
+
+    if "events" not in dataset.dtype.names:
+        raise ValueError("The recording has no events. Record with TrajectoryRecorder(..., events=True).")
+
+    def column(name: str) -> np.ndarray:
+        return np.concatenate([shard[name] for shard in dataset.shards])
+
+    return RewardContext(
+        column("events").T.astype(np.int32),
+        column("recent").T.astype(np.int32),
+        column("active"),
+        column("num_active").astype(np.int32),
+        column("remaining").astype(np.int32),
+    )
+
+
+def evaluate_rewards(rewards: Mapping[str, Reward], ctx: RewardContext) -> dict[str, np.ndarray]:
+    """
+    Returns:
+        Each reward function's reward of every record.
+    """
+
+    n = len(ctx.active)
+    return {name: np.broadcast_to(reward.evaluate(ctx), n).astype(np.float32) for name, reward in rewards.items()}
+
+
+class Trajectories:
+    """
+    Where each transition of a dataset sits in its trajectory, so that
+    backward passes over all trajectories take one vectorized step per
+    trajectory position rather than a Python loop per transition.
+    """
+
+    def __init__(self, dataset: TrajectoryDataset):
+        order = dataset.trajectory_order
+        self.next_index = dataset.next_index
+        self.done = np.concatenate([shard["done"] for shard in dataset.shards]) | (self.next_index < 0)
+
+        # Positions in trajectory order of each trajectory's last and first transition
+        last = np.flatnonzero(self.next_index[order] < 0)
+        first = np.concatenate([[0], last[:-1] + 1])
+        self.first = order[first]
+        self.last = order[last]
+
+        # Steps from each transition to the end of its trajectory
+        positions = np.arange(len(order))
+        steps_left = last[np.searchsorted(last, positions)] - positions
+        self.by_steps_left = [order[steps_left == k] for k in range(int(steps_left.max()) + 1)]
+
+    def __len__(self) -> int:
+        return len(self.first)
+
+    def returns_and_advantages(
+        self,
+        rewards: np.ndarray,
+        values: Optional[np.ndarray] = None,
+        gamma: float = 1.0,
+        gae_lambda: float = 1.0,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Generalized advantage estimates, computed as by stable-baselines3's
+        RolloutBuffer, and returns as advantages plus values.
+
+        Args:
+            values: Value estimates of each transition's observation. Without
+                them, values are 0 and with gae_lambda=1 the advantages are
+                the discounted returns.
+
+        Returns:
+            The return and advantage of each transition.
+        """
+
+        if values is None:
+            values = np.zeros(len(rewards), dtype=np.float32)
+
+        advantages = np.zeros(len(rewards), dtype=np.float32)
+        for rows in self.by_steps_left:
+            next_rows = self.next_index[rows]
+            not_done = ~self.done[rows]
+            next_values = np.where(not_done, values[next_rows], 0)
+            next_advantages = np.where(not_done, advantages[next_rows], 0)
+            delta = rewards[rows] + gamma * next_values - values[rows]
+            advantages[rows] = delta + gamma * gae_lambda * next_advantages
+
+        return advantages + values, advantages
+
+
+def predict_values(dataset: TrajectoryDataset, policy) -> np.ndarray:
+    """
+    Returns:
+        A stable-baselines3 policy's value estimate of every transition's
+        observation.
+    """
+
+    import torch as th
+
+    values = np.empty(len(dataset), dtype=np.float32)
+    with th.no_grad():
+        for start in range(0, len(dataset), VALUE_BATCH_SIZE):
+            indices = np.arange(start, min(start + VALUE_BATCH_SIZE, len(dataset)))
+            obs = th.as_tensor(dataset.gather(indices).obs, device=policy.device)
+            values[indices] = policy.predict_values(obs).cpu().numpy().flatten()
+    return values
+
+
+@dataclass
+class Evaluation:
+    """
+    A reward function's reward, return and advantage of every transition, and
+    the return of each trajectory (from its first transition) alongside
+    whether the trajectory's seat won.
+    """
+
+    name: str
+    rewards: np.ndarray
+    returns: np.ndarray
+    advantages: np.ndarray
+    trajectory_returns: np.ndarray
+    won: np.ndarray
+
+    def win_correlation(self) -> float:
+        """
+        Pearson correlation of trajectory returns with winning, or nan if
+        either is constant.
+        """
+
+        if self.trajectory_returns.std() == 0 or self.won.std() == 0:
+            return float("nan")
+        return float(np.corrcoef(self.trajectory_returns, self.won)[0, 1])
+
+    def summary(self) -> dict[str, float]:
+        returns = self.trajectory_returns
+        summary = {"mean": float(returns.mean()), "std": float(returns.std())}
+        for q, value in zip(PERCENTILES, np.percentile(returns, PERCENTILES).tolist()):
+            summary[f"p{q}"] = value
+        summary["win_corr"] = self.win_correlation()
+        return summary
+
+
+def analyze(
+    dataset: TrajectoryDataset,
+    rewards: Optional[Mapping[str, Reward]] = None,
+    gamma: float = 1.0,
+    gae_lambda: float = 1.0,
+    values: Optional[np.ndarray] = None,
+    include_recorded: bool = True,
+) -> list[Evaluation]:
+    """
+    Evaluate reward functions on a recording with events.
+
+    Args:
+        rewards: Reward functions by name. Defaults to every one in Rewards.
+        values: Value estimates for the advantages, see predict_values().
+        include_recorded: Also evaluate the rewards that were recorded, as
+            "recorded".
+
+    Returns:
+        An Evaluation per reward function, the recorded rewards first.
+    """
+
+    if rewards is None:
+        rewards = reward_functions()
+
+    ctx = reward_contexts(dataset)
+    trajectories = Trajectories(dataset)
+    won = ctx.totals[Event.WON][trajectories.last] > 0
+
+    evaluated = evaluate_rewards(rewards, ctx)
+    if include_recorded:
+        recorded = np.concatenate([shard["reward"] for shard in dataset.shards])
+        evaluated = {"recorded": recorded, **evaluated}
+
+    evaluations = []
+    for name, reward in evaluated.items():
+        returns, advantages = trajectories.returns_and_advantages(reward, values, gamma, gae_lambda)
+        evaluations.append(Evaluation(name, reward, returns, advantages, returns[trajectories.first], won))
+    return evaluations
+
+
+def format_report(evaluations: Sequence[Evaluation]) -> str:
+    columns = ["mean", "std"] + [f"p{q}" for q in PERCENTILES] + ["win_corr"]
+    width = max(len(evaluation.name) for evaluation in evaluations)
+    won = evaluations[0].won
+
+    lines = [
+        f"{len(won)} trajectories, win rate {won.mean():.3f}",
+        "",
+        f"{'reward':<{width}}" + "".join(f"{column:>10}" for column in columns),
+    ]
+    for evaluation in evaluations:
+        summary = evaluation.summary()
+        lines.append(f"{evaluation.name:<{width}}" + "".join(f"{summary[column]:>10.3f}" for column in columns))
+    return "\n".join(lines)
+
+
+@click.command()
+@click.argument("directories", nargs=-1, required=True, type=click.Path(exists=True, file_okay=False))
+@click.option("--reward", "-r", "names", multiple=True, help="Reward functions in Rewards. Defaults to all of them.")
+@click.option("--gamma", default=1.0, show_default=True)
+@click.option("--gae-lambda", default=1.0, show_default=True)
+@click.option("--model", type=click.Path(exists=True, dir_okay=False), help="Model to estimate values with")
+@click.option("--json", "as_json", is_flag=True, help="Print the summaries as JSON")
+def main(directories, names, gamma, gae_lambda, model, as_json):
+    functions = reward_functions()
+    unknown = sorted(set(names) - set(functions))
+    if unknown:
+        raise click.BadParameter(f"Unknown reward functions {unknown}. Choose from {sorted(functions)}.")
+    rewards = {name: functions[name] for name in names} if names else functions
+
+    start = time.perf_counter()
+    dataset = TrajectoryDataset(list(directories))
+
+    values = None
+    if model is not None:
+        from gym_love_letter.zoo import load_model
+
+        values = predict_values(dataset, load_model(model).policy)
+
+    evaluations = analyze(dataset, rewards, gamma, gae_lambda, values)
+    elapsed = time.perf_counter() - start
+
+    if as_json:
+        click.echo(json.dumps({evaluation.name: evaluation.summary() for evaluation in evaluations}, indent=2))
+    else:
+        click.echo(format_report(evaluations))
+        click.echo(f"\n{len(dataset)} transitions in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
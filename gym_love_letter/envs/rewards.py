@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+from enum import IntEnum
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple, Sequence
+
+import numpy as np
+
+from gym_love_letter.engine import GameState
+
+
+if TYPE_CHECKING:
+    from gym_love_letter.envs.base import LoveLetterBaseEnv
+    from gym_love_letter.envs.batch import BatchGameState
+
+
+class Event(IntEnum):
+    """
+    Game events, counted per player by LoveLetterBaseEnv and BatchGameState.
+    """
+
+    PLAYED = 0  # Played a card
+    ELIMINATED = 1  # Eliminated another player
+    OUT = 2  # Was eliminated
+    PROTECTED = 3  # Played the Handmaid
+    SWAPPED = 4  # Swapped hands with the King
+    WON = 5  # Was still in when the game ended
+
+
+NUM_EVENTS = len(Event)
+
+
+class RewardContext(NamedTuple):
+    """
+    What a reward component can see of one player, or of the current player of
+    each game in a batch.
+
+    Event counts are indexed by Event. For a batch they have shape
+    (NUM_EVENTS, num_games), so every component works on both.
+    """
+
+    totals: Any  # Events since the start of the game
+    recent: Any  # Events since the player's last reward
+    active: Any
+    num_active: Any
+    remaining: Any  # Cards left in the deck
+
+
+Component = Callable[[RewardContext], Any]
+
+
+def alive(ctx: RewardContext) -> Any:
+    return ctx.active
+
+
+def survived(ctx: RewardContext) -> Any:
+    """
+    Still in, after having made a move.
+    """
+
+    return ctx.active & (ctx.totals[Event.PLAYED] > 0)
+
+
+def eliminations(ctx: RewardContext) -> Any:
+    """
+    Players eliminated since the last reward.
+    """
+
+    return ctx.recent[Event.ELIMINATED]
+
+
+def won(ctx: RewardContext) -> Any:
+    return ctx.totals[Event.WON]
+
+
+def won_early(ctx: RewardContext) -> Any:
+    """
+    Cards left in the deck when the player won, i.e. future actions prevented.
+    """
+
+    return ctx.totals[Event.WON] * ctx.remaining
+
+
+def table_share(ctx: RewardContext) -> Any:
+    """
+    1 / the number of players still in, if the player is one of them.
+    """
+
+    return ctx.active / ctx.num_active
+
+
+class Reward:
+    """
+    A reward function built from components: the weighted sum of their values,
+    divided by normalize_by.
+
+    Components only read event counters and a little of the game state, so
+    evaluating a reward doesn't change the env and costs the same however long
+    the game has gone on. The env marks a player's events as rewarded once
+    the player's reward has been determined.
+
+    Call a Reward with an env, like any reward_fn of LoveLetterBaseEnv, or
+    with a BatchGameState and game indices through batch(). Weights are
+    applied in order, and integer sums are only divided at the end, so the
+    result is the same either way.
+
+    Args:
+        terms: (weight, component) pairs.
+        normalize_by: Divides the weighted sum.
+    """
+
+    def __init__(self, terms: Sequence[tuple[float, Component]], normalize_by: float = 1):
+        self.terms = list(terms)
+        self.normalize_by = normalize_by
+
+    def __repr__(self) -> str:
+        terms = " + ".join(f"{weight} * {component.__name__}" for weight, component in self.terms)
+        if self.normalize_by != 1:
+            return f"Reward(({terms}) / {self.normalize_by})"
+        return f"Reward({terms})"
+
+    def __add__(self, other: Reward) -> Reward:
+        if self.normalize_by == other.normalize_by:
+            return Reward(self.terms + other.terms, self.normalize_by)
+
+        return Reward(
+            [(weight / self.normalize_by, component) for weight, component in self.terms]
+            + [(weight / other.normalize_by, component) for weight, component in other.terms]
+        )
+
+    def __mul__(self, scale: float) -> Reward:
+        return Reward([(weight * scale, component) for weight, component in self.terms], self.normalize_by)
+
+    __rmul__ = __mul__
+
+    def evaluate(self, ctx: RewardContext) -> Any:
+        total = 0
+        for weight, component in self.terms:
+            total = total + weight * component(ctx)
+
+        if self.normalize_by != 1:
+            total = total / self.normalize_by
+        return total
+
+    def __call__(self, env: LoveLetterBaseEnv) -> float:
+        """
+        Returns:
+            The reward of the env's current player.
+        """
+
+        position = env.current_player.position
+        totals = env.events[position]
+        status = env.state.status[:, GameState.ACTIVE]
+        ctx = RewardContext(
+            totals.tolist(),
+            (totals - env.events_rewarded[position]).tolist(),
+            bool(status[position]),
+            int(np.count_nonzero(status)),
+            env.deck.remaining(),
+        )
+        return float(self.evaluate(ctx))
+
+    def batch(self, state: BatchGameState, games: np.ndarray) -> np.ndarray:
+        """
+        Returns:
+            The reward of the current player of each game.
+        """
+
+        current = state.current[games]
+        totals = state.events[games, current].astype(np.int32)
+        status = state.status[games, :, GameState.ACTIVE]
+        ctx = RewardContext(
+            totals.T,
+            (totals - state.events_rewarded[games, current]).T,
+            status[np.arange(len(games)), current].astype(bool),
+            status.sum(axis=1),
+            state.remaining(games),
+        )
+        return np.broadcast_to(self.evaluate(ctx), len(games)).astype(np.float32)
+
+
+class Rewards:
+    simple_turn_reward = Reward([(1, alive)])
+
+    game_completion_reward = Reward([(1, table_share), (5, won)])
+
+    game_won_reward = Reward([(1, won)])
+
+    # Surviving a round, eliminating other players, and winning, with extra
+    # reward for each future action that was prevented
+    fast_elimination_reward = Reward(
+        [(1, survived), (3, eliminations), (10, won), (1, won_early)],
+        normalize_by=10,
+    )
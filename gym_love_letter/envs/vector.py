@@ -0,0 +1,524 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Sequence
+
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env.base_vec_env import (VecEnv, VecEnvIndices,
+                                                           VecEnvStepReturn)
+
+from gym_love_letter.agents import Agent
+from gym_love_letter.envs.actions import generate_actions
+from gym_love_letter.envs.base import LoveLetterBaseEnv, LoveLetterMultiAgentEnv, Rewards
+from gym_love_letter.envs.observations import Observation
+
+
+class SharedArrays:
+    """
+    A set of numpy arrays packed into a single shared memory segment.
+
+    The parent process creates the segment from a list of (name, shape, dtype)
+    specs. Worker processes attach to it by name and see the same memory, so
+    nothing written into the arrays needs to be pickled.
+    """
+
+    ALIGNMENT = 64
+
+    def __init__(self, specs: Sequence[tuple[str, tuple[int, ...], str]], name: str | None = None):
+        self.specs = list(specs)
+
+        offsets = []
+        size = 0
+        for _, shape, dtype in self.specs:
+            offsets.append(size)
+            nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            size += -(-nbytes // self.ALIGNMENT) * self.ALIGNMENT
+
+        create = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=max(size, 1))
+        self.owner = create
+
+        self.arrays: dict[str, np.ndarray] = {}
+        for (key, shape, dtype), offset in zip(self.specs, offsets):
+            self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.arrays[key]
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def attach_args(self) -> tuple[list[tuple[str, tuple[int, ...], str]], str]:
+        """
+        Picklable arguments for attaching to this segment from another process.
+        """
+
+        return self.specs, self.name
+
+    def close(self) -> None:
+        # Arrays hold exports of the buffer, which must be released before closing
+        self.arrays = {}
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+@dataclass
+class LoveLetterEnvFactory:
+    """
+    Builds a LoveLetterMultiAgentEnv in a worker process.
+
+    Only this small object is sent to the workers, rather than an env holding
+    agents (and possibly whole models) that refer back to it. Opponents are the
+    env's default random agents.
+
+    Args:
+        seed: If given, the random agents of the env at index i are seeded
+            deterministically from it.
+        learner_seat: See LoveLetterMultiAgentEnv.
+        profile: Attach an EnvProfiler to the env, see LoveLetterBaseEnv.
+    """
+
+    num_players: int = 4
+    reward_fn: Callable[[LoveLetterBaseEnv], float] = Rewards.fast_elimination_reward
+    seed: int | None = None
+    learner_seat: int | str = 0
+    profile: bool = False
+
+    def __call__(self, index: int) -> LoveLetterMultiAgentEnv:
+        env = LoveLetterMultiAgentEnv(
+            num_players=self.num_players,
+            reward_fn=self.reward_fn,
+            observation_info=False,
+            learner_seat=self.learner_seat,
+            profile=self.profile,
+        )
+
+        if self.seed is not None:
+            for position, agent in enumerate(env._agents):
+                agent.seed(self.seed + index * env.num_players + position)
+
+        return env
+
+
+def play_opponents(envs: Sequence[LoveLetterMultiAgentEnv], pending: Sequence[np.ndarray | None]) -> None:
+    """
+    Finish the steps or resets that the envs began with begin_step() or
+    begin_reset(), given the observation each is paused at (None if it isn't).
+
+    Opponents that are Agents are bound to their own env, so each is asked for
+    its move on its own. Any other policy, such as a stable-baselines3 model,
+    is asked once per round for the stacked observations and valid action
+    masks of every env waiting on it, and its actions are sent back to each.
+    """
+
+    pending = list(pending)
+    waiting = [i for i, obs in enumerate(pending) if obs is not None]
+
+    while waiting:
+        groups: dict[int, list[int]] = {}
+        for i in waiting:
+            env = envs[i]
+            policy = env.current_player.agent
+            if isinstance(policy, Agent):
+                pending[i] = env.resume(env._opponent_action(pending[i]))
+            else:
+                groups.setdefault(id(policy), []).append(i)
+
+        for group in groups.values():
+            policy = envs[group[0]].current_player.agent
+            obs = np.stack([pending[i] for i in group])
+            masks = np.stack([envs[i].valid_action_mask() for i in group])
+            action_ids, _ = policy.predict(obs, action_masks=masks)
+
+            for i, action_id in zip(group, np.asarray(action_ids).reshape(-1).tolist()):
+                pending[i] = envs[i].resume(action_id)
+
+        waiting = [i for i in waiting if pending[i] is not None]
+
+
+def _worker(
+    remote: Connection,
+    parent_remote: Connection,
+    factory: Callable[[int], LoveLetterMultiAgentEnv],
+    indices: list[int],
+    shared_args: tuple[list[tuple[str, tuple[int, ...], str]], str],
+) -> None:
+    parent_remote.close()
+
+    shared = SharedArrays(*shared_args)
+    observations = shared["observations"]
+    terminal_observations = shared["terminal_observations"]
+    rewards = shared["rewards"]
+    dones = shared["dones"]
+    truncated = shared["truncated"]
+    masks = shared["action_masks"]
+    actions = shared["actions"]
+
+    envs = {i: factory(i) for i in indices}
+
+    def write(i: int, obs: np.ndarray) -> None:
+        observations[i] = obs
+        masks[i] = envs[i]._legal_mask()
+
+    while True:
+        try:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                play_opponents(list(envs.values()), [env.begin_step(int(actions[i])) for i, env in envs.items()])
+
+                finished = []
+                for i, env in envs.items():
+                    obs, reward, terminated, trunc, _ = env.cycle_result
+                    done = terminated or trunc
+                    if done:
+                        terminal_observations[i] = obs
+                        finished.append(i)
+
+                    rewards[i] = reward
+                    dones[i] = done
+                    truncated[i] = trunc and not terminated
+
+                play_opponents([envs[i] for i in finished], [envs[i].begin_reset() for i in finished])
+
+                # The observation of the step, or of the reset if the game ended
+                for i, env in envs.items():
+                    write(i, env.cycle_result[0])
+                remote.send(None)
+            elif cmd == "reset":
+                seeds, options = data
+                pending = []
+                for i, env in envs.items():
+                    maybe_options = {"options": options[i]} if options[i] else {}
+                    pending.append(env.begin_reset(seed=seeds[i], **maybe_options))
+                play_opponents(list(envs.values()), pending)
+
+                for i, env in envs.items():
+                    write(i, env.cycle_result[0])
+                remote.send(None)
+            elif cmd == "get_attr":
+                name, local = data
+                remote.send([getattr(envs[i], name) for i in local])
+            elif cmd == "set_attr":
+                name, value, local = data
+                for i in local:
+                    setattr(envs[i], name, value)
+                remote.send(None)
+            elif cmd == "env_method":
+                name, args, kwargs, local = data
+                remote.send([getattr(envs[i], name)(*args, **kwargs) for i in local])
+            elif cmd == "close":
+                for env in envs.values():
+                    env.close()
+                remote.close()
+                break
+            else:
+                raise NotImplementedError(f"`{cmd}` is not implemented in the worker")
+        except (EOFError, KeyboardInterrupt):
+            break
+
+    del observations, terminal_observations, rewards, dones, truncated, masks, actions
+    shared.close()
+
+
+class SharedMemoryVecEnv(VecEnv):
+    """
+    Runs LoveLetterMultiAgentEnv instances in worker processes.
+
+    Each worker builds its envs from a factory and writes observations,
+    rewards, dones and valid action masks straight into shared memory. Only
+    short commands travel over the pipes, so stepping doesn't pickle any game
+    state. Several envs can share a worker, which amortizes the round trip
+    over more games.
+
+    Args:
+        factory: Picklable callable that builds the env with a given index.
+        num_envs: Total number of envs.
+        n_workers: Number of processes. Defaults to one per CPU, and never
+            exceeds num_envs.
+        start_method: multiprocessing start method, as in SubprocVecEnv.
+        copy: Return copies of the shared arrays from reset() and step(). If
+            False, the returned arrays are views that the next step overwrites.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[int], LoveLetterMultiAgentEnv],
+        num_envs: int,
+        n_workers: int | None = None,
+        start_method: str | None = None,
+        copy: bool = True,
+    ):
+        self.copy = copy
+        self.waiting = False
+        self.closed = False
+
+        if n_workers is None:
+            n_workers = mp.cpu_count()
+        n_workers = max(1, min(n_workers, num_envs))
+
+        actions = generate_actions(Observation.MAX_NUM_PLAYERS)
+        num_actions = len(actions)
+        vec_length = Observation.layout().player_vec_length
+
+        self.shared = SharedArrays([
+            ("observations", (num_envs, vec_length), "int64"),
+            ("terminal_observations", (num_envs, vec_length), "int64"),
+            ("rewards", (num_envs,), "float32"),
+            ("dones", (num_envs,), "bool"),
+            ("truncated", (num_envs,), "bool"),
+            ("action_masks", (num_envs, num_actions), "int8"),
+            ("actions", (num_envs,), "int64"),
+        ])
+
+        if start_method is None:
+            # Same default as SubprocVecEnv
+            forkserver_available = "forkserver" in mp.get_all_start_methods()
+            start_method = "forkserver" if forkserver_available else "spawn"
+        ctx = mp.get_context(start_method)
+
+        # Contiguous blocks of envs per worker
+        self.worker_indices = [
+            block.tolist() for block in np.array_split(np.arange(num_envs), n_workers)
+        ]
+        self.env_workers = np.repeat(
+            np.arange(n_workers), [len(block) for block in self.worker_indices]
+        )
+
+        self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in range(n_workers)])
+        self.processes = []
+        for work_remote, remote, indices in zip(self.work_remotes, self.remotes, self.worker_indices):
+            args = (work_remote, remote, factory, indices, self.shared.attach_args())
+            # daemon=True: if the main process crashes, we should not cause things to hang
+            process = ctx.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        action_space = spaces.Discrete(num_actions)
+        observation_space = Observation.space(num_actions)
+
+        super().__init__(num_envs, observation_space, action_space)
+
+    def _output(self, array: np.ndarray) -> np.ndarray:
+        return array.copy() if self.copy else array
+
+    def _broadcast(self, cmd: str, data: Any = None) -> None:
+        for remote in self.remotes:
+            remote.send((cmd, data))
+        for remote in self.remotes:
+            remote.recv()
+
+    def reset(self) -> np.ndarray:
+        self._broadcast("reset", (self._seeds, self._options))
+        self._reset_seeds()
+        self._reset_options()
+        return self._output(self.shared["observations"])
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self.shared["actions"][:] = np.asarray(actions).reshape(self.num_envs)
+        for remote in self.remotes:
+            remote.send(("step", None))
+        self.waiting = True
+
+    def step_wait(self) -> VecEnvStepReturn:
+        for remote in self.remotes:
+            remote.recv()
+        self.waiting = False
+
+        dones = self.shared["dones"]
+        infos: list[dict[str, Any]] = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(dones):
+            infos[i]["terminal_observation"] = self.shared["terminal_observations"][i].copy()
+            infos[i]["TimeLimit.truncated"] = bool(self.shared["truncated"][i])
+
+        return (
+            self._output(self.shared["observations"]),
+            self._output(self.shared["rewards"]),
+            self._output(dones),
+            infos,
+        )
+
+    def action_masks(self) -> np.ndarray:
+        """
+        Valid action masks of the training agent in every env, for MaskablePPO.
+        """
+
+        return self.shared["action_masks"].astype(bool)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.shared.close()
+        self.closed = True
+
+    def _indices(self, indices: VecEnvIndices) -> list[int]:
+        if indices is None:
+            return list(range(self.num_envs))
+        if isinstance(indices, int):
+            return [indices]
+        return list(indices)
+
+    def _call(self, cmd: str, args: tuple, indices: VecEnvIndices) -> list[Any]:
+        """
+        Send a command to the workers owning the given envs, and gather the results in order.
+        """
+
+        indices = self._indices(indices)
+        workers = self.env_workers[indices]
+
+        for worker in np.unique(workers):
+            local = [i for i, w in zip(indices, workers) if w == worker]
+            self.remotes[worker].send((cmd, (*args, local)))
+
+        results: dict[int, Any] = {}
+        for worker in np.unique(workers):
+            local = [i for i, w in zip(indices, workers) if w == worker]
+            values = self.remotes[worker].recv()
+            if values is not None:
+                results.update(zip(local, values))
+
+        return [results.get(i) for i in indices]
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> list[Any]:
+        return self._call("get_attr", (attr_name,), indices)
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
+        self._call("set_attr", (attr_name, value), indices)
+
+    def env_method(self, method_name: str, *method_args, indices: VecEnvIndices = None, **method_kwargs) -> list[Any]:
+        if method_name == "action_masks":
+            masks = self.action_masks()
+            return [masks[i] for i in self._indices(indices)]
+
+        return self._call("env_method", (method_name, method_args, method_kwargs), indices)
+
+    def env_is_wrapped(self, wrapper_class: type, indices: VecEnvIndices = None) -> list[bool]:
+        return [False for _ in self._indices(indices)]
+
+
+class BatchedOpponentVecEnv(VecEnv):
+    """
+    Steps LoveLetterMultiAgentEnv instances in this process, evaluating their
+    opponents' moves in batches.
+
+    Every env pauses at each opponent decision (see begin_step()). Pending
+    decisions that belong to the same policy object are then gathered across
+    all envs and evaluated with a single predict() call, so a model that plays
+    several seats in many envs costs one forward pass per round of opponent
+    moves, rather than one per move. See play_opponents().
+
+    Args:
+        factory: Callable that builds the env with a given index.
+        num_envs: Number of envs.
+        opponents: Policies for positions 1 to num_players - 1 of every env,
+            e.g. stable-baselines3 models whose predict() takes batches of
+            observations and action_masks. The envs' training agent must be
+            in position 0. Defaults to each env's own agents.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[int], LoveLetterMultiAgentEnv],
+        num_envs: int,
+        opponents: Sequence[Any] | None = None,
+    ):
+        self.envs = [factory(i) for i in range(num_envs)]
+
+        if opponents is not None:
+            for env in self.envs:
+                if len(opponents) != env.num_players - 1:
+                    raise ValueError("Must have one opponent per position other than the training agent's")
+                env.set_agents([env.players[0].agent, *opponents])
+
+        self._actions: np.ndarray | None = None
+
+        actions = generate_actions(Observation.MAX_NUM_PLAYERS)
+        action_space = spaces.Discrete(len(actions))
+        observation_space = Observation.space(len(actions))
+
+        super().__init__(num_envs, observation_space, action_space)
+
+    def reset(self) -> np.ndarray:
+        pending = []
+        for env, seed, options in zip(self.envs, self._seeds, self._options):
+            maybe_options = {"options": options} if options else {}
+            pending.append(env.begin_reset(seed=seed, **maybe_options))
+        self._reset_seeds()
+        self._reset_options()
+
+        play_opponents(self.envs, pending)
+        return np.stack([env.cycle_result[0] for env in self.envs])
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._actions = np.asarray(actions).reshape(self.num_envs)
+
+    def step_wait(self) -> VecEnvStepReturn:
+        assert self._actions is not None, "step_async() must be called first"
+        actions = self._actions.tolist()
+        self._actions = None
+
+        play_opponents(self.envs, [env.begin_step(action_id) for env, action_id in zip(self.envs, actions)])
+
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        dones = np.zeros(self.num_envs, dtype=bool)
+        infos: list[dict[str, Any]] = [{} for _ in range(self.num_envs)]
+
+        for i, env in enumerate(self.envs):
+            obs, reward, terminated, truncated, info = env.cycle_result
+            rewards[i] = reward
+            dones[i] = terminated or truncated
+            infos[i] = info
+            if dones[i]:
+                infos[i]["terminal_observation"] = obs
+                infos[i]["TimeLimit.truncated"] = truncated and not terminated
+
+        finished = np.flatnonzero(dones).tolist()
+        play_opponents([self.envs[i] for i in finished], [self.envs[i].begin_reset() for i in finished])
+
+        # The observation of the step, or of the reset if the game ended
+        obs = np.stack([env.cycle_result[0] for env in self.envs])
+        return obs, rewards, dones, infos
+
+    def action_masks(self) -> np.ndarray:
+        """
+        Valid action masks of the training agent in every env, for MaskablePPO.
+        """
+
+        return np.stack([env.valid_action_mask() for env in self.envs]).astype(bool)
+
+    def close(self) -> None:
+        for env in self.envs:
+            env.close()
+
+    def _indices(self, indices: VecEnvIndices) -> list[int]:
+        if indices is None:
+            return list(range(self.num_envs))
+        if isinstance(indices, int):
+            return [indices]
+        return list(indices)
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> list[Any]:
+        return [getattr(self.envs[i], attr_name) for i in self._indices(indices)]
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
+        for i in self._indices(indices):
+            setattr(self.envs[i], attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices: VecEnvIndices = None, **method_kwargs) -> list[Any]:
+        return [getattr(self.envs[i], method_name)(*method_args, **method_kwargs) for i in self._indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class: type, indices: VecEnvIndices = None) -> list[bool]:
+        return [False for _ in self._indices(indices)]
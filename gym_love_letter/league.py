@@ -0,0 +1,324 @@
+"""
+Rate the models in a zoo against each other, keeping the ratings between runs.
+
+Run with:
+
+    python -m gym_love_letter.league zoo --store league.json
+    python -m gym_love_letter.league zoo --store league.json --table-size 4 --pairing swiss --rounds 5 --include random
+
+Every table of players plays a fixed number of games with rotating seats
+(see gym_love_letter.tournament), and is only ever played once. Ratings are
+updated after each table and the store is saved, so an interrupted run
+loses at most the tables in flight. With round-robin pairings, running the
+league again after a new checkpoint is saved only plays the tables that
+include it.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import multiprocessing as mp
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+
+import click
+
+from gym_love_letter import zoo
+from gym_love_letter.tournament import TournamentStats, play_shard
+from gym_love_letter.zoo import ModelZoo
+
+
+PAIRINGS = ("round-robin", "swiss")
+
+DEFAULT_RATING = 1500.0
+
+# Elo K factor per game. Tables are rated on all their games at once, so
+# this is much smaller than the usual per-game K.
+DEFAULT_K = 4.0
+
+
+def expected_score(rating: float, other: float) -> float:
+    return 1 / (1 + 10 ** ((other - rating) / 400))
+
+
+@dataclass
+class TableResult:
+    players: list[str]
+    games: int
+    invalid: int
+    wins: list[int]
+    head_to_head: list[list[int]]
+
+
+class League:
+    """
+    Players, their Elo ratings, and the results of every table played so
+    far, persisted in a JSON store.
+
+    Multiplayer tables are rated as every pair of players at the table: a
+    player scores 1 against each player it won a game without, and 0.5 for
+    games they both won or both lost. Rating changes are divided by the
+    number of opponents, so a table moves ratings about as much as a
+    heads-up match of the same length.
+
+    Args:
+        store: The JSON file. Loaded if it exists.
+        table_size: Players per table, 2 to 4.
+        games_per_table: Games each new table plays.
+        k: Elo K factor per game.
+        seed: Base seed. Each table's games are seeded from this and the
+            names of its players, so results don't depend on scheduling.
+    """
+
+    def __init__(
+        self,
+        store: str,
+        table_size: int = 2,
+        games_per_table: int = 100,
+        k: float = DEFAULT_K,
+        seed: int = 0,
+    ):
+        if not 2 <= table_size <= 4:
+            raise ValueError("Tables seat 2 to 4 players")
+
+        self.store = store
+        self.table_size = table_size
+        self.games_per_table = games_per_table
+        self.k = k
+        self.seed = seed
+
+        self.players: dict[str, str] = {}
+        self.ratings: dict[str, float] = {}
+        self.games: dict[str, int] = {}
+        self.tables: dict[str, TableResult] = {}
+
+        if os.path.exists(store):
+            with open(store) as f:
+                data = json.load(f)
+            self.players = data["players"]
+            self.ratings = data["ratings"]
+            self.games = data["games"]
+            self.tables = {key: TableResult(**table) for key, table in data["tables"].items()}
+
+    def save(self) -> None:
+        data = {
+            "players": self.players,
+            "ratings": self.ratings,
+            "games": self.games,
+            "tables": {key: asdict(table) for key, table in self.tables.items()},
+        }
+
+        # Replace the store in one step, so it's never left half written
+        tmp = f"{self.store}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, self.store)
+
+    def add(self, name: str, spec: str) -> bool:
+        """
+        Add a player, given its tournament agent spec.
+
+        Returns:
+            Whether the player is new.
+        """
+
+        if name in self.players:
+            return False
+
+        self.players[name] = spec
+        self.ratings[name] = DEFAULT_RATING
+        self.games[name] = 0
+        return True
+
+    def add_zoo(self, models: ModelZoo) -> list[str]:
+        """
+        Returns:
+            The names of the models that weren't in the league yet.
+        """
+
+        return [name for name in models.names if self.add(name, models.spec(name))]
+
+    @staticmethod
+    def key(players: list[str]) -> str:
+        return " vs ".join(sorted(players))
+
+    def played(self, players: list[str]) -> bool:
+        return self.key(players) in self.tables
+
+    def round_robin(self) -> list[list[str]]:
+        """
+        Returns:
+            Every table of players that hasn't been played yet.
+        """
+
+        tables = itertools.combinations(sorted(self.players), self.table_size)
+        return [list(table) for table in tables if not self.played(list(table))]
+
+    def swiss_round(self) -> list[list[str]]:
+        """
+        Seat players with the closest ratings together, never repeating a
+        table. Going down the standings, each unseated player is seated with
+        the nearest unseated players it hasn't played this table with. Players
+        left without a new table sit the round out.
+
+        Returns:
+            The tables of one round.
+        """
+
+        unseated = self.standings()
+        tables = []
+        while len(unseated) >= self.table_size:
+            first, rest = unseated[0], unseated[1:]
+            for others in itertools.combinations(rest, self.table_size - 1):
+                table = [first, *others]
+                if not self.played(table):
+                    tables.append(sorted(table))
+                    unseated = [name for name in rest if name not in others]
+                    break
+            else:
+                unseated = rest
+
+        return tables
+
+    def standings(self) -> list[str]:
+        """
+        Returns:
+            The players by rating, highest first.
+        """
+
+        return sorted(self.players, key=lambda name: (-self.ratings[name], name))
+
+    def record(self, players: list[str], stats: TournamentStats) -> None:
+        """
+        Rate a table's games and add them to the results.
+        """
+
+        players = list(players)
+        self.tables[self.key(players)] = TableResult(
+            players, stats.games, stats.invalid, stats.agent_wins, stats.head_to_head
+        )
+        if stats.games == 0:
+            return
+
+        h2h = stats.head_to_head
+        scale = self.k / (len(players) - 1)
+        changes = [0.0] * len(players)
+        for i, j in itertools.combinations(range(len(players)), 2):
+            # Games neither won outright against the other count as draws
+            draws = stats.games - h2h[i][j] - h2h[j][i]
+            score = h2h[i][j] + 0.5 * draws
+            expected = stats.games * expected_score(self.ratings[players[i]], self.ratings[players[j]])
+            changes[i] += scale * (score - expected)
+            changes[j] -= scale * (score - expected)
+
+        for name, change in zip(players, changes):
+            self.ratings[name] += change
+            self.games[name] += stats.games
+
+    def play(
+        self,
+        tables: list[list[str]],
+        n_workers: Optional[int] = None,
+        shard_size: int = 50,
+        cache_size: int = zoo.DEFAULT_CACHE_SIZE,
+        progress: Optional[Callable[[list[str], TableResult], None]] = None,
+    ) -> None:
+        """
+        Play the tables, sharding all of their games over one process pool,
+        and record them. Tables are recorded in the order given, each as soon
+        as it and every table before it are finished, and the store is saved
+        after each.
+
+        Args:
+            cache_size: Models each worker keeps loaded.
+            progress: Called with each table's players and result once it's
+                recorded.
+        """
+
+        tables = [sorted(table) for table in tables if not self.played(table)]
+        shards = []
+        for index, table in enumerate(tables):
+            specs = [self.players[name] for name in table]
+            seed = self.seed + zlib.crc32(self.key(table).encode())
+            for start in range(0, self.games_per_table, shard_size):
+                size = min(shard_size, self.games_per_table - start)
+                shards.append((index, (specs, start, size, seed, True)))
+
+        totals = [TournamentStats(len(table)) for table in tables]
+        remaining = [0] * len(tables)
+        for index, _ in shards:
+            remaining[index] += 1
+
+        recorded = 0
+
+        def finish(index: int, stats: TournamentStats) -> None:
+            nonlocal recorded
+            totals[index].merge(stats)
+            remaining[index] -= 1
+            while recorded < len(tables) and remaining[recorded] == 0:
+                self.record(tables[recorded], totals[recorded])
+                self.save()
+                if progress is not None:
+                    progress(tables[recorded], self.tables[self.key(tables[recorded])])
+                recorded += 1
+
+        if n_workers == 1:
+            zoo.set_cache_size(cache_size)
+            for index, args in shards:
+                finish(index, play_shard(*args))
+            return
+
+        # Same default as stable-baselines3's SubprocVecEnv
+        method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=mp.get_context(method),
+            initializer=zoo.set_cache_size,
+            initargs=(cache_size,),
+        ) as pool:
+            futures = {pool.submit(play_shard, *args): index for index, args in shards}
+            for future in as_completed(futures):
+                finish(futures[future], future.result())
+
+
+@click.command()
+@click.argument("zoo_dir", type=click.Path(exists=True, file_okay=False))
+@click.option("--store", default="league.json", show_default=True, help="JSON file with the ratings and results")
+@click.option("--include", multiple=True, help="Agent specs to rate alongside the models, e.g. random")
+@click.option("--table-size", default=2, show_default=True, type=click.IntRange(2, 4), help="Players per table")
+@click.option("--pairing", type=click.Choice(PAIRINGS), default="round-robin", show_default=True)
+@click.option("--rounds", default=1, show_default=True, help="Rounds of Swiss pairings to play")
+@click.option("--games", "-n", default=100, show_default=True, help="Games per table")
+@click.option("--k", default=DEFAULT_K, show_default=True, help="Elo K factor per game")
+@click.option("--seed", default=0, show_default=True)
+@click.option("--n-workers", type=int, help="Processes to play the games in. Defaults to one per CPU.")
+@click.option("--shard-size", default=50, show_default=True, help="Games per task sent to a worker")
+@click.option("--cache-size", default=zoo.DEFAULT_CACHE_SIZE, show_default=True, help="Models each worker keeps loaded")
+def main(zoo_dir, store, include, table_size, pairing, rounds, games, k, seed, n_workers, shard_size, cache_size):
+    league = League(store, table_size=table_size, games_per_table=games, k=k, seed=seed)
+
+    added = league.add_zoo(ModelZoo(zoo_dir))
+    added += [spec for spec in include if league.add(spec, spec)]
+    click.echo(f"{len(league.players)} players, {len(added)} new", err=True)
+
+    def progress(players: list[str], result: TableResult) -> None:
+        wins = ", ".join(f"{name} {wins}" for name, wins in zip(players, result.wins))
+        click.echo(f"{league.key(players)}: {wins} of {result.games}", err=True)
+
+    for _ in range(rounds if pairing == "swiss" else 1):
+        tables = league.round_robin() if pairing == "round-robin" else league.swiss_round()
+        if not tables:
+            break
+        league.play(tables, n_workers=n_workers, shard_size=shard_size, cache_size=cache_size, progress=progress)
+
+    league.save()
+    for rank, name in enumerate(league.standings(), start=1):
+        click.echo(f"{rank:>3}. {league.ratings[name]:7.1f}  {league.games[name]:>6} games  {name}")
+
+
+if __name__ == "__main__":
+    main()
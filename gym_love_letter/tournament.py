@@ -0,0 +1,388 @@
+"""
+Play agents against each other over many seeded games, in parallel.
+
+Run with:
+
+    python -m gym_love_letter.tournament ismcts:200 random random random --games 20000
+    python -m gym_love_letter.tournament maskable:zoo/best_model.zip random --output report.json
+
+Each agent spec takes a seat, in order. With seat rotation (the default),
+game i moves every agent i seats further around the table, so each agent
+plays every seat equally often. Games are split into shards of consecutive
+game numbers, and game i is always played with seed + i, so results don't
+depend on the number of workers or the shard size.
+
+Agent specs:
+    random            uniformly random valid actions
+    heuristic         random, but uses what it knows (see heuristic_rollout)
+    ismcts[:N]        information-set MCTS with N iterations per move
+    ppo:PATH          a saved stable-baselines3 PPO model
+    maskable:PATH     a saved sb3-contrib MaskablePPO model
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import multiprocessing as mp
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+import click
+import numpy as np
+
+from gym_love_letter import zoo
+from gym_love_letter.agents import Agent, RandomAgent
+from gym_love_letter.envs.base import InvalidPlayError, LoveLetterBaseEnv
+
+
+# Games longer than this are abandoned and counted as invalid
+STEP_LIMIT = 100
+
+# z for 95% confidence intervals
+Z_95 = 1.959963984540054
+
+
+def wilson_interval(successes: float, trials: int, z: float = Z_95) -> tuple[float, float]:
+    """
+    Wilson score interval for a binomial proportion.
+    """
+
+    if trials == 0:
+        return 0.0, 1.0
+
+    p = successes / trials
+    denominator = 1 + z ** 2 / trials
+    center = (p + z ** 2 / (2 * trials)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / trials + z ** 2 / (4 * trials ** 2)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+class ModelAgent(Agent):
+    """
+    Plays a stable-baselines3 model's choice from the vector observation.
+    Invalid choices are replaced by a random valid action.
+    """
+
+    def __init__(self, env, model, deterministic: bool = True, seed: int | None = None):
+        super().__init__(env)
+        self.model = model
+        self.deterministic = deterministic
+        self.rng = np.random.default_rng(seed)
+
+    def predict(self, observation, action_masks: Optional[np.ndarray] = None, **kwargs) -> tuple[int, None]:
+        if action_masks is None:
+            action_masks = self.env.valid_action_mask()
+
+        try:
+            action_id, _ = self.model.predict(observation, action_masks=action_masks, deterministic=self.deterministic)
+        except TypeError:
+            # Models without masking support
+            action_id, _ = self.model.predict(observation, deterministic=self.deterministic)
+
+        action_id = int(action_id)
+        if not action_masks[action_id]:
+            legal = np.flatnonzero(action_masks)
+            action_id = int(legal[self.rng.integers(len(legal))])
+        return action_id, None
+
+
+class RolloutAgent(Agent):
+    """
+    Plays the actions of an ISMCTS rollout policy.
+    """
+
+    def __init__(self, env, policy, seed: int | None = None):
+        super().__init__(env)
+        self.policy = policy
+        self.rng = np.random.default_rng(seed)
+
+    def predict(self, observation=None, action_masks: Optional[np.ndarray] = None, **kwargs) -> tuple[int, None]:
+        return self.policy(self.env, self.rng), None
+
+
+def build_agent(spec: str, env: LoveLetterBaseEnv, seed: int) -> Agent:
+    kind, _, arg = spec.partition(":")
+
+    if kind == "random":
+        return RandomAgent(env, seed)
+
+    if kind == "heuristic":
+        from gym_love_letter.agents.ismcts import heuristic_rollout
+
+        return RolloutAgent(env, heuristic_rollout, seed)
+
+    if kind == "ismcts":
+        from gym_love_letter.agents.ismcts import ISMCTSAgent, heuristic_rollout
+
+        iterations = int(arg) if arg else 1000
+        return ISMCTSAgent(env, iterations=iterations, rollout_policy=heuristic_rollout, seed=seed)
+
+    if kind in ("ppo", "maskable"):
+        if not arg:
+            raise ValueError(f"Agent spec {spec!r} needs a model path")
+        return ModelAgent(env, zoo.cache.get(arg, kind), seed=seed)
+
+    raise ValueError(f"Unknown agent spec {spec!r}")
+
+
+@dataclass
+class TournamentStats:
+    """
+    Counts by agent (in spec order) and by seat. Wins include shared wins.
+    head_to_head[i][j] counts the games agent i won and agent j didn't.
+    """
+
+    num_agents: int
+    games: int = 0
+    invalid: int = 0
+    steps: int = 0
+    agent_games: list[int] = field(default_factory=list)
+    agent_wins: list[int] = field(default_factory=list)
+    agent_starts: list[int] = field(default_factory=list)
+    agent_start_wins: list[int] = field(default_factory=list)
+    seat_wins: list[int] = field(default_factory=list)
+    seat_starts: list[int] = field(default_factory=list)
+    head_to_head: list[list[int]] = field(default_factory=list)
+
+    def __post_init__(self):
+        for name in ("agent_games", "agent_wins", "agent_starts", "agent_start_wins", "seat_wins", "seat_starts"):
+            if not getattr(self, name):
+                setattr(self, name, [0] * self.num_agents)
+        if not self.head_to_head:
+            self.head_to_head = [[0] * self.num_agents for _ in range(self.num_agents)]
+
+    def merge(self, other: TournamentStats) -> None:
+        self.games += other.games
+        self.invalid += other.invalid
+        self.steps += other.steps
+        for name in ("agent_games", "agent_wins", "agent_starts", "agent_start_wins", "seat_wins", "seat_starts"):
+            mine = getattr(self, name)
+            for i, value in enumerate(getattr(other, name)):
+                mine[i] += value
+        for mine, theirs in zip(self.head_to_head, other.head_to_head):
+            for j, value in enumerate(theirs):
+                mine[j] += value
+
+
+def seating(game: int, num_agents: int, rotate: bool) -> list[int]:
+    """
+    Returns:
+        The index of the agent spec in each seat.
+    """
+
+    shift = game % num_agents if rotate else 0
+    return [(seat - shift) % num_agents for seat in range(num_agents)]
+
+
+def play_shard(specs: list[str], first_game: int, num_games: int, seed: int, rotate: bool) -> TournamentStats:
+    """
+    Play games first_game to first_game + num_games - 1.
+    """
+
+    num_agents = len(specs)
+    env = LoveLetterBaseEnv(num_players=num_agents, observation_info=False)
+    stats = TournamentStats(num_agents)
+
+    for game in range(first_game, first_game + num_games):
+        game_seed = seed + game
+        seats = seating(game, num_agents, rotate)
+        env.set_agents([build_agent(specs[seats[s]], env, game_seed * num_agents + s) for s in range(num_agents)])
+        env.reset(seed=game_seed)
+        obs = env._obs_buffer.vector(env.current_player.position)
+        starting = env.starting_player.position
+
+        steps = 0
+        try:
+            while not env.game_over and steps < STEP_LIMIT:
+                if env.current_player.active:
+                    mask = env.valid_action_mask()
+                    action_id, _ = env.current_player.agent.predict(obs, action_masks=mask)
+                    obs, _, _, _, _ = env.step(int(action_id))
+                    steps += 1
+                else:
+                    obs, _, _, _, _ = env._next_player()
+        except InvalidPlayError:
+            steps = STEP_LIMIT
+
+        stats.steps += steps
+        if not env.game_over:
+            stats.invalid += 1
+            continue
+
+        stats.games += 1
+        stats.seat_starts[starting] += 1
+        stats.agent_starts[seats[starting]] += 1
+        for seat in range(num_agents):
+            stats.agent_games[seats[seat]] += 1
+
+        won = [False] * num_agents
+        for winner in env.winners:
+            won[winner.position] = True
+            stats.seat_wins[winner.position] += 1
+            stats.agent_wins[seats[winner.position]] += 1
+            if winner.position == starting:
+                stats.agent_start_wins[seats[starting]] += 1
+
+        for seat in range(num_agents):
+            if won[seat]:
+                for other in range(num_agents):
+                    if not won[other]:
+                        stats.head_to_head[seats[seat]][seats[other]] += 1
+
+    for agent in env._agents:
+        if hasattr(agent, "close"):
+            agent.close()
+
+    return stats
+
+
+def run(
+    specs: list[str],
+    games: int,
+    seed: int = 0,
+    rotate: bool = True,
+    n_workers: int | None = None,
+    shard_size: int = 100,
+    progress=None,
+) -> TournamentStats:
+    """
+    Play the tournament, sharded over a process pool.
+
+    Args:
+        progress: Called with the running totals after every shard.
+    """
+
+    total = TournamentStats(len(specs))
+    shards = [(start, min(shard_size, games - start)) for start in range(0, games, shard_size)]
+
+    if n_workers == 1:
+        for start, size in shards:
+            total.merge(play_shard(specs, start, size, seed, rotate))
+            if progress is not None:
+                progress(total)
+        return total
+
+    # Same default as stable-baselines3's SubprocVecEnv
+    method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp.get_context(method)) as pool:
+        futures = [pool.submit(play_shard, specs, start, size, seed, rotate) for start, size in shards]
+        for future in as_completed(futures):
+            total.merge(future.result())
+            if progress is not None:
+                progress(total)
+
+    return total
+
+
+def labels(specs: list[str]) -> list[str]:
+    """
+    Returns:
+        The specs, numbered where the same spec plays more than one seat.
+    """
+
+    return [f"{spec}#{i}" if specs.count(spec) > 1 else spec for i, spec in enumerate(specs)]
+
+
+def report(specs: list[str], stats: TournamentStats) -> dict:
+    agents = []
+    for i, spec in enumerate(labels(specs)):
+        played = stats.agent_games[i]
+        wins = stats.agent_wins[i]
+        low, high = wilson_interval(wins, played)
+        agents.append({
+            "spec": spec,
+            "games": played,
+            "wins": wins,
+            "win_rate": wins / played if played else 0.0,
+            "win_rate_ci95": [low, high],
+            "starts": stats.agent_starts[i],
+            "wins_when_starting": stats.agent_start_wins[i],
+        })
+
+    seats = []
+    for seat in range(stats.num_agents):
+        low, high = wilson_interval(stats.seat_wins[seat], stats.games)
+        seats.append({
+            "seat": seat,
+            "wins": stats.seat_wins[seat],
+            "win_rate": stats.seat_wins[seat] / stats.games if stats.games else 0.0,
+            "win_rate_ci95": [low, high],
+            "starts": stats.seat_starts[seat],
+        })
+
+    return {"games": stats.games, "invalid": stats.invalid, "agents": agents, "seats": seats, "counts": asdict(stats)}
+
+
+def format_progress(specs: list[str], stats: TournamentStats, games: int) -> str:
+    """
+    A single line summary of the games played so far: each agent's win rate,
+    and the wins and starts of each seat.
+    """
+
+    rates = " ".join(
+        f"{spec}={stats.agent_wins[i] / max(stats.agent_games[i], 1):.3f}" for i, spec in enumerate(labels(specs))
+    )
+    seats = " ".join(
+        f"seat{seat}={wins}/{starts}" for seat, (wins, starts) in enumerate(zip(stats.seat_wins, stats.seat_starts))
+    )
+    return f"[{stats.games + stats.invalid}/{games}] invalid={stats.invalid} {rates} wins/starts {seats}"
+
+
+def format_report(data: dict, elapsed: float | None = None) -> str:
+    lines = [f"{data['games']} games, {data['invalid']} invalid"]
+    if elapsed:
+        lines[0] += f", {data['games'] / elapsed:,.1f} games/s"
+
+    width = max(len(agent["spec"]) for agent in data["agents"])
+    for agent in data["agents"]:
+        low, high = agent["win_rate_ci95"]
+        lines.append(
+            f"  {agent['spec']:<{width}}  win rate {agent['win_rate']:.3f} [{low:.3f}, {high:.3f}]"
+            f"  ({agent['wins']}/{agent['games']}, started {agent['starts']}, won {agent['wins_when_starting']} of those)"
+        )
+
+    for seat in data["seats"]:
+        low, high = seat["win_rate_ci95"]
+        lines.append(
+            f"  seat {seat['seat']}  win rate {seat['win_rate']:.3f} [{low:.3f}, {high:.3f}]  started {seat['starts']}"
+        )
+
+    return "\n".join(lines)
+
+
+@click.command()
+@click.argument("specs", nargs=-1, required=True)
+@click.option("--games", "-n", default=1000, show_default=True, help="Games to play")
+@click.option("--seed", default=0, show_default=True, help="Game i is played with seed + i")
+@click.option("--rotate/--no-rotate", default=True, show_default=True, help="Rotate the agents' seats every game")
+@click.option("--n-workers", type=int, help="Processes to play the games in. Defaults to one per CPU.")
+@click.option("--shard-size", default=100, show_default=True, help="Games per task sent to a worker")
+@click.option("--output", "-o", type=click.Path(), help="Write the final report to this JSON file")
+def main(specs, games, seed, rotate, n_workers, shard_size, output):
+    specs = list(specs)
+    if not 2 <= len(specs) <= 4:
+        raise click.BadParameter("Expected 2 to 4 agent specs", param_hint="SPECS")
+
+    start = time.perf_counter()
+
+    def progress(stats: TournamentStats) -> None:
+        click.echo(format_progress(specs, stats, games), err=True)
+
+    stats = run(specs, games, seed=seed, rotate=rotate, n_workers=n_workers, shard_size=shard_size, progress=progress)
+    data = report(specs, stats)
+    click.echo(format_report(data, time.perf_counter() - start))
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(data, f, indent=2)
+
+    if stats.games == 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
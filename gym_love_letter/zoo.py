@@ -0,0 +1,155 @@
+"""
+Saved models: finding them in a zoo directory and keeping them loaded.
+"""
+
+from __future__ import annotations
+
+import os
+import zipfile
+from collections import OrderedDict
+from typing import Any
+
+
+# Models kept loaded by each process
+DEFAULT_CACHE_SIZE = 8
+
+
+def model_kind(path: str) -> str:
+    """
+    Returns:
+        "maskable" for a saved sb3-contrib MaskablePPO model, "ppo" otherwise.
+    """
+
+    with zipfile.ZipFile(path) as archive:
+        data = archive.read("data")
+    return "maskable" if b"sb3_contrib" in data else "ppo"
+
+
+def load_model(path: str, kind: str | None = None):
+    if kind is None:
+        kind = model_kind(path)
+
+    if kind == "ppo":
+        from stable_baselines3 import PPO
+
+        return PPO.load(path, device="cpu")
+
+    from sb3_contrib import MaskablePPO
+
+    return MaskablePPO.load(path, device="cpu")
+
+
+class ModelCache:
+    """
+    Loaded models by path, dropping the least recently used beyond capacity.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CACHE_SIZE):
+        if capacity < 1:
+            raise ValueError("The cache must hold at least one model")
+
+        self.capacity = capacity
+        self.models: OrderedDict[tuple[str, str | None], Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.models)
+
+    def get(self, path: str, kind: str | None = None):
+        key = (os.path.abspath(path), kind)
+        model = self.models.get(key)
+        if model is not None:
+            self.hits += 1
+            self.models.move_to_end(key)
+            return model
+
+        self.misses += 1
+        model = load_model(path, kind)
+        self.models[key] = model
+        while len(self.models) > self.capacity:
+            self.models.popitem(last=False)
+        return model
+
+    def resize(self, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError("The cache must hold at least one model")
+
+        self.capacity = capacity
+        while len(self.models) > capacity:
+            self.models.popitem(last=False)
+
+    def clear(self) -> None:
+        self.models.clear()
+
+
+# Shared by everything that loads models in this process, e.g. every game a
+# tournament or league worker plays
+cache = ModelCache()
+
+
+def set_cache_size(capacity: int) -> None:
+    """
+    Resize this process's cache. Also usable as a pool initializer.
+    """
+
+    cache.resize(capacity)
+
+
+class ModelZoo:
+    """
+    The saved models under a directory, such as the zoo/ directory that the
+    training scripts write to. A model's name is its path relative to the
+    root, without the .zip extension, e.g. "ppo_kl/2020-12-27T16:28:42/final_model".
+
+    The directory is scanned when the zoo is created and on refresh(), so
+    checkpoints saved in between show up after a refresh.
+    """
+
+    def __init__(self, root: str):
+        if not os.path.isdir(root):
+            raise ValueError(f"{root} is not a directory")
+
+        self.root = os.path.abspath(root)
+        self.paths: dict[str, str] = {}
+        self.refresh()
+
+    def refresh(self) -> list[str]:
+        """
+        Returns:
+            The names of models that weren't indexed before.
+        """
+
+        paths = {}
+        for directory, _, files in os.walk(self.root):
+            for filename in files:
+                if filename.endswith(".zip"):
+                    path = os.path.join(directory, filename)
+                    name = os.path.relpath(path, self.root)[:-len(".zip")].replace(os.sep, "/")
+                    paths[name] = path
+
+        added = sorted(set(paths) - set(self.paths))
+        self.paths = dict(sorted(paths.items()))
+        return added
+
+    @property
+    def names(self) -> list[str]:
+        return list(self.paths)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.paths
+
+    def spec(self, name: str) -> str:
+        """
+        Returns:
+            The tournament agent spec that plays the model.
+        """
+
+        path = self.paths[name]
+        return f"{model_kind(path)}:{path}"
+
+    def load(self, name: str):
+        return cache.get(self.paths[name])
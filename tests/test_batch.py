@@ -0,0 +1,150 @@
+import numpy as np
+import pytest
+
+from gym_love_letter.envs import LoveLetterBaseEnv
+from gym_love_letter.envs.actions import ActionWrapper
+from gym_love_letter.envs.base import Rewards
+from gym_love_letter.envs.batch import (INVALID_ACTION_REWARD, BatchGameState,
+                                        BatchLoveLetterEnv, BatchRewards)
+from gym_love_letter.envs.observations import Observation
+
+
+def load_game(env, batch, i):
+    """
+    Overwrite the env's game with a game copied out of a batch.
+    """
+
+    state = batch.game(i)
+    env.state.data[:] = state.data
+    env._obs_buffer.reset()
+    env._state_changed()
+    env.events[:] = batch.events[i]
+    env.events_rewarded[:] = batch.events_rewarded[i]
+
+    env.action_history = [
+        ActionWrapper(env.actions[action_id], env.players[seat])
+        for action_id, seat in state.history[:state.num_plays, :2].tolist()
+    ]
+
+
+def encode(env):
+    return Observation(
+        env.num_players,
+        env.players,
+        env.current_player,
+        env.deck,
+        env.discard_pile,
+        env.action_history,
+        env.game_over,
+        env.winners,
+        env,
+    ).vector
+
+
+class TestBatchGameState:
+    @pytest.mark.parametrize("num_players", [2, 3, 4])
+    def test_matches_base_env(self, num_players):
+        """
+        Step every game of a batch alongside a copy in the regular env.
+        """
+
+        num_games = 24
+        rng = np.random.default_rng(num_players)
+        batch = BatchGameState(num_games, num_players)
+        games = np.arange(num_games)
+        batch.reset(games, rng)
+
+        rewards = [Rewards.fast_elimination_reward, Rewards.game_completion_reward, Rewards.game_won_reward]
+        batch_rewards = [BatchRewards.fast_elimination_reward, BatchRewards.game_completion_reward, BatchRewards.game_won_reward]
+
+        env = LoveLetterBaseEnv(num_players=num_players, reward_fn=Rewards.simple_turn_reward)
+        env.reset(seed=0)
+
+        for _ in range(2 * batch.deck_size):
+            for i in games:
+                load_game(env, batch, i)
+                np.testing.assert_array_equal(batch.observe(games[[i]], batch.current[[i]])[0], encode(env))
+                np.testing.assert_array_equal(batch.legal_masks(games[[i]])[0], env.valid_action_mask())
+
+            playing = games[~batch.done(games)]
+            masks = batch.legal_masks(playing)
+            actions = (rng.random(masks.shape) * masks).argmax(axis=1)
+
+            expected = {}
+            for i, action_id in zip(playing, actions):
+                load_game(env, batch, i)
+                env.step(action_id)
+
+                # Rewards are determined when the next player is up, before their events are marked as rewarded
+                expected[i] = env.state.data.copy(), env.events.copy(), env.events_rewarded.copy()
+
+            batch.play(playing, actions)
+            current = batch.current[playing].copy()
+            for reward, batch_reward in zip(rewards, batch_rewards):
+                batch.current[playing] = (current + 1) % num_players
+                for i, game_reward in zip(playing, batch_reward(batch, playing)):
+                    load_game(env, batch, i)
+                    assert game_reward == pytest.approx(reward(env))
+                batch.current[playing] = current
+
+            batch.next_player(playing)
+            for i in playing:
+                data, events, events_rewarded = expected[i]
+                np.testing.assert_array_equal(batch.game(i).data, data)
+                np.testing.assert_array_equal(batch.events[i], events)
+                np.testing.assert_array_equal(batch.events_rewarded[i], events_rewarded)
+
+            # Players who are out (or whose game is over) just pass the turn
+            waiting = games[batch.done(games)]
+            batch.next_player(waiting)
+
+            finished = games[batch.game_over]
+            batch.reset(finished, rng)
+
+
+class TestBatchLoveLetterEnv:
+    @pytest.mark.parametrize("num_players", [2, 3, 4])
+    def test_random_play(self, num_players):
+        env = BatchLoveLetterEnv(32, num_players=num_players, seed=1)
+        obs = env.reset()
+        assert obs.shape == (32, Observation.layout().player_vec_length)
+        assert env.observation_space.contains(obs[0])
+
+        rng = np.random.default_rng(0)
+        episodes = 0
+        for _ in range(100):
+            masks = env.action_masks()
+            assert masks.shape == (32, env.action_space.n)
+
+            # The training agent always has a move at position 0
+            assert masks.any(axis=1).all()
+            assert (env.state.current == 0).all()
+
+            actions = (rng.random(masks.shape) * masks).argmax(axis=1)
+            obs, rewards, dones, infos = env.step(actions)
+            episodes += dones.sum()
+
+            for i in np.flatnonzero(dones):
+                assert "terminal_observation" in infos[i]
+            assert (rewards > INVALID_ACTION_REWARD).all()
+
+        assert episodes > 0
+
+    def test_invalid_action(self):
+        env = BatchLoveLetterEnv(4, seed=2)
+        env.reset()
+
+        actions = np.argmin(env.action_masks(), axis=1)
+        _, rewards, dones, _ = env.step(actions)
+
+        assert (rewards == INVALID_ACTION_REWARD).all()
+        assert dones.all()
+
+    def test_seeding(self):
+        env1 = BatchLoveLetterEnv(8, num_players=3)
+        env2 = BatchLoveLetterEnv(8, num_players=3)
+        env1.seed(5)
+        env2.seed(5)
+
+        np.testing.assert_array_equal(env1.reset(), env2.reset())
+
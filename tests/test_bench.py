@@ -0,0 +1,39 @@
+import pytest
+
+from gym_love_letter import bench
+
+
+class TestBench:
+    def test_run(self):
+        results = bench.run(games=2, repeat=1)
+        names = {r.name for r in results}
+
+        for num_players in bench.PLAYER_COUNTS:
+            assert f"base/{num_players}p/steps_per_sec" in names
+            assert f"multi_agent/{num_players}p/games_per_sec" in names
+            assert f"component/{num_players}p/valid_action_mask" in names
+
+        assert all(r.value > 0 for r in results)
+
+        # Round trip through the JSON format
+        data = bench.to_json(results, games=2, repeat=1)
+        assert bench.load_results(data) == results
+
+    def test_compare(self):
+        baseline = [
+            bench.Result("throughput", 100.0, "steps/s", True),
+            bench.Result("latency", 100.0, "ns/call", False),
+            bench.Result("removed", 100.0, "ns/call", False),
+        ]
+        current = [
+            bench.Result("throughput", 95.0, "steps/s", True),
+            bench.Result("latency", 100.0, "ns/call", False),
+            bench.Result("added", 1.0, "ns/call", False),
+        ]
+        assert bench.compare(current, baseline, threshold=0.1) == []
+
+        current[0].value = 80.0
+        current[1].value = 120.0
+        regressions = bench.compare(current, baseline, threshold=0.1)
+        assert [r.name for r in regressions] == ["throughput", "latency"]
+        assert regressions[0].change == pytest.approx(-0.2)
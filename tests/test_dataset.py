@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+
+from gym_love_letter.envs.base import LoveLetterBaseEnv, LoveLetterMultiAgentEnv
+from gym_love_letter.envs.dataset import TrajectoryDataset
+from gym_love_letter.envs.recording import TrajectoryRecorder
+
+
+def record_multi_agent(directory, games, seed=0):
+    """
+    Record random games of the multi-agent env, returning each step's
+    (obs, action, reward, done, next obs).
+    """
+
+    env = TrajectoryRecorder(LoveLetterMultiAgentEnv(3), directory, shard_size=32)
+    rng = np.random.default_rng(seed)
+    steps = []
+    for game in range(games):
+        obs, _ = env.reset(seed=seed + game)
+        done = False
+        while not done:
+            action_id = int(rng.choice(np.flatnonzero(env.valid_action_mask())))
+            next_obs, reward, done, _, _ = env.step(action_id)
+            steps.append((obs.copy(), action_id, reward, done, next_obs.copy()))
+            obs = next_obs
+    env.close()
+    return steps
+
+
+@pytest.fixture
+def recording(tmp_path):
+    directory = str(tmp_path / "multi")
+    return directory, record_multi_agent(directory, games=20)
+
+
+class TestTrajectoryDataset:
+    def test_transitions(self, recording):
+        directory, steps = recording
+        dataset = TrajectoryDataset(directory)
+        assert len(dataset) == len(steps)
+
+        batch = next(dataset.batches(len(dataset), shuffle=False))
+        for i, (obs, action_id, reward, done, next_obs) in enumerate(steps):
+            assert (batch.obs[i] == obs).all()
+            assert batch.action[i] == action_id
+            assert batch.reward[i] == pytest.approx(reward)
+            assert batch.done[i] == done
+            if not done:
+                assert (batch.next_obs[i] == next_obs).all()
+            else:
+                assert not batch.next_obs[i].any()
+            assert batch.mask[i, action_id]
+
+    @pytest.mark.parametrize("prefetch", [0, 2])
+    def test_shuffled_batches(self, recording, prefetch):
+        directory, steps = recording
+        dataset = TrajectoryDataset(directory)
+        full = next(dataset.batches(len(dataset), shuffle=False))
+
+        seen = []
+        for batch in dataset.batches(10, seed=1, prefetch=prefetch):
+            assert len(batch.action) <= 10
+            seen.extend(batch.obs.tolist())
+
+        assert sorted(seen) == sorted(full.obs.tolist())
+        assert sum(1 for _ in dataset.batches(10, drop_last=True)) == len(dataset) // 10
+
+    def test_base_env_links_seats(self, tmp_path):
+        directory = str(tmp_path / "base")
+        env = TrajectoryRecorder(LoveLetterBaseEnv(4, observation_info=False), directory, shard_size=8)
+        rng = np.random.default_rng(0)
+        for game in range(5):
+            env.reset(seed=game)
+            base = env.unwrapped
+            while not base.game_over:
+                if base.current_player.active:
+                    env.step(int(rng.choice(np.flatnonzero(base.valid_action_mask()))))
+                else:
+                    base._next_player()
+        env.close()
+
+        dataset = TrajectoryDataset([directory, directory])
+        records = np.concatenate(dataset.shards)
+        assert len(dataset) == len(records)
+
+        for index, next_index in enumerate(dataset.next_index.tolist()):
+            if next_index >= 0:
+                assert next_index > index
+                assert records[index]["seat"] == records[next_index]["seat"]
+                assert records[index]["episode"] == records[next_index]["episode"]
+
+        # One terminal transition per seat that moved in each episode, in each copy
+        terminal = (dataset.next_index < 0).sum()
+        assert terminal == 2 * len(set(zip(records["episode"].tolist(), records["seat"].tolist())))
+
+    def test_fill_replay_buffer(self, recording):
+        from stable_baselines3.common.buffers import ReplayBuffer
+
+        directory, steps = recording
+        dataset = TrajectoryDataset(directory)
+        env = LoveLetterMultiAgentEnv(3)
+        buffer = ReplayBuffer(len(dataset) + 10, env.observation_space, env.action_space, n_envs=1)
+
+        assert dataset.fill_replay_buffer(buffer, shuffle=False) == len(dataset)
+        assert buffer.size() == len(dataset)
+        assert (buffer.observations[:len(steps), 0] == np.array([s[0] for s in steps])).all()
+        assert (buffer.actions[:len(steps), 0, 0] == [s[1] for s in steps]).all()
+        assert (buffer.dones[:len(steps), 0] == [s[3] for s in steps]).all()
+
+        # Wraps around once full. Buffer sizes are split between the envs.
+        buffer = ReplayBuffer(20, env.observation_space, env.action_space, n_envs=2)
+        assert dataset.fill_replay_buffer(buffer, seed=0) == 20
+        assert buffer.full and buffer.pos == 0
+        buffer.sample(8)
+
+    def test_fill_rollout_buffer(self, recording):
+        from sb3_contrib import MaskablePPO
+        from sb3_contrib.common.maskable.buffers import MaskableRolloutBuffer
+
+        directory, steps = recording
+        dataset = TrajectoryDataset(directory)
+        env = LoveLetterMultiAgentEnv(3)
+        model = MaskablePPO("MlpPolicy", env, n_steps=16)
+        buffer = MaskableRolloutBuffer(16, env.observation_space, env.action_space, n_envs=2)
+
+        start = dataset.fill_rollout_buffer(buffer, policy=model.policy)
+        assert start == 32
+
+        # The first env's column holds the first trajectories in order
+        assert (buffer.observations[:16, 0] == np.array([s[0] for s in steps[:16]])).all()
+        assert buffer.episode_starts[0].all()
+        for i in range(1, 16):
+            assert buffer.episode_starts[i, 0] == steps[i - 1][3]
+        assert np.isfinite(buffer.advantages).all()
+        assert (buffer.log_probs <= 0).all()
+
+        batches = list(buffer.get(8))
+        assert len(batches) == 4
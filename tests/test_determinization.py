@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from gym_love_letter.engine import Card, Deck
+from gym_love_letter.envs import LoveLetterBaseEnv
+from gym_love_letter.envs.determinization import DeterminizationSampler, sample_determinizations
+
+
+def positions(num_players, seed):
+    """
+    Yield the env at every decision point of a random game.
+    """
+
+    env = LoveLetterBaseEnv(num_players=num_players)
+    obs, _ = env.reset(seed=seed)
+    for player in env.players:
+        player.agent.seed(seed + player.position)
+
+    while not env.game_over:
+        yield env
+        if env.current_player.active:
+            action_id, _ = env.current_player.agent.predict(obs)
+            obs, _, _, _, _ = env.step(action_id)
+        else:
+            obs, _, _, _, _ = env._next_player()
+
+
+class TestDeterminizationSampler:
+    @pytest.mark.parametrize("num_players", [2, 3, 4])
+    def test_samples_match_information_set(self, num_players):
+        scratch = LoveLetterBaseEnv(num_players=num_players)
+        full_deck = sorted(card for card, freq in Deck.card_frequency.items() for _ in range(freq))
+
+        for seed in range(3):
+            for env in positions(num_players, seed):
+                for seat in range(num_players):
+                    sampler = DeterminizationSampler(env, seat)
+                    samples = sampler.sample(8, rng=seed)
+                    vector = env._obs_buffer.vectors[seat].copy()
+                    mask = env.valid_action_mask()
+
+                    # Only the hidden cards (and knowledge of them) may differ
+                    changed = np.zeros(samples.shape[1], dtype=bool)
+                    changed[sampler.hidden] = True
+                    changed[sampler.knowledge_targets] = True
+                    assert (samples[:, ~changed] == sampler.snapshot[~changed]).all()
+
+                    for sample in samples:
+                        scratch.restore(sample)
+                        state = scratch.state
+
+                        # The seat can't tell the sample apart from the real game
+                        np.testing.assert_array_equal(scratch._obs_buffer.vectors[seat], vector)
+                        if seat == env.current_player.position:
+                            np.testing.assert_array_equal(scratch.valid_action_mask(), mask)
+
+                        # Every card is still accounted for exactly once
+                        cards = state.hands[state.hands != Card.EMPTY].tolist()
+                        cards += state.discard[:state.num_discards].tolist()
+                        cards += state.deck[state.pointer:].tolist() + [state.deck[0]]
+                        assert sorted(cards) == full_deck
+
+                        # Everyone's knowledge is true of the sampled hands
+                        for observer in scratch.players:
+                            for target, card in observer.priest_info().items():
+                                assert card in target.hand
+
+    def test_uniform_over_unseen_cards(self):
+        env = LoveLetterBaseEnv(num_players=2)
+        env.reset(seed=4)
+        seat = env.current_player.position
+        other = env.players[1 - seat]
+
+        samples = sample_determinizations(env, 20000, seat=seat, rng=0)
+        sampler = DeterminizationSampler(env, seat)
+        hand_offset = env.state.offsets["hands"] + other.position * 2
+
+        # The opponent's card is equally likely to be any unseen card
+        expected = np.bincount(sampler.pool, minlength=len(Card)) / len(sampler.pool)
+        observed = np.bincount(samples[:, hand_offset], minlength=len(Card)) / len(samples)
+        np.testing.assert_allclose(observed, expected, atol=0.015)
+
+    def test_observation_input(self):
+        env = LoveLetterBaseEnv(num_players=3)
+        env.reset(seed=2)
+
+        sampler = DeterminizationSampler(env.observe())
+        assert sampler.seat == env.current_player.position
+        assert sampler.sample(5, rng=1).shape == (5, len(env.snapshot()))
+
+    def test_known_cards_are_fixed(self):
+        env = LoveLetterBaseEnv(num_players=2)
+        env.reset(seed=0)
+
+        seat = env.current_player
+        other = env.players[1 - seat.position]
+        seat.add_priest_target(other)
+
+        sampler = DeterminizationSampler(env, seat.position)
+        hand_offset = env.state.offsets["hands"] + other.position * 2
+        assert hand_offset not in sampler.hidden
+        assert (sampler.sample(10, rng=0)[:, hand_offset] == other.card).all()
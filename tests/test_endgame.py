@@ -0,0 +1,165 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from gym_love_letter.engine import Card
+from gym_love_letter.envs import LoveLetterBaseEnv
+from gym_love_letter.envs.endgame import ENDGAME_MAX_REMAINING, EndgameSolver, is_endgame
+
+
+def endgames(num_players, max_remaining, seeds):
+    """
+    Yield the snapshots of every decision point of random games once the
+    deck is small enough.
+    """
+
+    env = LoveLetterBaseEnv(num_players=num_players)
+    for seed in seeds:
+        env.reset(seed=seed)
+        rng = np.random.default_rng(seed)
+        while not env.game_over:
+            if not env.current_player.active:
+                env._next_player()
+                continue
+
+            if is_endgame(env, max_remaining):
+                yield env.snapshot()
+            env.step(int(rng.choice(np.flatnonzero(env.valid_action_mask()))))
+
+
+def reference_values(env, mover):
+    """
+    Expectimax by stepping the env. Every play draws at most two cards, so
+    each action is averaged over the ways to deal the next two cards of the
+    deck, which are equally likely.
+    """
+
+    snapshot = env.snapshot()
+    deck = env.state.deck
+    pointer = env.state.pointer
+    undrawn = deck[pointer:].copy()
+    deals = list(itertools.permutations(range(len(undrawn)), min(2, len(undrawn)))) or [()]
+
+    values = {}
+    for action_id in np.flatnonzero(env.valid_action_mask()).tolist():
+        total = 0.0
+        for deal in deals:
+            env.restore(snapshot)
+            rest = [i for i in range(len(undrawn)) if i not in deal]
+            deck[pointer:] = undrawn[list(deal) + rest]
+            env._state_changed()
+
+            env.step(action_id)
+            while not env.game_over and not env.current_player.active:
+                env._next_player()
+
+            if env.game_over:
+                winners = [p.position for p in env.winners]
+                total += 1 / len(winners) if mover in winners else 0.0
+            else:
+                player = env.current_player.position
+                child = reference_values(env, player)
+                # Two players: whatever the opponent doesn't win, the mover does
+                best = max(child.values())
+                total += best if player == mover else 1 - best
+        values[action_id] = total / len(deals)
+
+    env.restore(snapshot)
+    return values
+
+
+class TestEndgameSolver:
+    def test_matches_expectimax(self):
+        env = LoveLetterBaseEnv(num_players=2)
+        solver = EndgameSolver()
+
+        snapshots = list(endgames(2, 3, range(60)))
+        assert snapshots
+
+        for snapshot in snapshots:
+            env.restore(snapshot)
+            expected = reference_values(env, env.current_player.position)
+            env.restore(snapshot)
+            values = solver.action_values(env)
+
+            assert values.keys() == expected.keys()
+            for action_id in values:
+                assert values[action_id] == pytest.approx(expected[action_id])
+
+    @pytest.mark.parametrize("num_players", [2, 3, 4])
+    def test_values_are_consistent(self, num_players):
+        env = LoveLetterBaseEnv(num_players=num_players)
+        solver = EndgameSolver()
+
+        snapshots = list(endgames(num_players, 3, range(30)))
+        assert snapshots
+
+        for snapshot in snapshots:
+            env.restore(snapshot)
+            before = env.snapshot()
+
+            values = solver.value(env)
+            action_values = solver.action_values(env)
+
+            assert np.array_equal(env.snapshot(), before)
+            assert sum(values) == pytest.approx(1)
+            assert all(0 <= v <= 1 for v in values)
+            assert values[env.current_player.position] == pytest.approx(max(action_values.values()))
+            assert env.valid_action_mask()[solver.best_action(env)]
+
+    def test_table_is_bounded(self):
+        env = LoveLetterBaseEnv(num_players=4)
+        solver = EndgameSolver(max_entries=500)
+
+        cleared = False
+        for snapshot in endgames(4, ENDGAME_MAX_REMAINING, range(100)):
+            env.restore(snapshot)
+            size = len(solver.table)
+            solver.action_values(env)
+            assert len(solver.table) <= 500
+            cleared |= len(solver.table) < size
+        assert cleared
+
+    @staticmethod
+    def last_turn(hand, opponent_card):
+        """
+        A two player game where the last card has been drawn by seat 0.
+        """
+
+        env = LoveLetterBaseEnv(num_players=2)
+        env.reset(seed=0)
+
+        state = env.state
+        state.pointer = state.deck_size
+        state.hands[0] = hand
+        state.hands[1] = [opponent_card, Card.EMPTY]
+        state.current = 0
+        env._state_changed()
+        return env
+
+    def test_guard(self):
+        # Only guessing the opponent's King wins
+        env = self.last_turn([Card.GUARD, Card.PRIEST], Card.KING)
+        values = EndgameSolver().action_values(env)
+
+        winning = [a for a, v in values.items() if v == 1.0]
+        assert [(env.actions[a].card, env.actions[a].target, env.actions[a].guess) for a in winning] == [
+            (Card.GUARD, 1, Card.KING)
+        ]
+        assert all(v == 0.0 for a, v in values.items() if a not in winning)
+
+    def test_baron_tie(self):
+        # Comparing Kings changes nothing and the round ends in a tie. Taking
+        # the opponent's King wins outright.
+        env = self.last_turn([Card.BARON, Card.KING], Card.KING)
+        values = {env.actions[a].card: v for a, v in EndgameSolver().action_values(env).items()}
+        assert values == {Card.BARON: 0.5, Card.KING: 1.0}
+
+    def test_game_over(self):
+        env = LoveLetterBaseEnv(num_players=2)
+        env.reset(seed=0)
+        env.game_over = True
+
+        with pytest.raises(ValueError):
+            EndgameSolver().value(env)
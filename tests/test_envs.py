@@ -1,7 +1,16 @@
+import copy
+import dataclasses
+import pickle
+
+import numpy as np
 import pytest
 
 from gym_love_letter.agents import HumanAgent, RandomAgent
-from gym_love_letter.envs import LoveLetterBaseEnv
+from gym_love_letter.engine import Card, Deck, GameState, Hand, Player
+from gym_love_letter.envs import LoveLetterBaseEnv, LoveLetterMultiAgentEnv
+from gym_love_letter.envs.base import InvalidPlayError
+from gym_love_letter.envs.masks import NO_TARGET, mask_table
+from gym_love_letter.envs.observations import Observation
 
 
 class TestBaseEnvInitialization:
@@ -66,3 +75,614 @@ class TestBaseEnvGameplay:
             move_count += 1
 
         assert move_count < MAX_GAME_DURATION
+
+    def test_seeded_reset_ignores_previous_games(self):
+        env = LoveLetterBaseEnv(num_players=3)
+        env.reset(seed=8)
+        snapshot = env.snapshot()
+
+        # A seeded reset deals the same game whatever was played before
+        for seed in range(3):
+            env.reset(seed=seed)
+            while not env.game_over:
+                if env.current_player.active:
+                    env.step(env.valid_actions[0]._id)
+                else:
+                    env._next_player()
+            env.reset(seed=8)
+            np.testing.assert_array_equal(env.snapshot(), snapshot)
+
+
+class TestValidActionMask:
+    @staticmethod
+    def _reference_mask(env):
+        """
+        Derives the valid action mask directly from the rules, one action at a time.
+        """
+
+        hand = env.current_player.hand
+        mask = []
+        for action in env.actions:
+            valid = action.card != Card.EMPTY and action.card in hand.cards
+            if Card.COUNTESS in hand.cards and action.card in [Card.PRINCE, Card.KING]:
+                valid = False
+            if valid and action.card.takes_target:
+                valid = action.target in env._valid_targets(action.card)
+            mask.append(valid)
+
+        return np.array(mask, dtype=np.int8)
+
+    @pytest.mark.parametrize("num_players", [2, 3, 4])
+    def test_mask_matches_rules(self, num_players):
+        env = LoveLetterBaseEnv(num_players=num_players)
+
+        for game in range(25):
+            obs, _ = env.reset(seed=game)
+            while not env.game_over:
+                if not env.current_player.active:
+                    obs, _, _, _, _ = env._next_player()
+                    continue
+
+                mask = env.valid_action_mask()
+                assert mask.dtype == np.int8
+                np.testing.assert_array_equal(mask, self._reference_mask(env))
+
+                action_id, _ = env.current_player.agent.predict(obs)
+                obs, _, _, _, _ = env.step(action_id)
+
+    def test_action_arrays(self):
+        env = LoveLetterBaseEnv(num_players=4)
+        table = env.mask_table
+
+        for action in env.actions:
+            assert table.action_card[action._id] == action.card
+            if action.target is None:
+                assert table.action_target[action._id] == NO_TARGET
+            else:
+                assert table.action_target[action._id] == action.target
+            assert table.action_guess[action._id] == (action.guess or Card.EMPTY)
+
+    def test_tables_are_shared(self):
+        assert mask_table(3) is mask_table(3)
+        assert LoveLetterBaseEnv(num_players=3).mask_table is mask_table(3)
+
+    def test_mask_cache_follows_state(self):
+        env = LoveLetterBaseEnv(num_players=2)
+        env.reset(seed=7)
+
+        mask = env.valid_action_mask()
+        mask[:] = 0  # Callers receive a copy and cannot corrupt the cache
+        assert env.valid_action_mask().any()
+
+        # Mutating the state through the env invalidates the cached mask
+        target = env.players[(env.current_player.position + 1) % env.num_players]
+        target.safe = True
+        env._state_changed()
+        for action in env.valid_actions:
+            assert action.target != 1
+
+    def test_invalid_action_rejected(self):
+        env = LoveLetterMultiAgentEnv(num_players=2)
+        env.reset(seed=3, options={"training": False})
+
+        invalid_id = int(np.flatnonzero(env.valid_action_mask() == 0)[0])
+        with pytest.raises(InvalidPlayError):
+            env.decode_action(invalid_id)
+        with pytest.raises(InvalidPlayError):
+            env.protected_step(invalid_id, full_cycle=False)
+
+
+class TestActionDecoding:
+    def test_actions_are_immutable(self):
+        env = LoveLetterBaseEnv()
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            env.actions[1].target = 0
+
+    @pytest.mark.parametrize("num_players", [2, 3, 4])
+    def test_decoded_actions_are_interned(self, num_players):
+        env = LoveLetterBaseEnv(num_players=num_players)
+        env.reset(seed=11)
+
+        for action in env.valid_actions:
+            decoded = env.decode_action(action._id)
+            assert decoded is env.decode_action(action._id)
+            assert decoded._id == action._id
+            assert decoded.card == action.card
+            if action.target is None:
+                assert decoded.target is None
+            else:
+                expected = (action.target + env.current_player.position) % num_players
+                assert decoded.target == expected
+
+    def test_action_id_history(self):
+        env = LoveLetterBaseEnv(num_players=3)
+        obs, _ = env.reset(seed=5)
+
+        while not env.game_over:
+            if env.current_player.active:
+                action_id, _ = env.current_player.agent.predict(obs)
+                obs, _, _, _, _ = env.step(action_id)
+            else:
+                obs, _, _, _, _ = env._next_player()
+
+        assert env.action_id_history == [a.action._id for a in env.action_history]
+
+
+class TestObservationLayout:
+    def test_layout_is_shared(self):
+        env = LoveLetterBaseEnv(num_players=3)
+        env.reset(seed=1)
+
+        assert env.observe()._layout is env.observe()._layout
+        assert env.observe()._layout is Observation.layout()
+
+    def test_layout_matches_space(self):
+        env = LoveLetterBaseEnv()
+        layout = Observation.layout()
+
+        assert env.observation_space.shape == (layout.player_vec_length,)
+
+    def test_layout_decodes_vectors(self):
+        env = LoveLetterBaseEnv(num_players=2)
+        obs, _ = env.reset(seed=2)
+        layout = Observation.layout()
+
+        assert list(obs[layout.player_hand]) == env.current_player.hand.vector
+        assert obs[layout.player_deck_size] == env.deck.remaining()
+        assert list(obs[layout.player_status_index[0]]) == [1, 0]
+
+
+class TestObservationBuffer:
+    @staticmethod
+    def _encode(env, player):
+        return Observation(
+            env.num_players,
+            env.players,
+            player,
+            env.deck,
+            env.discard_pile,
+            env.action_history,
+            env.game_over,
+            env.winners,
+            env,
+        ).vector
+
+    @pytest.mark.parametrize("num_players", [2, 3, 4])
+    @pytest.mark.parametrize("randomize_player_count", [False, True])
+    def test_buffers_match_full_encoding(self, num_players, randomize_player_count):
+        env = LoveLetterBaseEnv(num_players=num_players, randomize_player_count=randomize_player_count)
+
+        for game in range(20):
+            obs, _ = env.reset(seed=game)
+            while True:
+                for player in env.players:
+                    expected = self._encode(env, player)
+                    np.testing.assert_array_equal(env._obs_buffer.vectors[player.position], expected)
+                np.testing.assert_array_equal(obs, self._encode(env, env.current_player))
+
+                if env.game_over:
+                    break
+                if env.current_player.active:
+                    action_id, _ = env.current_player.agent.predict(obs)
+                    obs, _, _, _, _ = env.step(action_id)
+                else:
+                    obs, _, _, _, _ = env._next_player()
+
+    def test_observation_is_a_copy(self):
+        env = LoveLetterBaseEnv()
+        obs, _ = env.reset(seed=4)
+        obs[:] = -1
+
+        assert (env.observe().vector >= 0).all()
+
+
+class TestObservationOptions:
+    @staticmethod
+    def _play(env, seed):
+        history = []
+        obs, _ = env.reset(seed=seed)
+        for player in env.players:
+            player.agent.seed(seed + player.position)
+
+        while not env.game_over:
+            if env.current_player.active:
+                action_id, _ = env.current_player.agent.predict(obs)
+                obs, reward, _, _, info = env.step(action_id)
+            else:
+                obs, reward, _, _, info = env._next_player()
+            history.append((obs, reward, info))
+
+        return history
+
+    def test_observation_info_disabled(self):
+        with_info = self._play(LoveLetterBaseEnv(num_players=3), seed=9)
+        without_info = self._play(LoveLetterBaseEnv(num_players=3, observation_info=False), seed=9)
+
+        assert len(with_info) == len(without_info)
+        for (obs, reward, info), (obs2, reward2, info2) in zip(with_info, without_info):
+            np.testing.assert_array_equal(obs, obs2)
+            assert reward == reward2
+            assert isinstance(info["observation"], Observation)
+            assert info2 == {}
+
+    def test_lazy_observations(self):
+        env = LoveLetterBaseEnv(num_players=2, lazy_observations=True)
+        env.reset(seed=6)
+
+        obs = env.observe()
+        assert obs._valid_actions is None
+        assert obs.valid_actions == env.valid_actions
+
+
+class TestGameState:
+    def test_state_is_compact(self):
+        env = LoveLetterBaseEnv(num_players=4)
+        assert env.state.nbytes < 256
+        assert env.state.data.dtype == np.int8
+
+    def test_players_are_views(self):
+        env = LoveLetterBaseEnv(num_players=3)
+        env.reset(seed=8)
+        state = env.state
+
+        for player in env.players:
+            assert player.hand.vector == state.hands[player.position].tolist()
+            assert player.status_vector == tuple(state.status[player.position])
+        assert env.current_player.position == state.current
+        assert env.deck.remaining() == state.deck_size - state.pointer
+
+        player = env.players[1]
+        player.safe = True
+        assert state.status[1, GameState.SAFE] == 1
+
+    def test_state_tracks_game(self):
+        env = LoveLetterBaseEnv(num_players=4)
+        obs, _ = env.reset(seed=10)
+
+        while not env.game_over:
+            if env.current_player.active:
+                action_id, _ = env.current_player.agent.predict(obs)
+                obs, _, _, _, _ = env.step(action_id)
+            else:
+                obs, _, _, _, _ = env._next_player()
+
+        state = env.state
+        assert state.game_over
+        assert env.discard_pile == list(state.discard[:state.num_discards])
+        assert env.action_id_history == [a.action._id for a in env.action_history]
+        for record, wrapper in zip(state.history, env.action_history):
+            assert record[GameState.HISTORY_SEAT] == wrapper.player.position
+            assert record[GameState.HISTORY_CARD] == wrapper.action.card
+            if wrapper.discarding_player is None:
+                assert record[GameState.HISTORY_DISCARDER] == -1
+            else:
+                assert record[GameState.HISTORY_DISCARDER] == wrapper.discarding_player.position
+                assert record[GameState.HISTORY_DISCARD] == wrapper.discard
+
+        # Every card is accounted for exactly once
+        cards = list(state.hands[state.hands != Card.EMPTY]) + env.discard_pile + list(state.deck[state.pointer:])
+        assert sorted(cards + [state.deck[0]]) == sorted(state.deck)
+
+    def test_knowledge_updates(self):
+        state = GameState(4)
+        state.status[:, GameState.ACTIVE] = 1
+        state.knowledge[:, 1] = [Card.GUARD, Card.EMPTY, Card.GUARD, Card.PRIEST]
+        state.knowledge[0, 2] = Card.BARON
+
+        # Seat 1 discards a Guard, and the active players who knew forget it
+        state.status[2, GameState.ACTIVE] = 0
+        assert state.forget(1, Card.GUARD) == [0]
+        assert state.knowledge[:, 1].tolist() == [Card.EMPTY, Card.EMPTY, Card.GUARD, Card.PRIEST]
+
+        # Seats 1 and 2 swap hands
+        state.swap_knowledge(1, 2)
+        assert state.knowledge[0, 1:3].tolist() == [Card.BARON, Card.EMPTY]
+        assert state.knowledge[3, 1:3].tolist() == [Card.EMPTY, Card.PRIEST]
+        assert state.knowledge[2, 1:3].tolist() == [Card.GUARD, Card.EMPTY]
+
+        # Inactive seats keep what they knew about an eliminated seat
+        state.knowledge[2, 3] = Card.KING
+        state.knowledge[0, 3] = Card.KING
+        assert state.forget_player(3) == [0, 2]
+        assert state.knowledge[:, 3].tolist() == [Card.EMPTY, Card.EMPTY, Card.KING, Card.EMPTY]
+
+    def test_learned_order(self):
+        env = LoveLetterBaseEnv(num_players=4)
+        env.reset(seed=0)
+        state = env.state
+        layout = Observation.layout()
+
+        def slots():
+            env._sync_knowledge(range(env.num_players))
+            vector = env._obs_buffer.vector(0)
+            return [tuple(vector[slot]) for slot in layout.player_target_hand]
+
+        # Known cards are listed in the order they were learned, not by seat
+        state.learn(0, 3, Card.KING)
+        state.learn(0, 1, Card.BARON)
+        assert [p.position for p in env.players[0].priest_info()] == [3, 1]
+        assert slots() == [(3, Card.KING), (1, Card.BARON), (0, 0)]
+
+        # Learning a seat's card again keeps its place
+        state.learn(0, 3, Card.PRINCE)
+        assert slots() == [(3, Card.PRINCE), (1, Card.BARON), (0, 0)]
+
+        # A card that moves to another seat with a King is learned anew
+        state.swap_knowledge(1, 2)
+        assert slots() == [(3, Card.PRINCE), (2, Card.BARON), (0, 0)]
+
+        # If both seats were known, the seats keep their places
+        state.swap_knowledge(2, 3)
+        assert slots() == [(3, Card.BARON), (2, Card.PRINCE), (0, 0)]
+        assert [p.position for p in env.players[0].priest_info()] == [3, 2]
+
+    def test_standalone_views(self):
+        hand = Hand([Card.GUARD])
+        hand.add(Card.KING)
+        assert hand.full
+        hand.discard(Card.GUARD)
+        assert hand.card == Card.KING
+
+        deck = Deck()
+        deck.seed(0)
+        deck.shuffle()
+        assert deck.remaining() == Deck.size() - 1
+        assert isinstance(deck.draw(), Card)
+
+        player = Player(2)
+        player.draw(deck)
+        assert player.card is not None
+        assert player.eliminate() is not None
+        assert not player.active
+
+    def test_copied_env_keeps_views(self):
+        env = LoveLetterBaseEnv(num_players=3)
+        env.reset(seed=12)
+        env.step(env.valid_actions[0]._id)
+        for clone in (copy.deepcopy(env), pickle.loads(pickle.dumps(env))):
+            np.testing.assert_array_equal(clone.state.data, env.state.data)
+            assert clone.state is not env.state
+            # Players of the copy must read and write the copied state
+            for player in clone.players:
+                assert player.state is clone.state
+                assert player.hand.vector == clone.state.hands[player.position].tolist()
+            clone.step(clone.valid_actions[0]._id)
+            assert clone.state.num_plays == env.state.num_plays + 1
+
+
+class TestProfiling:
+    def test_disabled_by_default(self):
+        env = LoveLetterBaseEnv()
+        assert env.profiler is None
+        assert env.stats() == {}
+
+    def test_stats(self):
+        env = LoveLetterBaseEnv(num_players=3, profile=True)
+        env.reset(seed=3)
+
+        steps = 0
+        for _ in range(5):
+            env.reset()
+            while not env.game_over:
+                if env.current_player.active:
+                    env.step(env.valid_actions[0]._id)
+                    steps += 1
+                else:
+                    env._next_player()
+
+        stats = env.stats()
+        assert stats["games"] == 5
+        assert stats["resets"] == stats["reset_calls"] == 6
+        assert stats["steps"] == stats["step_calls"] == stats["decode_action_calls"] == steps
+        for phase in ("step", "decode_action", "effects", "check_game_over", "reward", "observe", "reset"):
+            assert stats[f"{phase}_time"] > 0
+
+        parts = ("decode_action", "effects", "check_game_over")
+        assert sum(stats[f"{phase}_time"] for phase in parts) <= stats["step_time"]
+
+        env.reset()
+        with pytest.raises(InvalidPlayError):
+            env.step(int(np.argmin(env.valid_action_mask())))
+        assert env.stats()["invalid_actions"] == 1
+
+        env.clear_stats()
+        assert env.stats()["steps"] == 0
+
+    def test_opponent_predict(self):
+        env = LoveLetterMultiAgentEnv(num_players=4, profile=True)
+        env.reset(seed=5)
+
+        steps = 0
+        done = False
+        while not done:
+            _, _, done, _, _ = env.step(env.valid_actions[0]._id)
+            steps += 1
+
+        stats = env.stats()
+        assert stats["opponent_predict_calls"] > 0
+        assert stats["opponent_predict_calls"] == stats["steps"] - steps
+
+    def test_callback(self):
+        from stable_baselines3 import PPO
+        from stable_baselines3.common.logger import KVWriter, Logger
+
+        from gym_love_letter.callbacks import ProfilingCallback
+        from gym_love_letter.envs.profiling import EnvProfiler
+
+        class Recorder(KVWriter):
+            def __init__(self):
+                self.rows = []
+
+            def write(self, key_values, key_excluded, step=0):
+                self.rows.append(dict(key_values))
+
+        env = LoveLetterMultiAgentEnv(num_players=2, profile=True)
+        model = PPO("MlpPolicy", env, n_steps=32, batch_size=32, n_epochs=1, seed=0)
+        recorder = Recorder()
+        model.set_logger(Logger(None, [recorder]))
+        model.learn(64, callback=ProfilingCallback())
+
+        # One row per rollout
+        assert len(recorder.rows) == 2
+        for row in recorder.rows:
+            assert row["profile/resets"] > 0
+            for phase in EnvProfiler.PHASES:
+                assert f"profile/{phase}_time" in row
+                assert 0 <= row[f"profile/{phase}_share"] <= 1
+
+        # The stats were cleared at the end of the last rollout
+        assert env.stats()["steps"] == 0
+
+
+class TestSnapshot:
+    @staticmethod
+    def _record(env, seed):
+        """
+        Play a game, recording a snapshot and the outcome of each move.
+        """
+
+        records = []
+        obs, _ = env.reset(seed=seed)
+        while not env.game_over:
+            snapshot = env.snapshot()
+            expected = (env._obs_buffer.vectors.copy(), env.valid_action_mask(), list(env.action_history))
+            if env.current_player.active:
+                action_id, _ = env.current_player.agent.predict(obs)
+                obs, reward, done, _, _ = env.step(action_id)
+            else:
+                action_id = None
+                obs, reward, done, _, _ = env._next_player()
+            records.append((snapshot, expected, action_id, (obs, reward, done)))
+
+        return records
+
+    @pytest.mark.parametrize("num_players", [2, 3, 4])
+    def test_restore(self, num_players):
+        env = LoveLetterBaseEnv(num_players=num_players)
+        records = self._record(env, seed=num_players)
+
+        # Restore out of order, to make sure no state leaks from one game position to another
+        rng = np.random.default_rng(0)
+        for i in rng.permutation(len(records)):
+            snapshot, (vectors, mask, history), action_id, (obs, reward, done) = records[i]
+            env.restore(snapshot)
+
+            np.testing.assert_array_equal(env._obs_buffer.vectors, vectors)
+            np.testing.assert_array_equal(env.valid_action_mask(), mask)
+            assert env.action_history == history
+
+            if action_id is not None:
+                result = env.step(action_id)
+            else:
+                result = env._next_player()
+            np.testing.assert_array_equal(result[0], obs)
+            assert result[1:3] == (reward, done)
+
+    def test_load(self):
+        env = LoveLetterBaseEnv(num_players=3)
+        records = self._record(env, seed=1)
+        snapshot, (vectors, _, _), _, _ = records[len(records) // 2]
+
+        loaded = LoveLetterBaseEnv.load(snapshot, observation_info=False)
+        assert loaded.num_players == 3
+        assert not loaded.observation_info
+        np.testing.assert_array_equal(loaded.snapshot(), snapshot)
+        np.testing.assert_array_equal(loaded._obs_buffer.vectors, vectors)
+
+        with pytest.raises(ValueError):
+            LoveLetterBaseEnv.load(snapshot[:-1])
+        with pytest.raises(ValueError):
+            LoveLetterBaseEnv(num_players=4).restore(snapshot)
+
+    def test_snapshot_is_compact(self):
+        env = LoveLetterBaseEnv(num_players=4)
+        env.reset(seed=0)
+        snapshot = env.snapshot()
+
+        assert snapshot.dtype == np.int8
+        assert snapshot.nbytes < 256
+
+
+class TestTrainingReset:
+    def test_learner_moves_first_at_its_seat(self):
+        env = LoveLetterMultiAgentEnv(num_players=4)
+        for seed in range(30):
+            env.reset(seed=seed)
+            assert env.current_player.position == env.learner_position == 0
+            assert env.current_player.active and not env.game_over
+
+        stats = env.reset_stats
+        assert stats.resets == 30
+        assert stats.deals == 30 + stats.rejected
+        assert stats.opponent_moves > 0
+        assert 0 <= stats.rejection_rate < 1
+
+    @pytest.mark.parametrize("learner_seat", ["rotate", "random", 2])
+    def test_learner_seat(self, learner_seat):
+        env = LoveLetterMultiAgentEnv(num_players=3, learner_seat=learner_seat)
+        env.reset(seed=0)
+
+        seats = []
+        for _ in range(30):
+            env.reset()
+            assert env.current_player.position == env.learner_position
+            seats.append(env.learner_position)
+
+            # The training agent gets the turn back after a full cycle
+            _, _, done, _, _ = env.step(int(np.flatnonzero(env.valid_action_mask())[0]))
+            if not done:
+                assert env.current_player.position == env.learner_position
+
+        if learner_seat == "rotate":
+            assert seats == [(seats[0] + i) % 3 for i in range(30)]
+        elif learner_seat == "random":
+            assert set(seats) == {0, 1, 2}
+        else:
+            assert set(seats) == {2}
+
+        with pytest.raises(ValueError):
+            LoveLetterMultiAgentEnv(num_players=3, learner_seat=3)
+
+    def test_max_deals(self):
+        env = LoveLetterMultiAgentEnv(num_players=4, max_reset_deals=1)
+        for seed in range(100):
+            try:
+                env.reset(seed=seed)
+            except RuntimeError:
+                break
+        else:
+            pytest.fail("Expected a rejected deal")
+
+        assert env.reset_stats.rejected == 1
+        assert not env.paused
+
+    def test_opening_pool(self):
+        from gym_love_letter.envs.openings import OpeningPool
+
+        env = LoveLetterMultiAgentEnv(num_players=4, learner_seat="random")
+        pool = OpeningPool.simulate(env, 5, seed=0)
+        assert len(pool) == 5
+
+        env.opening_pool = pool
+        deals = env.reset_stats.deals
+        decks = set()
+        for seed in range(20):
+            env.reset(seed=seed)
+            assert env.current_player.position == env.learner_position
+            assert env.current_player.active
+
+            # The unseen cards are reshuffled, the rest of the opening is kept
+            state = env.state
+            deck = state.offsets["deck"]
+            unseen = np.r_[deck, deck + state.pointer:deck + state.deck_size]
+            snapshot = env.snapshot()
+            openings = [
+                s for s in pool.snapshots if np.array_equal(np.delete(s, unseen), np.delete(snapshot, unseen))
+            ]
+            assert openings
+            assert sorted(snapshot[unseen]) == sorted(openings[0][unseen])
+            decks.add(tuple(state.deck.tolist()))
+
+        assert env.reset_stats.deals == deals
+        assert env.reset_stats.pool_resets == 20
+        assert len(decks) > 5
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from gym_love_letter.agents.ismcts import (
+    EndgameRollout,
+    ISMCTSAgent,
+    PolicyRollout,
+    heuristic_rollout,
+    random_rollout,
+    search,
+)
+from gym_love_letter.envs import LoveLetterBaseEnv
+
+
+def play(env, agent, seed):
+    """
+    Play a game with the agent in seat 0 against random agents, checking
+    that every move it makes is valid.
+    """
+
+    obs, _ = env.reset(seed=seed)
+    for player in env.players:
+        player.agent.seed(seed + player.position)
+
+    while not env.game_over:
+        if not env.current_player.active:
+            obs, _, _, _, _ = env._next_player()
+            continue
+
+        if env.current_player.position == 0:
+            action_id, _ = agent.predict(obs)
+            assert env.valid_action_mask()[action_id]
+        else:
+            action_id, _ = env.current_player.agent.predict(obs)
+        obs, _, _, _, _ = env.step(action_id)
+
+
+class FirstValidModel:
+    def predict(self, obs, action_masks=None, deterministic=False):
+        return int(np.flatnonzero(action_masks)[0]), None
+
+
+class TestISMCTS:
+    @pytest.mark.parametrize("num_players", [2, 3, 4])
+    @pytest.mark.parametrize(
+        "rollout_policy", [random_rollout, heuristic_rollout, PolicyRollout(FirstValidModel()), EndgameRollout()]
+    )
+    def test_plays_valid_actions(self, num_players, rollout_policy):
+        env = LoveLetterBaseEnv(num_players=num_players)
+        agent = ISMCTSAgent(env, iterations=30, rollout_policy=rollout_policy, seed=0)
+        for seed in range(2):
+            play(env, agent, seed)
+
+    def test_search_leaves_env_untouched(self):
+        env = LoveLetterBaseEnv(num_players=3)
+        env.reset(seed=1)
+        snapshot = env.snapshot()
+        vector = env.observe().vector.copy()
+
+        stats = ISMCTSAgent(env, iterations=100, seed=0).search()
+
+        assert np.array_equal(env.snapshot(), snapshot)
+        assert np.array_equal(env.observe().vector, vector)
+        assert sum(visits for visits, _ in stats.values()) == 100
+        legal = set(np.flatnonzero(env.valid_action_mask()).tolist())
+        assert set(stats) == legal
+
+    def test_seeded(self):
+        env = LoveLetterBaseEnv(num_players=4)
+        env.reset(seed=2)
+        snapshot = env.snapshot()
+        assert search(snapshot, 0, iterations=50, seed=3) == search(snapshot, 0, iterations=50, seed=3)
+
+    def test_time_limit(self):
+        env = LoveLetterBaseEnv(num_players=2)
+        env.reset(seed=0)
+        stats = ISMCTSAgent(env, iterations=None, time_limit=0.05, seed=0).search()
+        assert sum(visits for visits, _ in stats.values()) > 0
+
+        with pytest.raises(ValueError):
+            ISMCTSAgent(env, iterations=None, time_limit=None)
+
+    def test_root_parallel(self):
+        env = LoveLetterBaseEnv(num_players=2)
+        env.reset(seed=0)
+        agent = ISMCTSAgent(env, iterations=100, n_workers=2, rollout_policy=heuristic_rollout, seed=0)
+        try:
+            stats = agent.search()
+            assert sum(visits for visits, _ in stats.values()) == 100
+            play(env, agent, seed=1)
+        finally:
+            agent.close()
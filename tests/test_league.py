@@ -0,0 +1,90 @@
+import pytest
+
+from gym_love_letter import zoo
+from gym_love_letter.envs.base import LoveLetterMultiAgentEnv
+from gym_love_letter.league import DEFAULT_RATING, League
+from gym_love_letter.zoo import ModelCache, ModelZoo
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    from sb3_contrib import MaskablePPO
+    from stable_baselines3 import PPO
+
+    root = tmp_path_factory.mktemp("zoo")
+    env = LoveLetterMultiAgentEnv(num_players=2)
+    PPO("MlpPolicy", env, n_steps=64).save(root / "ppo" / "final_model")
+    MaskablePPO("MlpPolicy", env, n_steps=64).save(root / "masking" / "final_model")
+    return root
+
+
+class TestModelZoo:
+    def test_index(self, model_dir):
+        models = ModelZoo(str(model_dir))
+        assert models.names == ["masking/final_model", "ppo/final_model"]
+        assert models.spec("ppo/final_model").startswith("ppo:")
+        assert models.spec("masking/final_model").startswith("maskable:")
+        assert models.refresh() == []
+
+    def test_cache(self, model_dir):
+        cache = ModelCache(capacity=1)
+        ppo = str(model_dir / "ppo" / "final_model.zip")
+        masking = str(model_dir / "masking" / "final_model.zip")
+
+        first = cache.get(ppo)
+        assert cache.get(ppo) is first
+        cache.get(masking)
+        assert len(cache) == 1
+        assert cache.get(ppo) is not first
+        assert (cache.hits, cache.misses) == (1, 3)
+
+
+class TestLeague:
+    def test_round_robin(self, tmp_path):
+        store = str(tmp_path / "league.json")
+        league = League(store, games_per_table=10)
+        for spec in ("random", "heuristic", "ismcts:5"):
+            league.add(spec, spec)
+
+        assert len(league.round_robin()) == 3
+        league.play(league.round_robin(), n_workers=1)
+        assert league.round_robin() == []
+        assert all(games == 20 for games in league.games.values())
+        assert sum(league.ratings.values()) == pytest.approx(3 * DEFAULT_RATING)
+
+        # Only the new player's tables are left after reloading
+        league = League(store, games_per_table=10)
+        assert len(league.tables) == 3
+        league.add("random2", "random")
+        assert league.round_robin() == [["heuristic", "random2"], ["ismcts:5", "random2"], ["random", "random2"]]
+
+    def test_record(self, tmp_path):
+        league = League(str(tmp_path / "league.json"), table_size=3, games_per_table=30)
+        for spec in ("random", "heuristic"):
+            league.add(spec, spec)
+        league.add("random2", "random")
+
+        league.play(league.round_robin(), n_workers=2, shard_size=7)
+        result = league.tables[league.key(["random", "heuristic", "random2"])]
+        assert result.games + result.invalid == 30
+        assert league.games["heuristic"] == result.games
+
+    def test_swiss(self, tmp_path):
+        league = League(str(tmp_path / "league.json"))
+        for i, rating in enumerate([1600, 1550, 1500, 1450, 1400]):
+            league.add(f"p{i}", "random")
+            league.ratings[f"p{i}"] = rating
+
+        assert league.swiss_round() == [["p0", "p1"], ["p2", "p3"]]
+
+        league.tables[league.key(["p0", "p1"])] = None
+        assert league.swiss_round() == [["p0", "p2"], ["p1", "p3"]]
+
+    def test_zoo(self, tmp_path, model_dir):
+        league = League(str(tmp_path / "league.json"), games_per_table=4)
+        assert len(league.add_zoo(ModelZoo(str(model_dir)))) == 2
+        league.add("random", "random")
+
+        league.play(league.round_robin(), n_workers=1, cache_size=2)
+        assert len(league.tables) == 3
+        assert len(zoo.cache) == 2
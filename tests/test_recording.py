@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from gym_love_letter.envs.base import LoveLetterBaseEnv, LoveLetterMultiAgentEnv
+from gym_love_letter.envs.recording import TrajectoryRecorder, load_shards, read_index, unpack_masks
+
+
+def play(env, games, seed=0):
+    """
+    Play random games through env, returning what each step saw and did.
+    """
+
+    base = env.unwrapped
+    rng = np.random.default_rng(seed)
+    steps = []
+    for game in range(games):
+        env.reset(seed=seed + game)
+        while not base.game_over:
+            if not base.current_player.active:
+                base._next_player()
+                continue
+
+            seat = base.current_player.position
+            obs = base._obs_buffer.vector(seat).copy()
+            mask = base.valid_action_mask()
+            action_id = int(rng.choice(np.flatnonzero(mask)))
+            _, reward, done, _, _ = env.step(action_id)
+            steps.append((game, seat, obs, mask, action_id, reward, done))
+
+    return steps
+
+
+class TestTrajectoryRecorder:
+    @pytest.mark.parametrize("num_players", [2, 3, 4])
+    def test_records(self, tmp_path, num_players):
+        env = TrajectoryRecorder(LoveLetterBaseEnv(num_players, observation_info=False), str(tmp_path), shard_size=16)
+        steps = play(env, games=5)
+        env.close()
+
+        shards = load_shards(str(tmp_path))
+        assert all(len(shard) == 16 for shard in shards[:-1])
+        records = np.concatenate(shards)
+        assert len(records) == len(steps) == read_index(str(tmp_path))["records"]
+
+        masks = unpack_masks(records["mask"], env.num_actions)
+        for record, mask, (game, seat, obs, legal, action_id, reward, done) in zip(records, masks, steps):
+            assert record["episode"] == game
+            assert record["seat"] == seat
+            assert (record["obs"] == obs).all()
+            assert (mask == legal).all()
+            assert record["action"] == action_id
+            assert record["reward"] == pytest.approx(reward)
+            assert record["done"] == done
+
+    def test_append(self, tmp_path):
+        env = TrajectoryRecorder(LoveLetterBaseEnv(2, observation_info=False), str(tmp_path))
+        first = play(env, games=2)
+        env.close()
+
+        env = TrajectoryRecorder(LoveLetterBaseEnv(2, observation_info=False), str(tmp_path))
+        second = play(env, games=3, seed=10)
+        env.close()
+
+        index = read_index(str(tmp_path))
+        assert index["episodes"] == 5
+        assert len(index["shards"]) == 2
+        records = np.concatenate(load_shards(str(tmp_path)))
+        assert len(records) == len(first) + len(second)
+        assert sorted(set(records["episode"].tolist())) == list(range(5))
+
+        with pytest.raises(ValueError):
+            TrajectoryRecorder(LoveLetterBaseEnv(2, observation_info=False), str(tmp_path), full_state=True)
+
+    def test_full_state(self, tmp_path):
+        env = TrajectoryRecorder(LoveLetterBaseEnv(3), str(tmp_path), full_state=True)
+        env.reset(seed=0)
+        full = env.unwrapped.observe().full_vector
+        env.step(int(np.flatnonzero(env.valid_action_mask())[0]))
+        env.close()
+
+        records = load_shards(str(tmp_path), mmap=False)[0]
+        assert (records["full"][0] == full).all()
+
+    def test_multi_agent(self, tmp_path):
+        env = TrajectoryRecorder(LoveLetterMultiAgentEnv(3), str(tmp_path))
+        rng = np.random.default_rng(0)
+        decisions = 0
+        for game in range(5):
+            env.reset(seed=game)
+            done = False
+            while not done:
+                _, _, done, _, _ = env.step(int(rng.choice(np.flatnonzero(env.valid_action_mask()))))
+                decisions += 1
+        env.close()
+
+        records = np.concatenate(load_shards(str(tmp_path)))
+        assert len(records) == decisions
+        assert records["done"].sum() == 5
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from gym_love_letter.engine import GameState
+from gym_love_letter.envs.base import LoveLetterBaseEnv
+from gym_love_letter.envs.replay import (
+    GameLog,
+    load_logs,
+    record_random_games,
+    replay,
+    replay_all,
+    save_logs,
+)
+
+
+def altered(log, **fields):
+    values = dict(
+        num_players=log.num_players,
+        seed=log.seed,
+        actions=log.actions.copy(),
+        rewards=log.rewards.copy(),
+        digests=log.digests.copy(),
+    )
+    values.update(fields)
+    return GameLog(**values)
+
+
+class TestReplay:
+    @pytest.mark.parametrize("num_players", [2, 3, 4])
+    def test_replays_match(self, num_players):
+        logs = record_random_games(num_players, games=50, seed=7)
+        assert all(len(log) > 0 for log in logs)
+        assert replay_all(logs) == []
+
+    def test_save_and_load(self, tmp_path):
+        logs = record_random_games(2, games=5) + record_random_games(4, games=5)
+        path = str(tmp_path / "games.npz")
+        save_logs(path, logs)
+
+        loaded = load_logs(path)
+        assert len(loaded) == len(logs)
+        for original, log in zip(logs, loaded):
+            assert (original.num_players, original.seed) == (log.num_players, log.seed)
+            assert (original.actions == log.actions).all()
+            assert (original.rewards == log.rewards).all()
+            assert (original.digests == log.digests).all()
+        assert replay_all(loaded) == []
+
+    def test_divergences(self):
+        log = next(log for log in record_random_games(3, games=20) if len(log) >= 4)
+        env = LoveLetterBaseEnv(3, observation_info=False)
+
+        digests = log.digests.copy()
+        digests[2] ^= 1
+        divergence = replay(env, altered(log, digests=digests))
+        assert (divergence.step, divergence.reason) == (2, "state")
+        assert replay(env, altered(log, digests=digests), check_state=False) is None
+
+        rewards = log.rewards.copy()
+        rewards[1] += 1
+        divergence = replay(env, altered(log, rewards=rewards))
+        assert (divergence.step, divergence.reason) == (1, "reward")
+
+        divergence = replay(env, altered(log, actions=log.actions[:-1]))
+        assert (divergence.step, divergence.reason) == (len(log) - 1, "game not over")
+
+        divergence = replay(env, altered(log, actions=np.append(log.actions, log.actions[-1])))
+        assert (divergence.step, divergence.reason) == (len(log), "game over early")
+
+    def test_digest_ignores_layout(self, monkeypatch):
+        logs = record_random_games(3, games=20)
+        shapes = GameState._shapes
+
+        def rearranged(cls, num_players, deck_size):
+            # Counters stay first, since their cells are addressed directly
+            fields = list(shapes(num_players, deck_size).items())
+            return dict(fields[:1] + [("padding", (3,))] + fields[:0:-1])
+
+        monkeypatch.setattr(GameState, "_shapes", classmethod(rearranged))
+        env = LoveLetterBaseEnv(3, observation_info=False)
+        assert list(env.state.offsets) != list(shapes(3, env.state.deck_size))
+        assert replay_all(logs) == []
+
+    def test_invalid_action(self):
+        log = record_random_games(2, games=1)[0]
+        env = LoveLetterBaseEnv(2, observation_info=False)
+        env.reset(seed=log.seed)
+        invalid = int(np.flatnonzero(~env.valid_action_mask())[0])
+
+        actions = log.actions.copy()
+        actions[0] = invalid
+        divergence = replay(env, altered(log, actions=actions), game=3)
+        assert divergence.game == 3
+        assert divergence.step == 0
+        assert divergence.reason.startswith("InvalidPlayError")
+
+    def test_workers(self):
+        logs = record_random_games(2, games=30)
+        rewards = logs[4].rewards.copy()
+        rewards[0] += 1
+        logs[4] = altered(logs[4], rewards=rewards)
+        logs[20] = altered(logs[20], actions=logs[20].actions[:-1])
+
+        serial = replay_all(logs)
+        assert [d.game for d in serial] == [4, 20]
+        assert replay_all(logs, n_workers=2, shard_size=7) == serial
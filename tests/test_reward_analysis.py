@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from gym_love_letter.envs.base import LoveLetterBaseEnv, LoveLetterMultiAgentEnv
+from gym_love_letter.envs.dataset import TrajectoryDataset
+from gym_love_letter.envs.recording import TrajectoryRecorder
+from gym_love_letter.envs.reward_analysis import (Trajectories, analyze, evaluate_rewards, main,
+                                                  reward_contexts, reward_functions)
+from gym_love_letter.envs.rewards import Rewards
+
+
+def record(env, directory, games, seed=0, events=True):
+    env = TrajectoryRecorder(env, directory, shard_size=64, events=events)
+    base = env.unwrapped
+    rng = np.random.default_rng(seed)
+    for game in range(games):
+        env.reset(seed=seed + game)
+        done = False
+        while not done:
+            if not base.current_player.active:
+                base._next_player()
+            else:
+                _, _, done, _, _ = env.step(int(rng.choice(np.flatnonzero(env.valid_action_mask()))))
+            done = done or base.game_over
+    env.close()
+
+
+@pytest.fixture(scope="module")
+def recording(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("analysis"))
+    record(LoveLetterMultiAgentEnv(3), directory, games=100)
+    return TrajectoryDataset(directory)
+
+
+class TestRewardAnalysis:
+    @pytest.mark.parametrize("name", sorted(reward_functions()))
+    @pytest.mark.parametrize("multi_agent", [False, True])
+    def test_reevaluation_matches_recording(self, tmp_path, name, multi_agent):
+        reward = getattr(Rewards, name)
+        cls = LoveLetterMultiAgentEnv if multi_agent else LoveLetterBaseEnv
+        record(cls(4, reward_fn=reward, observation_info=False), str(tmp_path), games=30)
+
+        dataset = TrajectoryDataset(str(tmp_path))
+        recorded = np.concatenate([shard["reward"] for shard in dataset.shards])
+        evaluated = evaluate_rewards({name: reward}, reward_contexts(dataset))[name]
+        np.testing.assert_array_equal(evaluated, recorded)
+
+    def test_returns(self, recording):
+        evaluations = {evaluation.name: evaluation for evaluation in analyze(recording)}
+        assert set(evaluations) == {"recorded", *reward_functions()}
+
+        records = np.concatenate(recording.shards)
+        expected = {}
+        for record in records:
+            key = (int(record["episode"]), int(record["seat"]))
+            expected[key] = expected.get(key, 0) + float(record["reward"])
+
+        evaluation = evaluations["recorded"]
+        assert len(evaluation.trajectory_returns) == len(expected)
+        assert sorted(evaluation.trajectory_returns.tolist()) == pytest.approx(sorted(expected.values()))
+
+        # Winning is the whole game_won_reward return
+        won = evaluations["game_won_reward"]
+        np.testing.assert_array_equal(won.trajectory_returns, won.won)
+        assert won.win_correlation() == pytest.approx(1.0)
+        assert 0 < won.won.mean() < 1
+
+    def test_advantages(self, recording):
+        rng = np.random.default_rng(0)
+        rewards = rng.random(len(recording)).astype(np.float32)
+        values = rng.random(len(recording)).astype(np.float32)
+        gamma, gae_lambda = 0.9, 0.8
+
+        returns, advantages = Trajectories(recording).returns_and_advantages(rewards, values, gamma, gae_lambda)
+
+        # Walk each trajectory backwards, as stable-baselines3 does
+        order = recording.trajectory_order
+        next_index = recording.next_index
+        expected = np.zeros(len(recording))
+        for i in order[::-1]:
+            j = next_index[i]
+            if j < 0:
+                expected[i] = rewards[i] - values[i]
+            else:
+                delta = rewards[i] + gamma * values[j] - values[i]
+                expected[i] = delta + gamma * gae_lambda * expected[j]
+
+        assert advantages == pytest.approx(expected, abs=1e-5)
+        assert returns == pytest.approx(expected + values, abs=1e-5)
+
+    def test_requires_events(self, tmp_path):
+        record(LoveLetterMultiAgentEnv(2), str(tmp_path), games=2, events=False)
+        with pytest.raises(ValueError):
+            analyze(TrajectoryDataset(str(tmp_path)))
+
+    def test_cli(self, tmp_path):
+        record(LoveLetterMultiAgentEnv(2), str(tmp_path), games=20)
+
+        result = CliRunner().invoke(main, [str(tmp_path), "-r", "game_won_reward", "--gamma", "0.99"])
+        assert result.exit_code == 0, result.output
+        assert "game_won_reward" in result.output
+        assert "fast_elimination_reward" not in result.output
+
+        result = CliRunner().invoke(main, [str(tmp_path), "--json"])
+        assert result.exit_code == 0, result.output
+        assert "win_corr" in result.output
+
+        result = CliRunner().invoke(main, [str(tmp_path), "-r", "nope"])
+        assert result.exit_code != 0
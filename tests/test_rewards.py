@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from gym_love_letter.engine import Card, GameState
+from gym_love_letter.envs import LoveLetterBaseEnv
+from gym_love_letter.envs.rewards import Event, Reward, Rewards, alive, eliminations, won
+
+
+def play(env, seed, on_turn=None):
+    """
+    Play a game of random valid moves, calling on_turn(env) whenever a new
+    player is up.
+    """
+
+    rng = np.random.default_rng(seed)
+    env.reset(seed=seed)
+    while not env.game_over:
+        if env.current_player.active:
+            env.step(int(rng.choice(np.flatnonzero(env.valid_action_mask()))))
+        else:
+            env._next_player()
+        if on_turn is not None:
+            on_turn(env)
+
+
+class TestEvents:
+    @pytest.mark.parametrize("num_players", [2, 3, 4])
+    def test_counts(self, num_players):
+        env = LoveLetterBaseEnv(num_players=num_players, observation_info=False)
+        for seed in range(20):
+            play(env, seed)
+
+            events = env.events
+            state = env.state
+            seats = state.history[:state.num_plays, GameState.HISTORY_SEAT]
+            assert events[:, Event.PLAYED].tolist() == np.bincount(seats, minlength=num_players).tolist()
+
+            winners = [p.position for p in env.winners]
+            assert np.flatnonzero(events[:, Event.WON]).tolist() == winners
+            assert np.flatnonzero(events[:, Event.OUT]).tolist() == [
+                p.position for p in env.players if p.position not in winners
+            ]
+            assert events[:, Event.ELIMINATED].sum() <= events[:, Event.OUT].sum()
+
+            handmaids = state.history[:state.num_plays, GameState.HISTORY_CARD] == Card.HANDMAID
+            assert events[:, Event.PROTECTED].sum() == handmaids.sum()
+
+    def test_reset_clears_events(self):
+        env = LoveLetterBaseEnv(num_players=3, observation_info=False)
+        play(env, seed=0)
+        assert env.events.any()
+
+        env.reset(seed=1)
+        assert not env.events.any()
+        assert not env.events_rewarded.any()
+
+
+class TestRewards:
+    @pytest.mark.parametrize("reward", [
+        Rewards.simple_turn_reward,
+        Rewards.game_completion_reward,
+        Rewards.game_won_reward,
+        Rewards.fast_elimination_reward,
+    ])
+    def test_evaluating_twice(self, reward):
+        env = LoveLetterBaseEnv(num_players=4, reward_fn=reward, observation_info=False)
+
+        def check(env):
+            snapshot = env.snapshot()
+            assert reward(env) == reward(env)
+            np.testing.assert_array_equal(env.snapshot(), snapshot)
+
+        for seed in range(10):
+            play(env, seed, check)
+
+    def test_composition(self):
+        env = LoveLetterBaseEnv(num_players=3, observation_info=False)
+        scaled = 3 * Reward([(1, eliminations)])
+        combined = Reward([(1, alive)]) + Reward([(10, won)], normalize_by=10)
+
+        def check(env):
+            assert scaled(env) == 3 * Reward([(1, eliminations)])(env)
+            assert combined(env) == pytest.approx(Rewards.simple_turn_reward(env) + Rewards.game_won_reward(env))
+
+        for seed in range(10):
+            play(env, seed, check)
+
+    def test_eliminations_are_rewarded_once(self):
+        reward = Reward([(1, eliminations)])
+        env = LoveLetterBaseEnv(num_players=4, reward_fn=reward, observation_info=False)
+        for seed in range(50):
+            env.reset(seed=seed)
+            rng = np.random.default_rng(seed)
+            rewarded = 0
+            while not env.game_over:
+                if env.current_player.active:
+                    _, r, _, _, _ = env.step(int(rng.choice(np.flatnonzero(env.valid_action_mask()))))
+                else:
+                    _, r, _, _, _ = env._next_player()
+                rewarded += r
+
+            # Whatever hasn't been rewarded yet is still pending
+            pending = env.events[:, Event.ELIMINATED] - env.events_rewarded[:, Event.ELIMINATED]
+            assert rewarded + pending.sum() == env.events[:, Event.ELIMINATED].sum()
@@ -0,0 +1,63 @@
+import pytest
+
+from gym_love_letter import tournament
+
+
+class TestTournament:
+    def test_run(self):
+        specs = ["random", "heuristic", "random"]
+        stats = tournament.run(specs, games=30, seed=5, n_workers=1, shard_size=7)
+
+        assert stats.games + stats.invalid == 30
+        assert sum(stats.agent_games) == 3 * stats.games
+        assert sum(stats.seat_starts) == stats.games
+        assert sum(stats.agent_starts) == stats.games
+        assert sum(stats.seat_wins) == sum(stats.agent_wins) >= stats.games
+
+        # Every agent plays every seat equally often
+        assert stats.agent_games == [stats.games] * 3
+
+    @pytest.mark.parametrize("rotate", [True, False])
+    def test_workers_dont_change_results(self, rotate):
+        specs = ["random", "heuristic"]
+        serial = tournament.run(specs, games=40, seed=3, rotate=rotate, n_workers=1, shard_size=40)
+        parallel = tournament.run(specs, games=40, seed=3, rotate=rotate, n_workers=2, shard_size=6)
+        assert serial == parallel
+
+    def test_progress(self):
+        seen = []
+        tournament.run(["random", "random"], games=10, n_workers=1, shard_size=4, progress=lambda s: seen.append(s.games + s.invalid))
+        assert seen == [4, 8, 10]
+
+    def test_progress_line(self):
+        specs = ["random", "heuristic"]
+        stats = tournament.run(specs, games=10, n_workers=1)
+        line = tournament.format_progress(specs, stats, 20)
+
+        assert line.startswith(f"[10/20] invalid={stats.invalid} ")
+        for seat in range(2):
+            assert f"seat{seat}={stats.seat_wins[seat]}/{stats.seat_starts[seat]}" in line
+
+    def test_report(self):
+        specs = ["random", "random"]
+        stats = tournament.run(specs, games=20, n_workers=1)
+        data = tournament.report(specs, stats)
+
+        assert [agent["spec"] for agent in data["agents"]] == ["random#0", "random#1"]
+        for agent in data["agents"]:
+            low, high = agent["win_rate_ci95"]
+            assert low <= agent["win_rate"] <= high
+        assert "games" in tournament.format_report(data, elapsed=1.0)
+
+    def test_unknown_spec(self):
+        with pytest.raises(ValueError):
+            tournament.run(["random", "nonsense"], games=1, n_workers=1)
+
+    def test_wilson_interval(self):
+        low, high = tournament.wilson_interval(50, 100)
+        assert low == pytest.approx(0.4038, abs=1e-4)
+        assert high == pytest.approx(0.5962, abs=1e-4)
+
+        assert tournament.wilson_interval(0, 10)[0] == 0.0
+        assert tournament.wilson_interval(10, 10)[1] == pytest.approx(1.0)
+        assert tournament.wilson_interval(0, 0) == (0.0, 1.0)
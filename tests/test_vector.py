@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+
+from gym_love_letter.envs.base import Rewards
+from gym_love_letter.envs.vector import BatchedOpponentVecEnv, LoveLetterEnvFactory, SharedMemoryVecEnv
+
+
+class LowestCardPolicy:
+    """
+    A deterministic model-like policy: plays the valid action with the lowest
+    id, for a single observation or a batch of them.
+    """
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, obs, action_masks=None):
+        masks = np.atleast_2d(action_masks)
+        self.batch_sizes.append(len(masks))
+        actions = masks.argmax(axis=1)
+        return (actions if obs.ndim == 2 else actions[0]), None
+
+
+def compare_with_serial(vec_env, envs, steps=60):
+    """
+    Step the vector env and the same envs one at a time with the same actions,
+    and check that they agree.
+    """
+
+    vec_env.seed(7)
+    obs = vec_env.reset()
+    expected = np.stack([env.reset(seed=7 + i)[0] for i, env in enumerate(envs)])
+    np.testing.assert_array_equal(obs, expected)
+
+    rng = np.random.default_rng(0)
+    for _ in range(steps):
+        masks = vec_env.action_masks()
+        np.testing.assert_array_equal(masks, np.stack([env.valid_action_mask() for env in envs]))
+
+        actions = (rng.random(masks.shape) * masks).argmax(axis=1)
+        obs, rewards, dones, infos = vec_env.step(actions)
+
+        for i, env in enumerate(envs):
+            env_obs, reward, terminated, _, _ = env.step(actions[i])
+            assert rewards[i] == pytest.approx(reward)
+            assert dones[i] == terminated
+            if terminated:
+                np.testing.assert_array_equal(infos[i]["terminal_observation"], env_obs)
+                env_obs, _ = env.reset()
+            np.testing.assert_array_equal(obs[i], env_obs)
+
+
+@pytest.fixture
+def factory():
+    return LoveLetterEnvFactory(num_players=3, reward_fn=Rewards.game_completion_reward, seed=11)
+
+
+class TestSharedMemoryVecEnv:
+    def test_matches_serial_envs(self, factory):
+        """
+        Workers must produce exactly what the same envs produce when stepped in this process.
+        """
+
+        num_envs = 5
+        vec_env = SharedMemoryVecEnv(factory, num_envs, n_workers=2)
+        envs = [factory(i) for i in range(num_envs)]
+
+        try:
+            compare_with_serial(vec_env, envs)
+        finally:
+            vec_env.close()
+
+    def test_env_access(self, factory):
+        vec_env = SharedMemoryVecEnv(factory, 3, n_workers=2)
+
+        try:
+            vec_env.reset()
+            assert vec_env.get_attr("num_players") == [3, 3, 3]
+
+            vec_env.set_attr("observation_info", True, indices=[2])
+            assert vec_env.get_attr("observation_info") == [False, False, True]
+
+            masks = vec_env.env_method("valid_action_mask", indices=[1, 2])
+            np.testing.assert_array_equal(np.stack(masks), vec_env.action_masks()[1:])
+        finally:
+            vec_env.close()
+
+        assert vec_env.closed
+
+    def test_profiled_workers(self):
+        factory = LoveLetterEnvFactory(num_players=3, seed=11, profile=True)
+        vec_env = SharedMemoryVecEnv(factory, 2, n_workers=2)
+
+        rng = np.random.default_rng(0)
+        try:
+            vec_env.reset()
+            for _ in range(10):
+                masks = vec_env.action_masks()
+                vec_env.step((rng.random(masks.shape) * masks).argmax(axis=1))
+
+            stats = vec_env.env_method("stats")
+            assert all(s["steps"] > 0 and s["reset_calls"] > 0 for s in stats)
+
+            vec_env.env_method("clear_stats")
+            assert all(s["steps"] == 0 for s in vec_env.env_method("stats"))
+        finally:
+            vec_env.close()
+
+
+class TestBatchedOpponentVecEnv:
+    def test_matches_serial_envs(self, factory):
+        vec_env = BatchedOpponentVecEnv(factory, 4)
+        compare_with_serial(vec_env, [factory(i) for i in range(4)])
+
+    def test_batches_predictions(self, factory):
+        num_envs = 6
+        policy = LowestCardPolicy()
+        vec_env = BatchedOpponentVecEnv(factory, num_envs, opponents=[policy, policy])
+
+        serial_policy = LowestCardPolicy()
+        envs = [factory(i) for i in range(num_envs)]
+        for env in envs:
+            env.set_agents([env.players[0].agent, serial_policy, serial_policy])
+
+        compare_with_serial(vec_env, envs)
+
+        # The same decisions, in fewer calls
+        assert sum(policy.batch_sizes) == len(serial_policy.batch_sizes)
+        assert len(policy.batch_sizes) < len(serial_policy.batch_sizes)
+        assert max(policy.batch_sizes) > 1
+
+    def test_paused_env(self, factory):
+        env = factory(0)
+        env.reset(seed=0)
+
+        obs = env.begin_step(int(np.flatnonzero(env.valid_action_mask())[0]))
+        assert obs is not None and env.paused
+        assert env.current_player.position != 0
+
+        with pytest.raises(RuntimeError):
+            env.begin_step(0)
+
+        while obs is not None:
+            obs = env.resume(int(np.flatnonzero(env.valid_action_mask())[0]))
+
+        assert not env.paused
+        assert len(env.cycle_result) == 5
@@ -12,6 +12,7 @@ from stable_baselines3.ppo import MlpPolicy, PPO
 
 from gym_love_letter.agents import RandomAgent
 from gym_love_letter.envs.base import LoveLetterMultiAgentEnv
+from gym_love_letter.envs.vector import LoveLetterEnvFactory, SharedMemoryVecEnv
 
 
 LOGDIR = "ppo_tmp"  # moved to zoo afterwards.
@@ -30,8 +31,15 @@ EVAL_EPISODES = 50
 
 @click.command()
 @click.option("--load", "-l", "load_path")
-def train(load_path):
-    env = LoveLetterMultiAgentEnv(num_players=4)
+@click.option("--n-envs", default=1, help="Number of games to play in parallel")
+@click.option("--n-workers", type=int, help="Processes to play the games in. Defaults to one per CPU.")
+def train(load_path, n_envs, n_workers):
+    if n_envs > 1:
+        # Opponents are random agents built inside the worker processes
+        factory = LoveLetterEnvFactory(num_players=4, seed=SEED)
+        env = SharedMemoryVecEnv(factory, n_envs, n_workers=n_workers)
+    else:
+        env = LoveLetterMultiAgentEnv(num_players=4)
     env.seed(SEED)
 
     # take mujoco hyperparams (but doubled timesteps_per_actorbatch to cover more steps.)
@@ -44,9 +52,10 @@ def train(load_path):
 
     import ipdb; ipdb.set_trace()
 
-    random_agents = [RandomAgent(env, SEED + i) for i in range(3)]
-    agents = [model, *random_agents]
-    env.set_agents(agents)
+    if n_envs == 1:
+        random_agents = [RandomAgent(env, SEED + i) for i in range(3)]
+        agents = [model, *random_agents]
+        env.set_agents(agents)
 
     eval_callback = EvalCallback(env, best_model_save_path=LOGDIR, log_path=LOGDIR, eval_freq=EVAL_FREQ, n_eval_episodes=EVAL_EPISODES)
 
@@ -10,6 +10,7 @@ from stable_baselines3.ppo import MlpPolicy, PPO
 
 from gym_love_letter.agents import RandomAgent
 from gym_love_letter.envs.base import LoveLetterMultiAgentEnv, Rewards
+from gym_love_letter.envs.vector import LoveLetterEnvFactory, SharedMemoryVecEnv
 
 
 SEED = 721
@@ -25,7 +26,9 @@ EVAL_EPISODES = 200
 @click.command()
 @click.argument("output_folder", type=click.Path())
 @click.option("--load", "-l", "load_path")
-def train(output_folder, load_path):
+@click.option("--n-envs", default=1, help="Number of games to play in parallel")
+@click.option("--n-workers", type=int, help="Processes to play the games in. Defaults to one per CPU.")
+def train(output_folder, load_path, n_envs, n_workers):
     base_output = Path(output_folder)
     full_output = base_output / datetime.datetime.now().isoformat(timespec="seconds")
     # latest = base_output / "latest"
@@ -33,9 +36,14 @@ def train(output_folder, load_path):
 
     logger.configure(folder=str(full_output))
 
-    env = LoveLetterMultiAgentEnv(
-        num_players=4, reward_fn=Rewards.fast_elimination_reward
-    )
+    if n_envs > 1:
+        # Opponents are random agents built inside the worker processes
+        factory = LoveLetterEnvFactory(num_players=4, reward_fn=Rewards.fast_elimination_reward, seed=SEED)
+        env = SharedMemoryVecEnv(factory, n_envs, n_workers=n_workers)
+    else:
+        env = LoveLetterMultiAgentEnv(
+            num_players=4, reward_fn=Rewards.fast_elimination_reward
+        )
     env.seed(SEED)
 
     # take mujoco hyperparams (but doubled timesteps_per_actorbatch to cover more steps.)
@@ -49,14 +57,15 @@ def train(output_folder, load_path):
 
         model = PPO(MlpPolicy, env, verbose=1, action_mask_fn=test_fn)
 
-    other_agents = [RandomAgent(env, SEED + i) for i in range(3)]
-    # other_agents = [
-    #     PPO.load("zoo/ppo_reward_bugfix2/latest/best_model", env),
-    #     PPO.load("zoo/ppo_reward_bugfix2/latest/best_model", env),
-    #     PPO.load("zoo/ppo_reward_bugfix2/latest/best_model", env),
-    # ]
-    agents = [model, *other_agents]
-    env.set_agents(agents)
+    if n_envs == 1:
+        other_agents = [RandomAgent(env, SEED + i) for i in range(3)]
+        # other_agents = [
+        #     PPO.load("zoo/ppo_reward_bugfix2/latest/best_model", env),
+        #     PPO.load("zoo/ppo_reward_bugfix2/latest/best_model", env),
+        #     PPO.load("zoo/ppo_reward_bugfix2/latest/best_model", env),
+        # ]
+        agents = [model, *other_agents]
+        env.set_agents(agents)
 
     eval_callback = EvalCallback(
         env,